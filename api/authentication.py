@@ -0,0 +1,159 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+# Token authentication without a DB lookup per request
+# DRF's TokenAuthentication reads the token and its user on every request. The (user, token) of each key is kept
+# in an in-process LRU for settings.TOKEN_CACHE['TTL'] seconds.
+# Deleting a token (logout) or deactivating a user / changing their password drops the entries of this process
+# (see api/signals.py), the other processes stop accepting the token once their entry expires.
+# With a shared django cache (settings.TOKEN_CACHE['ALIAS'], a memory-backed cache such as memcached or redis) each token
+# also has an invalidation stamp there, replaced by every invalidation. Every process compares the stamp of its entry
+# at most once every STAMP_INTERVAL seconds, so the other workers stop accepting the token well before the TTL.
+# Only the stamps are shared, the users are never written to the shared cache.
+
+# defaults of settings.TOKEN_CACHE
+TOKEN_CACHE_DEFAULTS = {
+    # maximum number of tokens kept in each process
+    'MAX_ENTRIES': 10000,
+    # seconds a token is trusted without a lookup
+    'TTL': 60,
+    # django cache shared between processes for the invalidation stamps, None to only rely on the TTL
+    'ALIAS': None,
+    # seconds between two checks of the stamp of an entry
+    'STAMP_INTERVAL': 5,
+}
+
+def get_token_cache_settings():
+    options = dict(TOKEN_CACHE_DEFAULTS)
+    options.update(getattr(settings, 'TOKEN_CACHE', {}))
+
+    return options
+
+class TokenCache:
+    def __init__(self, max_entries=None, ttl=None, alias=None, stamp_interval=None):
+        options = get_token_cache_settings()
+
+        self.max_entries = max_entries if max_entries is not None else options['MAX_ENTRIES']
+        self.ttl = ttl if ttl is not None else options['TTL']
+        self.alias = alias if alias is not None else options['ALIAS']
+        self.stamp_interval = stamp_interval if stamp_interval is not None else options['STAMP_INTERVAL']
+        self.lock = threading.Lock()
+        # key -> (user, token, expires, stamp, time the stamp was last checked)
+        self.entries = OrderedDict()
+
+    def stamp_key(self, key):
+        return 'auth_token_stamp:' + key
+
+    # returns the invalidation stamp of a token, None if it was dropped from the shared cache
+    def get_stamp(self, key):
+        return caches[self.alias].get(self.stamp_key(key))
+
+    # returns the stamp of a token, creating it if there is none yet. None without a shared cache
+    def ensure_stamp(self, key):
+        if self.alias is None:
+            return None
+
+        cache = caches[self.alias]
+        cache.add(self.stamp_key(key), uuid.uuid4().hex, None)
+
+        return cache.get(self.stamp_key(key))
+
+    # returns (user, token) for a token key, None if it is not cached, expired or it was invalidated since
+    # copies are returned, so a view changing request.user does not change the cached user
+    def get(self, key):
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None and entry[2] <= now:
+                del self.entries[key]
+                entry = None
+
+        if entry is None:
+            return None
+
+        user, token, expires, stamp, checked = entry
+
+        if self.alias is not None and now - checked >= self.stamp_interval:
+            # a stamp that changed or was dropped means the entry can't be trusted anymore
+            if stamp is None or self.get_stamp(key) != stamp:
+                with self.lock:
+                    self.entries.pop(key, None)
+
+                return None
+
+            checked = now
+
+        with self.lock:
+            if key in self.entries:
+                self.entries[key] = (user, token, expires, stamp, checked)
+                self.entries.move_to_end(key)
+
+        return (copy.copy(user), copy.copy(token))
+
+    # stamp: ensure_stamp read before the token was looked up, so an invalidation during the lookup is not missed
+    def set(self, key, user, token, stamp=None):
+        if self.alias is not None and stamp is None:
+            return
+
+        now = time.monotonic()
+
+        with self.lock:
+            self.entries[key] = (copy.copy(user), copy.copy(token), now + self.ttl, stamp, now)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    # drops the cached token. the other processes drop it on their next stamp check, or once it expires
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+        if self.alias is not None:
+            caches[self.alias].set(self.stamp_key(key), uuid.uuid4().hex, None)
+
+    # drops every cached token of a user
+    def invalidate_user(self, user_pk):
+        with self.lock:
+            keys = set(key for key, entry in self.entries.items() if entry[0].pk == user_pk)
+
+        # tokens only cached by other processes
+        if self.alias is not None:
+            keys |= set(Token.objects.filter(user_id=user_pk).values_list('key', flat=True))
+
+        for key in keys:
+            self.invalidate(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+# process-wide instance used by CachingTokenAuthentication and the invalidation signals
+token_cache = TokenCache()
+
+# TokenAuthentication that only looks the token up once per TTL
+class CachingTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+
+        if credentials is not None:
+            return credentials
+
+        # the stamp is read before the lookup, a token invalidated while it runs is not cached with the new stamp
+        stamp = token_cache.ensure_stamp(key)
+
+        # raises AuthenticationFailed for an invalid token or an inactive user, these are not cached
+        user, token = super(CachingTokenAuthentication, self).authenticate_credentials(key)
+        token_cache.set(key, user, token, stamp)
+
+        return (user, token)
@@ -0,0 +1,392 @@
+import hashlib
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.text import compress_string
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import PyMongoError
+from rest_framework.renderers import JSONRenderer
+
+# local models
+from api.models import Garage, ProbabilityGeneration
+from api.mongo import get_collection, to_db_value
+from api.probabilities import load_probability_matrix, pack_probabilities, pack_matrix, unpack_probabilities, unpack_matrix, DAY_CODES, DAYS_PER_WEEK, SLOTS_PER_DAY, SLOT_TIMES, MINUTES_PER_SLOT, PROBABILITY_DTYPE
+from api.serializers import GarageReadSerializer
+
+# returns (generation, updated, committed probability version) for the garage probabilities currently in the DB
+def get_probability_state():
+    row = ProbabilityGeneration.objects.order_by('-generation').first()
+
+    if row is None:
+        return (0, None, 0)
+
+    return (row.generation, row.updated, row.version or 0)
+
+# returns (generation, updated) for the garage probabilities currently in the DB
+def get_probability_generation():
+    return get_probability_state()[:2]
+
+# increments the probability generation, invalidating every cached garage response. returns the new generation
+# the increment is a single $inc, so concurrent bumps are never lost
+# version: probability version committed by the same update, see write_probabilities
+def bump_probability_generation(version=None):
+    if not ProbabilityGeneration.objects.exists():
+        ProbabilityGeneration.objects.create(generation=0)
+
+    update = {'$inc': {'generation': 1}, '$set': {'updated': to_db_value(ProbabilityGeneration, 'updated', timezone.now())}}
+    if version is not None:
+        update['$max'] = {'version': version}
+
+    row = get_collection(ProbabilityGeneration).find_one_and_update(
+        {},
+        update,
+        sort=[('generation', -1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+    return row['generation']
+
+# Writes new probabilities for many garages with a single bulk write, instead of one garage.save() per garage
+# The matrices are staged on Garage.staged_probability_matrix under the next probability version, which no reader uses yet.
+# The version is then committed together with the generation bump, in a single update, and from then on every reader
+# uses the staged matrices (see load_probability_matrix), so readers never see the garages half updated.
+# The staged matrices are finally moved to Garage.probability_matrix, and the nested documents are written from them.
+# matrices: dict of garage pk -> 7x96 probabilities
+# returns the new generation. raises pymongo.errors.PyMongoError if the write fails, the version is not committed then
+def write_probabilities(matrices):
+    collection = get_collection(Garage)
+    committed = get_probability_state()[2]
+
+    # matrices left staged by an interrupted write: moved first if their version was committed, they would be
+    # overwritten otherwise, and dropped if it was not, they would be committed with this write otherwise
+    promote_probabilities(committed)
+    collection.update_many({'staged_probability_matrix': {'$ne': None}, 'probability_version': {'$gt': committed}}, {'$set': {'staged_probability_matrix': None}})
+
+    version = committed + 1
+
+    requests = []
+    for pk, matrix in matrices.items():
+        requests.append(UpdateOne({'id': pk}, {'$set': {
+            'staged_probability_matrix': pack_matrix(matrix),
+            'probability_version': version,
+        }}))
+
+    if requests:
+        try:
+            collection.bulk_write(requests, ordered=True)
+        except PyMongoError:
+            # nothing staged is read while the version is not committed, it is dropped so a later write never commits it
+            try:
+                collection.update_many({'probability_version': version}, {'$set': {'staged_probability_matrix': None}})
+            except PyMongoError:
+                pass
+            raise
+
+    generation = bump_probability_generation(version)
+    promote_probabilities(version)
+
+    return generation
+
+# moves the staged matrices of the committed versions (up to version) to Garage.probability_matrix
+# the nested documents are rewritten from them, so every reader of Garage.probability (admin, validate_probs) stays in sync
+def promote_probabilities(version):
+    collection = get_collection(Garage)
+    staged = collection.find({'staged_probability_matrix': {'$ne': None}, 'probability_version': {'$lte': version}},
+        {'_id': 0, 'id': 1, 'staged_probability_matrix': 1})
+
+    requests = []
+    for garage in staged:
+        data = bytes(garage['staged_probability_matrix'])
+
+        requests.append(UpdateOne({'id': garage['id'], 'probability_version': {'$lte': version}}, {'$set': {
+            'probability': to_db_value(Garage, 'probability', unpack_probabilities(unpack_matrix(data))),
+            'probability_matrix': data,
+            'staged_probability_matrix': None,
+        }}))
+
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+
+# renders the garage list (pk=None) or a single garage to JSON bytes
+# format: 'json', or 'compact' for the probabilities as percentages (see compact_probability_data)
+# version: committed probability version, see load_probability_matrix
+# raises Http404 if the garage does not exist
+def render_garages(pk=None, day_of_week=None, time=None, format='json', version=None):
+    context = {'compact': format == 'compact', 'probability_version': version}
+    if day_of_week:
+        context['day_of_week'] = day_of_week
+    if time:
+        context['time'] = time
+
+    queryset = Garage.objects.defer('probability')
+
+    if pk is None:
+        serializer = GarageReadSerializer(queryset, many=True, context=context)
+    else:
+        serializer = GarageReadSerializer(get_object_or_404(queryset, pk=pk), context=context)
+
+    return JSONRenderer().render(serializer.data)
+
+# Base for the in-process caches of data derived from the garage probabilities.
+# The probability generation is read from the DB at most once every check_interval seconds,
+# and reset() is called to drop the cached data whenever it changed.
+class GenerationCache:
+    def __init__(self, check_interval=None):
+        self.check_interval = check_interval if check_interval is not None else settings.GARAGE_CACHE_CHECK_INTERVAL
+        self.lock = threading.Lock()
+        self.generation = None
+        self.updated = None
+        self.version = None
+        self.checked = None
+
+    # drops the cached data, called with the lock held
+    def reset(self):
+        pass
+
+    # drops the cached data and forces the generation to be read again on the next lookup
+    def clear(self):
+        with self.lock:
+            self.reset()
+            self.generation = None
+            self.updated = None
+            self.version = None
+            self.checked = None
+
+    # reads the generation from the DB at most once every check_interval seconds, resets the cached data if it changed
+    def check_generation(self):
+        now = time.monotonic()
+
+        if self.checked is not None and now - self.checked < self.check_interval:
+            return
+
+        generation, updated, version = get_probability_state()
+
+        with self.lock:
+            if generation != self.generation or updated != self.updated or version != self.version:
+                self.reset()
+                self.generation = generation
+                self.updated = updated
+                self.version = version
+            self.checked = now
+
+    # returns the committed probability version the cached data is read with
+    def get_version(self):
+        self.check_generation()
+
+        with self.lock:
+            return self.version
+
+# Caches the rendered JSON of the garage endpoints, keyed by (pk or None, day_of_week, time), plus 'compact' for the compact format
+# Probabilities only change when xgboost_daily runs, so entries stay valid until the probability generation is bumped.
+# Each process keeps its own entries. Entries are also written to the shared django cache (settings.GARAGE_CACHE_ALIAS),
+# which is how the responses rendered eagerly by xgboost_daily reach the web workers.
+class GarageResponseCache(GenerationCache):
+    def __init__(self, check_interval=None, max_entries=None):
+        super(GarageResponseCache, self).__init__(check_interval)
+        self.max_entries = max_entries if max_entries is not None else settings.GARAGE_CACHE_MAX_ENTRIES
+        self.responses = OrderedDict()
+
+    def reset(self):
+        self.responses.clear()
+
+    # key used in the shared cache. None when no generation has been written yet
+    def shared_key(self, key):
+        if self.updated is None:
+            return None
+
+        return 'garages:%d:%s:%s' % (self.generation, self.updated.isoformat(), ':'.join(str(part) for part in key))
+
+    # returns the cached JSON bytes for key, or None
+    def get(self, key):
+        self.check_generation()
+
+        with self.lock:
+            content = self.responses.get(key)
+
+            if content is not None:
+                self.responses.move_to_end(key)
+                return content
+
+        shared_key = self.shared_key(key)
+        if shared_key is not None:
+            content = caches[settings.GARAGE_CACHE_ALIAS].get(shared_key)
+
+            if content is not None:
+                self.store(key, content)
+
+        return content
+
+    def store(self, key, content):
+        with self.lock:
+            self.responses[key] = content
+            self.responses.move_to_end(key)
+
+            # arbitrary day/time strings in the url could otherwise grow the cache without bound
+            while len(self.responses) > self.max_entries:
+                self.responses.popitem(last=False)
+
+    def set(self, key, content):
+        self.store(key, content)
+
+        shared_key = self.shared_key(key)
+        if shared_key is not None:
+            caches[settings.GARAGE_CACHE_ALIAS].set(shared_key, content, None)
+
+    # returns the JSON bytes for key, rendering and caching them on a miss
+    def get_or_render(self, key):
+        content = self.get(key)
+
+        if content is not None:
+            return content
+
+        with self.lock:
+            version = self.version
+
+        content = render_garages(*key, version=version)
+        self.set(key, content)
+
+        return content
+
+    # returns the gzip compressed JSON bytes of a cached response, compressed once and kept next to the response
+    def get_gzipped(self, key, content):
+        gzip_key = key + ('gzip',)
+
+        with self.lock:
+            compressed = self.responses.get(gzip_key)
+
+        if compressed is None:
+            compressed = compress_string(content)
+            self.store(gzip_key, compressed)
+
+        return compressed
+
+    # strong ETag of the response for key. the response only changes with the probability generation,
+    # so no DB access is needed between generation checks
+    def etag(self, key):
+        self.check_generation()
+
+        with self.lock:
+            generation = self.generation
+            updated = self.updated
+
+        digest = hashlib.sha1(repr((updated, key)).encode()).hexdigest()[:16]
+
+        return '"%d-%s"' % (generation, digest)
+
+    # timestamp of the last probability write, None if there has been none
+    def last_modified(self):
+        self.check_generation()
+
+        with self.lock:
+            updated = self.updated
+
+        return updated.timestamp() if updated is not None else None
+
+    # renders the most requested responses: the full list, the list for each day and every single garage
+    def warm(self):
+        self.clear()
+        self.check_generation()
+
+        keys = [(None, None, None)]
+        keys += [(None, day_code, None) for day_code in DAY_CODES]
+        keys += [(pk, None, None) for pk in Garage.objects.values_list('pk', flat=True)]
+
+        for key in keys:
+            self.set(key, render_garages(*key, version=self.version))
+
+        return len(keys)
+
+# Index of every garage's probability by (day of week, time interval), for the map view of the current time.
+# probabilities[day][slot] is a contiguous array holding the probability of each garage, in the order of garages.
+# The rendered JSON of each (day, slot) is kept once requested.
+class ProbabilityWindowIndex(GenerationCache):
+    def __init__(self, check_interval=None):
+        super(ProbabilityWindowIndex, self).__init__(check_interval)
+        self.garages = None
+        self.probabilities = None
+        self.responses = {}
+
+    def reset(self):
+        self.garages = None
+        self.probabilities = None
+        self.responses = {}
+
+    # loads the probability matrix of every garage into the index. returns (garages, probabilities)
+    def build(self):
+        garages = []
+        matrices = []
+
+        with self.lock:
+            version = self.version
+
+        for garage in Garage.objects.defer('probability'):
+            matrix = load_probability_matrix(garage, version)
+
+            if matrix is None:
+                data = pack_probabilities(garage.probability)
+                if data is None:
+                    continue
+                matrix = unpack_matrix(data)
+
+            garages.append({'pk': garage.pk, 'name': garage.name, 'lat': garage.latitude, 'lon': garage.longitude})
+            matrices.append(matrix)
+
+        probabilities = np.zeros((DAYS_PER_WEEK, SLOTS_PER_DAY, len(garages)), dtype=PROBABILITY_DTYPE)
+        if matrices:
+            probabilities = np.ascontiguousarray(np.stack(matrices, axis=-1))
+
+        with self.lock:
+            # not kept if a new version was committed meanwhile
+            if self.version == version:
+                self.garages = garages
+                self.probabilities = probabilities
+                self.responses = {}
+
+        return (garages, probabilities)
+
+    # returns the JSON bytes listing every garage's probability for the day of week/time interval
+    def get(self, day_index, slot):
+        self.check_generation()
+
+        # reset() and build() replace the responses, they are read with the index they were rendered from
+        with self.lock:
+            content = self.responses.get((day_index, slot))
+            garages = self.garages
+            probabilities = self.probabilities
+
+        if content is not None:
+            return content
+
+        if probabilities is None:
+            garages, probabilities = self.build()
+
+        data = {
+            'day_of_week': DAY_CODES[day_index],
+            'time': SLOT_TIMES[slot],
+            'garages': [dict(garage, p=p) for garage, p in zip(garages, probabilities[day_index][slot].tolist())],
+        }
+        content = JSONRenderer().render(data)
+
+        with self.lock:
+            # not kept if the index was reset or not kept by build() meanwhile
+            if self.probabilities is probabilities:
+                self.responses[(day_index, slot)] = content
+
+        return content
+
+    # returns the JSON bytes for the day of week/time interval that date falls in
+    def get_for_date(self, date):
+        day_index = (date.weekday() + 1) % 7
+        slot = (date.hour * 60 + date.minute) // MINUTES_PER_SLOT
+
+        return self.get(day_index, slot)
+
+# process-wide instances used by the garage views and xgboost_daily
+garage_response_cache = GarageResponseCache()
+probability_window_index = ProbabilityWindowIndex()
@@ -0,0 +1,137 @@
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+# local models
+from api.models import Garage
+from route_visualization.coordinates import COORDINATES_FILE, load_coordinates
+
+# Process-wide registry of the garages: pk, name, coordinates and patrol group
+# Loaded once per process from the DB, merged by name with the patrol groups of the route coordinates file
+# (see route_visualization/coordinates.py), with O(1) lookups by name and pk for the simulators and the training pipeline.
+# Garage saves/deletes clear it and replace its change stamp, kept in the shared django cache (settings.GARAGE_CACHE_ALIAS).
+# The registries of the other processes compare the stamp at most once every check_interval seconds and load again
+# when it changed. The stamp is independent from the probability generation, writing probabilities does not reload it.
+
+STAMP_KEY = 'garage_registry_stamp'
+
+# pk is None for garages that are only in the coordinates file, group is None for garages that are not in any patrol group
+GarageEntry = namedtuple('GarageEntry', ['pk', 'name', 'latitude', 'longitude', 'group'])
+
+class GarageRegistry:
+    def __init__(self, coordinates_file=COORDINATES_FILE, check_interval=None, alias=None):
+        self.coordinates_file = coordinates_file
+        self.check_interval = check_interval if check_interval is not None else settings.GARAGE_CACHE_CHECK_INTERVAL
+        self.alias = alias if alias is not None else settings.GARAGE_CACHE_ALIAS
+        self.lock = threading.Lock()
+        self.entries = None
+        self.stamp = None
+        self.checked = None
+
+    # returns the change stamp, creating it if there is none yet (first use, or dropped from the shared cache)
+    def get_stamp(self):
+        cache = caches[self.alias]
+        cache.add(STAMP_KEY, uuid.uuid4().hex, None)
+
+        return cache.get(STAMP_KEY)
+
+    # drops the entries of this process, they are loaded again on the next lookup
+    def clear(self):
+        with self.lock:
+            self.entries = None
+            self.stamp = None
+            self.checked = None
+
+    # the garages changed: replaces the stamp, so the registries of every process load them again
+    def invalidate(self):
+        caches[self.alias].set(STAMP_KEY, uuid.uuid4().hex, None)
+        self.clear()
+
+    # reads the stamp at most once every check_interval seconds, drops the entries if it changed
+    def check_stamp(self):
+        now = time.monotonic()
+
+        if self.checked is not None and now - self.checked < self.check_interval:
+            return
+
+        stamp = self.get_stamp()
+
+        with self.lock:
+            if stamp != self.stamp:
+                self.entries = None
+                self.stamp = stamp
+            self.checked = now
+
+    # builds the entries: every garage of the DB ordered by pk, then the garages only in the coordinates file
+    def load(self):
+        coordinates = load_coordinates(self.coordinates_file) or []
+        groups = {garage['name']: garage['group'] for garage in coordinates}
+        entries = []
+
+        for pk, name, latitude, longitude in Garage.objects.order_by('pk').values_list('pk', 'name', 'latitude', 'longitude'):
+            entries.append(GarageEntry(pk, name, float(latitude), float(longitude), groups.get(name, None)))
+
+        by_name = {entry.name: entry for entry in entries}
+
+        for garage in coordinates:
+            if garage['name'] not in by_name:
+                entry = GarageEntry(None, garage['name'], garage['latitude'], garage['longitude'], garage['group'])
+                entries.append(entry)
+                by_name[entry.name] = entry
+
+        # patrol groups, in the order of the coordinates file
+        by_group = {}
+        for garage in coordinates:
+            by_group.setdefault(garage['group'], []).append(by_name[garage['name']])
+
+        return {
+            'all': entries,
+            'by_name': by_name,
+            'by_pk': {entry.pk: entry for entry in entries if entry.pk is not None},
+            'by_group': by_group,
+        }
+
+    def get_entries(self):
+        self.check_stamp()
+
+        with self.lock:
+            entries = self.entries
+
+        if entries is None:
+            entries = self.load()
+
+            with self.lock:
+                self.entries = entries
+
+        return entries
+
+    # every garage, see load
+    def all(self):
+        return self.get_entries()['all']
+
+    # the garages stored in the DB
+    def garages(self):
+        return [entry for entry in self.all() if entry.pk is not None]
+
+    # pks of the garages stored in the DB, in order
+    def pks(self):
+        return [entry.pk for entry in self.garages()]
+
+    # returns the garage entry with that name, None if there is none
+    def by_name(self, name):
+        return self.get_entries()['by_name'].get(name, None)
+
+    # returns the garage entry with that pk, None if there is none
+    def by_pk(self, pk):
+        return self.get_entries()['by_pk'].get(pk, None)
+
+    # the garages of a patrol group, in the order of the coordinates file
+    def group(self, group):
+        return list(self.get_entries()['by_group'].get(group, []))
+
+# process-wide instance
+garage_registry = GarageRegistry()
@@ -0,0 +1,85 @@
+# MongoDB indexes for the Park access patterns
+# djongo only creates the indexes of the model's own fields, these cover the compound queries:
+#     park_user_start: the parks of a user ordered by start (User.parks, paginated park history)
+#     park_end_ticket_garage: finished/ticketed parks by garage (training data extraction)
+#     park_open: partial index of the parks that have not ended, by user (open parks, unassigned tickets)
+#     park_modified: parks modified since the last extraction (api/training.py)
+#     park_unassigned_ticket: partial index of the ticketed parks that have not ended, by user (unassigned tickets)
+PARK_INDEXES = [
+    {
+        'name': 'park_user_start',
+        'keys': [('user_id', 1), ('start', 1), ('id', 1)],
+    },
+    {
+        'name': 'park_end_ticket_garage',
+        'keys': [('end', 1), ('ticket.date', 1), ('garage_id', 1)],
+    },
+    {
+        'name': 'park_open',
+        'keys': [('user_id', 1), ('start', 1)],
+        'options': {'partialFilterExpression': {'end': {'$type': 'null'}}},
+    },
+    {
+        'name': 'park_modified',
+        'keys': [('modified', 1)],
+    },
+    # ticket.date is last: the query is sorted by (start, id) after the user, and MongoDB before 5.0 rejects
+    # two indexes with the same keys (park_user_start) that only differ by their partial filter
+    {
+        'name': 'park_unassigned_ticket',
+        'keys': [('user_id', 1), ('start', 1), ('id', 1), ('ticket.date', 1)],
+        'options': {'partialFilterExpression': {'end': {'$type': 'null'}, 'ticket': {'$type': 'object'}}},
+    },
+]
+
+# filter of the parks covered by park_unassigned_ticket. queries must include it for the partial index to be used
+UNASSIGNED_TICKET_FILTER = {'end': {'$type': 'null'}, 'ticket': {'$type': 'object'}}
+
+# creates the indexes that do not exist yet on a pymongo collection. returns the names of the indexes created
+def create_indexes(collection, indexes):
+    existing = collection.index_information()
+    created = []
+
+    for index in indexes:
+        if index['name'] in existing:
+            continue
+
+        collection.create_index(index['keys'], name=index['name'], **index.get('options', {}))
+        created.append(index['name'])
+
+    return created
+
+# returns the names of the indexes missing from a pymongo collection, or not matching their definition
+def missing_indexes(collection, indexes):
+    existing = collection.index_information()
+    missing = []
+
+    for index in indexes:
+        info = existing.get(index['name'])
+
+        if info is None or [(field, int(direction)) for field, direction in info['key']] != index['keys']:
+            missing.append(index['name'])
+
+    return missing
+
+# returns the names of the indexes used by the winning plan of a find on a pymongo collection
+def explain_indexes(collection, filter, sort=None):
+    cursor = collection.find(filter)
+    if sort:
+        cursor = cursor.sort(sort)
+
+    plan = cursor.explain()['queryPlanner']['winningPlan']
+
+    names = []
+    stages = [plan]
+    while stages:
+        stage = stages.pop()
+
+        if 'indexName' in stage:
+            names.append(stage['indexName'])
+
+        if 'inputStage' in stage:
+            stages.append(stage['inputStage'])
+        stages.extend(stage.get('inputStages', []))
+
+    return names
@@ -0,0 +1,95 @@
+import datetime
+import time
+import numpy as np
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+# local models
+from api.models import Garage, Probability, DayProbability
+from api.probabilities import pack_matrix, DAY_CODES, DAYS_PER_WEEK, SLOTS_PER_DAY, SLOT_TIME_OBJECTS
+from api.serializers import GarageSerializer, GarageReadSerializer
+
+# Compares the nested GarageSerializer path against GarageReadSerializer for the garage endpoints
+# The garages are built in memory with random probabilities, so no DB is needed.
+# Fails if the two serializers do not render the exact same bytes.
+
+# Example:
+# python manage.py benchmark_garage_serializers --garages 77 --iterations 20
+
+class Command(BaseCommand):
+    help = 'Benchmarks GarageSerializer (nested documents) against GarageReadSerializer (packed matrix)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--garages', type=int, default=77, help='number of garages to serialize per request')
+        parser.add_argument('--iterations', type=int, default=20, help='number of timed requests per serializer')
+        parser.add_argument('--seed', type=int, default=27)
+
+    def handle(self, *args, **options):
+        nested_garages, packed_garages = self.create_garages(options['garages'], options['seed'])
+
+        # the url variants of /api/garages/
+        contexts = [
+            {},
+            {'day_of_week': 'Mon'},
+            {'day_of_week': 'Mon', 'time': '12:00'},
+        ]
+
+        for context in contexts:
+            nested_content = self.render(GarageSerializer, nested_garages, context)
+            packed_content = self.render(GarageReadSerializer, packed_garages, context)
+
+            if nested_content != packed_content:
+                raise CommandError('GarageReadSerializer output differs from GarageSerializer for context ' + str(context))
+
+            nested_time = self.time_render(GarageSerializer, nested_garages, context, options['iterations'])
+            packed_time = self.time_render(GarageReadSerializer, packed_garages, context, options['iterations'])
+
+            self.stdout.write('context=%s bytes=%d' % (context, len(packed_content)))
+            self.stdout.write('    GarageSerializer:     %8.2f ms/request' % (nested_time * 1000))
+            self.stdout.write('    GarageReadSerializer: %8.2f ms/request (%.1fx)' % (packed_time * 1000, nested_time / packed_time))
+
+    # returns (garages with nested documents, the same garages with a packed matrix)
+    def create_garages(self, count, seed):
+        rng = np.random.default_rng(seed)
+        # full double precision values, so the check catches any precision lost by the packed matrix
+        matrices = rng.random((count, DAYS_PER_WEEK, SLOTS_PER_DAY))
+        # the intervals outside of enforcement (07:00 - 18:00), as written by xgboost_daily (OFF_HOURS_PROBABILITY)
+        matrices[:, :, :7 * 4] = 0.01
+        matrices[:, :, 18 * 4:] = 0.01
+
+        nested_garages = []
+        packed_garages = []
+        for i in range(count):
+            day_probabilities = []
+            for j in range(DAYS_PER_WEEK):
+                interval_probabilities = [Probability(time=SLOT_TIME_OBJECTS[k], probability=matrices[i][j][k]) for k in range(SLOTS_PER_DAY)]
+                day_probabilities.append(DayProbability(day_of_week=DAY_CODES[j], probability=interval_probabilities))
+
+            fields = {
+                'pk': i + 1,
+                'name': 'Garage ' + str(i + 1),
+                'start_enforce_time': datetime.time(hour=7),
+                'end_enforce_time': datetime.time(hour=18),
+                'enforced_on_weekends': False,
+                'probability': day_probabilities,
+                'latitude': 38.94 + rng.random() / 100,
+                'longitude': -92.32 - rng.random() / 100,
+            }
+
+            nested_garages.append(Garage(probability_matrix=None, **fields))
+            packed_garages.append(Garage(probability_matrix=pack_matrix(matrices[i]), **fields))
+
+        return (nested_garages, packed_garages)
+
+    def render(self, serializer_class, garages, context):
+        return JSONRenderer().render(serializer_class(garages, many=True, context=context).data)
+
+    # returns the mean seconds per render
+    def time_render(self, serializer_class, garages, context, iterations):
+        start = time.perf_counter()
+
+        for i in range(iterations):
+            self.render(serializer_class, garages, context)
+
+        return (time.perf_counter() - start) / iterations
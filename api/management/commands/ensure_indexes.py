@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+# local models
+from api.models import Park
+from api.indexes import PARK_INDEXES, UNASSIGNED_TICKET_FILTER, create_indexes, missing_indexes, explain_indexes
+from api.mongo import get_collection
+
+# Creates the MongoDB indexes of api/indexes.py that do not exist yet, then verifies them
+# Also run by migration 0006, use this after restoring a dump or to check a deployment
+
+# Example:
+# python manage.py ensure_indexes --verify-only
+
+class Command(BaseCommand):
+    help = 'Creates and verifies the MongoDB indexes of the Park collection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify-only', action='store_true', help='only report missing indexes, do not create them')
+
+    def handle(self, *args, **options):
+        collection = get_collection(Park)
+
+        if not options['verify_only']:
+            for name in create_indexes(collection, PARK_INDEXES):
+                self.stdout.write('Created index ' + name)
+
+        missing = missing_indexes(collection, PARK_INDEXES)
+        if missing:
+            raise CommandError('Missing or outdated indexes: ' + ', '.join(missing))
+
+        # the history of a user, ordered by start
+        plan = explain_indexes(collection, {'user_id': 1}, [('start', 1), ('id', 1)])
+        self.stdout.write('User park history uses: ' + (', '.join(plan) or 'a collection scan'))
+
+        # the unassigned tickets of a user
+        plan = explain_indexes(collection, dict(UNASSIGNED_TICKET_FILTER, user_id=1), [('start', 1), ('id', 1)])
+        self.stdout.write('Unassigned tickets use: ' + (', '.join(plan) or 'a collection scan'))
+
+        self.stdout.write('All ' + str(len(PARK_INDEXES)) + ' indexes are present')
@@ -0,0 +1,125 @@
+import datetime
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+# local models
+from api.models import User
+from api.garage_registry import garage_registry
+from api.synthetic import day_seeds, generate_parks_for_day
+from api.patrols import PatrolIndex
+from api.views import get_patrol_times_list, load_routes
+
+# Generates synthetic parks for load testing and benchmarks (see api/synthetic.py)
+# The routes are loaded once, then the days are split between worker processes. Each day has its own seed,
+# so the same --seed generates the same parks whatever the number of workers.
+
+# Example:
+# python manage.py generate_parks --days 365 --users 100 --parks-per-slot 4 --seed 1 --workers 4
+
+ROUTE_FILES = ["route_visualization/CondensedRoutes/condensed_route_g" + str(i + 1) + ".json" for i in range(3)]
+
+# email of the i-th synthetic user
+def load_test_email(i):
+    return 'load-test-' + str(i) + '@example.com'
+
+# generates the parks of a list of (day, seed) in a worker process. returns (parks, tickets) written
+def generate_days(jobs, garages, patrols, user_pks, chunk_size, options):
+    parks = 0
+    tickets = 0
+
+    for day, seed in jobs:
+        day_parks, day_tickets = generate_parks_for_day(seed, day, garages, patrols, user_pks, chunk_size, **options)
+        parks += day_parks
+        tickets += day_tickets
+
+    return (parks, tickets)
+
+class Command(BaseCommand):
+    help = 'Generates synthetic parks and tickets for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14, help='number of days before --end-date to generate parks for')
+        parser.add_argument('--end-date', default=None, help='YYYY-MM-DD, parks are generated for the days before it. default: today')
+        parser.add_argument('--garages', type=int, default=None, help='only use the first n garages. default: every garage')
+        parser.add_argument('--users', type=int, default=1, help='number of synthetic users the parks are spread over')
+        parser.add_argument('--parks-per-slot', type=int, default=1, help='parks attempted in each garage every 5 minutes')
+        parser.add_argument('--park-percent', type=float, default=35, help='a park is attempted when a random percentage is above this')
+        parser.add_argument('--ticket-percent', type=float, default=98, help='chance (percent) that a patrol tickets a park it overlaps')
+        parser.add_argument('--seed', type=int, default=None, help='seed of the random numbers, the same seed generates the same parks')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of generating processes')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='parks per insert')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['users'] < 1 or options['workers'] < 1 or options['parks_per_slot'] < 1:
+            raise CommandError('--days, --users, --parks-per-slot and --workers must be at least 1')
+
+        try:
+            end_date = datetime.datetime.strptime(options['end_date'], '%Y-%m-%d').date() if options['end_date'] else datetime.date.today()
+        except ValueError:
+            raise CommandError('Invalid --end-date, expected YYYY-MM-DD')
+
+        garages = [(garage.pk, garage.name) for garage in garage_registry.garages()]
+        if options['garages'] is not None:
+            garages = garages[:options['garages']]
+
+        if not garages:
+            raise CommandError('There are no garages to generate parks for')
+
+        user_pks = self.get_users(options['users'])
+
+        # the patrol routes are loaded and simulated once, the patrol times do not depend on the day
+        random.seed(options['seed'])
+        patrol_start = datetime.datetime.combine(end_date, datetime.time(hour=7))
+        patrol_times = [
+            get_patrol_times_list(patrol_time_start=patrol_start, patrol_time_end=patrol_start + datetime.timedelta(minutes=660),
+                patrol_lot_time_min=5, patrol_lot_time_max=15, patrol_route=load_routes(filename))
+            for filename in ROUTE_FILES
+        ]
+        patrols = PatrolIndex(patrol_times)
+
+        days = [end_date - datetime.timedelta(days=i) for i in range(1, options['days'] + 1)]
+        jobs = list(zip(days, day_seeds(options['seed'], len(days))))
+
+        generate_options = {
+            'park_percent_thresh': options['park_percent'],
+            'park_ticket_percent_thresh': options['ticket_percent'],
+            'parks_per_iteration': options['parks_per_slot'],
+        }
+        args = (garages, patrols, user_pks, options['chunk_size'], generate_options)
+
+        workers = min(options['workers'], len(jobs))
+        start = time.monotonic()
+
+        if workers == 1:
+            parks, tickets = generate_days(jobs, *args)
+        else:
+            # every worker opens its own DB connection, the parent's must not be shared with the forked processes
+            connections.close_all()
+
+            shards = [jobs[i::workers] for i in range(workers)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(generate_days, shards, *[[arg] * workers for arg in args]))
+
+            parks = sum(result[0] for result in results)
+            tickets = sum(result[1] for result in results)
+
+        elapsed = time.monotonic() - start
+
+        self.stdout.write('Generated %d parks (%d ticketed) over %d days, %d garages and %d users in %.1fs with %d worker(s): %.0f parks/s' % (
+            parks, tickets, len(days), len(garages), len(user_pks), elapsed, workers, parks / max(elapsed, 1e-9)))
+
+    # returns the pks of the synthetic users, creating the missing ones
+    def get_users(self, count):
+        emails = [load_test_email(i) for i in range(count)]
+        existing = dict(User.objects.filter(email__in=emails).values_list('email', 'pk'))
+
+        for email in emails:
+            if email not in existing:
+                user = User.objects.create(email=email, first_name='Load Test', last_name='User')
+                existing[email] = user.pk
+
+        return [existing[email] for email in emails]
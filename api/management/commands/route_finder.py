@@ -14,6 +14,9 @@ from django.core.management.base import BaseCommand, CommandError
 class Command(BaseCommand):
     help = '*Create Help Text*'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--offline', action='store_true', help='plan the routes without calling openrouteservice, using the cached or locally computed distance matrices')
+
     def handle(self, *args, **options):
-        routes.start()
+        routes.start(offline=options['offline'])
        
@@ -1,75 +1,203 @@
+import csv
+import json
+import math
+import matplotlib
+# headless, the images are only written to files
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 import os
-import time
 
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_pdf import PdfPages
 from django.core.management.base import BaseCommand, CommandError
-from datetime import date
+from django.db import connections
 # local models
-from api.models import Garage, Probability, DayProbability, DAYS_OF_WEEK, Ticket, Park
- 
+from api.models import Garage
+from api.cache import get_probability_state
+from api.probabilities import load_probability_matrix, pack_probabilities, unpack_matrix, DAY_CODES, DAYS_PER_WEEK, SLOTS_PER_DAY
+from api.training import load_training_set, DATASET_PATH
+from api.validation import count_cubes, build_report, METRICS
+
+# Writes a calibration/accuracy report of the stored probabilities (see api/validation.py) to <report>/report.json and <report>/report.csv,
+# then renders the validation images
+
+# Example (4 processes at the lowest priority, one PDF per day):
+# python manage.py validate_probs --workers 4 --nice 19 --format pdf
+
+# The validation plot of one garage and day: the count of tickets of each time interval as bars, the probability (%) as a line
+# The figure is created once per process and its artists are updated for every plot.
+class ValidationFigure:
+    def __init__(self):
+        self.figure, self.axes = plt.subplots()
+
+        X = np.arange(SLOTS_PER_DAY)
+        self.bars = self.axes.bar(X, np.zeros(SLOTS_PER_DAY))
+        self.line, = self.axes.plot(X, np.zeros(SLOTS_PER_DAY), '-r')
+
+    def update(self, title, ticket_counts, probabilities):
+        for bar, count in zip(self.bars, ticket_counts):
+            bar.set_height(count)
+
+        self.line.set_ydata(probabilities)
+        self.axes.set_title(title)
+        self.axes.set_ylim(0, max(np.max(ticket_counts), np.max(probabilities), 1) * 1.05)
+
+    # returns the rendered figure as an RGBA array
+    def to_array(self):
+        self.figure.canvas.draw()
+
+        return np.array(self.figure.canvas.buffer_rgba())
+
+# figure of the current worker process, see init_worker
+validation_figure = None
+
+def init_worker(nice):
+    global validation_figure
+
+    if nice:
+        os.nice(nice)
+
+    validation_figure = ValidationFigure()
+
+# renders one plot to a png
+    # job: (filename, (title, ticket counts, probabilities))
+def render_png(job):
+    filename, plot = job
+
+    validation_figure.update(*plot)
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    validation_figure.figure.savefig(filename)
+
+    return filename
+
+# renders the plots of a day to a multi-page pdf, one page per garage
+    # job: (filename, list of (title, ticket counts, probabilities))
+def render_pdf(job):
+    filename, plots = job
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    with PdfPages(filename) as pdf:
+        for plot in plots:
+            validation_figure.update(*plot)
+            pdf.savefig(validation_figure.figure)
+
+    return filename
+
+# renders the plots of a day tiled into a single png
+    # job: (filename, list of (title, ticket counts, probabilities))
+def render_sprite(job):
+    filename, plots = job
+
+    tiles = []
+    for plot in plots:
+        validation_figure.update(*plot)
+        tiles.append(validation_figure.to_array())
+
+    height, width = tiles[0].shape[:2]
+    columns = math.ceil(math.sqrt(len(tiles)))
+    rows = math.ceil(len(tiles) / columns)
+
+    sprite = np.full((rows * height, columns * width, 4), 255, dtype=np.uint8)
+    for i, tile in enumerate(tiles):
+        row, column = divmod(i, columns)
+        sprite[row * height:(row + 1) * height, column * width:(column + 1) * width] = tile
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    plt.imsave(filename, sprite)
+
+    return filename
+
 class Command(BaseCommand):
-    help = '*Create Help Text*'
+    help = 'Plots the count of tickets of each time interval against the stored probabilities, for every garage and day'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='validation_images/', help='directory the images are written to')
+        parser.add_argument('--format', choices=['png', 'pdf', 'sprite'], default='png',
+            help='png: one image per garage and day, pdf: one multi-page pdf per day, sprite: one tiled image per day')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of rendering processes')
+        parser.add_argument('--nice', type=int, default=0, help='niceness added to the rendering processes')
+        parser.add_argument('--report', default='validation_report/', help='directory the metrics report is written to')
+        parser.add_argument('--skip-images', action='store_true', help='only write the metrics report')
 
     # used to create visualizations for how the probabilities for each garage on each day ...
     # ... match up with the count of tickets for each time interval
     def handle(self, *args, **options):
-        garages = Garage.objects.all()
-
-        # loop over all garages
-        for garage in garages:        
-            # loop over all the days
-            for day_prob in garage.probability:
-                Yprob = np.zeros((96))
-                i = 0
-                # loop over all the time intervals and get the probability for each
-                for prob_interval in day_prob.probability:
-                    Yprob[i] = prob_interval.probability * 100
-                    i=i+1
-
-                Ycount = np.zeros((96))
-
-                # load ticket dataset
-                today = date.today()
-                dataset = np.loadtxt('training_data/tickets_' + today.strftime("%m-%d-%Y") +'.csv', delimiter=",", usecols=range(4), skiprows=1)
-                
-                # get the count of tickets at each time interval
-                for row in dataset:
-                    if row[3] == 1 and row[2] == garage.id and row[1] == self.convertDay(day_prob.day_of_week):
-                        Ycount[int(row[0])] = Ycount[int(row[0])] + 1
-                
-                X = np.arange(96)
-
-                # plot the count of the tickets as bars
-                plt.bar(X, Ycount)
-                # plot the probability as line
-                plt.plot(X, Yprob, '-r')
-                plt.title(garage.name + " " + day_prob.day_of_week)
-
-                # save each figure in validation_images/<day of week>/<garage name>.png
-                filename = 'validation_images/'+day_prob.day_of_week+'/' + garage.name + '.png'
-                os.makedirs(os.path.dirname(filename), exist_ok=True)
-                plt.savefig(filename)
-                plt.clf()
-                plt.close()
-
-                # attempt to bring down cpu usage
-                time.sleep(0.01)
-
-    # converts a day to an int
-    def convertDay(sef, day_of_week):
-        if day_of_week == DAYS_OF_WEEK[0][0] or day_of_week == DAYS_OF_WEEK[0][1]:
-            return 7
-        elif day_of_week == DAYS_OF_WEEK[1][0] or day_of_week == DAYS_OF_WEEK[1][1]:
-            return 1
-        elif day_of_week == DAYS_OF_WEEK[2][0] or day_of_week == DAYS_OF_WEEK[2][1]:
-            return 2
-        elif day_of_week == DAYS_OF_WEEK[3][0] or day_of_week == DAYS_OF_WEEK[3][1]:
-            return 3
-        elif day_of_week == DAYS_OF_WEEK[4][0] or day_of_week == DAYS_OF_WEEK[4][1]:
-            return 4
-        elif day_of_week == DAYS_OF_WEEK[5][0] or day_of_week == DAYS_OF_WEEK[5][1]:
-            return 5
-        elif day_of_week == DAYS_OF_WEEK[6][0] or day_of_week == DAYS_OF_WEEK[6][1]:
-            return 6
+        # load the ticket dataset written by xgboost_daily once, memory-mapped
+        training_set = load_training_set(DATASET_PATH)
+        if training_set is None:
+            raise CommandError('No training set found in ' + DATASET_PATH + ', run xgboost_daily first')
+
+        X, Y = training_set
+
+        garages, probabilities = self.load_probabilities()
+
+        # count of tickets of each (garage, day, time interval)
+        tickets, observations = count_cubes(X, Y, [garage.pk for garage in garages])
+
+        report = build_report([(garage.pk, garage.name) for garage in garages], tickets, observations, probabilities)
+        self.write_report(report, options['report'])
+        self.stdout.write('Brier score: ' + str(report['overall']['brier']) + ', AUC: ' + str(report['overall']['auc']))
+
+        if options['skip_images']:
+            return
+
+        jobs, render = self.create_jobs(garages, tickets, probabilities, options['output'], options['format'])
+
+        # the workers do not use the DB, do not share its connection with them
+        connections.close_all()
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker, initargs=(options['nice'],)) as executor:
+            filenames = list(executor.map(render, jobs))
+
+        self.stdout.write('Rendered ' + str(len(filenames)) + ' validation files in ' + options['output'])
+
+    # writes the report as json, and its garage_days as csv
+    def write_report(self, report, directory):
+        os.makedirs(directory, exist_ok=True)
+
+        with open(os.path.join(directory, 'report.json'), 'w') as file:
+            json.dump(report, file, indent=4)
+
+        with open(os.path.join(directory, 'report.csv'), 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=['pk', 'name', 'day_of_week'] + METRICS)
+            writer.writeheader()
+            writer.writerows(report['garage_days'])
+
+    # returns (jobs, rendering function) for the output format
+    def create_jobs(self, garages, tickets, probabilities, output, format):
+        plots = [[(garage.name + " " + DAY_CODES[j], tickets[i][j], probabilities[i][j] * 100) for i, garage in enumerate(garages)] for j in range(DAYS_PER_WEEK)]
+
+        # <output>/<day of week>/<garage name>.png
+        if format == 'png':
+            jobs = [(os.path.join(output, DAY_CODES[j], garage.name + '.png'), plots[j][i]) for j in range(DAYS_PER_WEEK) for i, garage in enumerate(garages)]
+            return (jobs, render_png)
+
+        # <output>/<day of week>.pdf or <output>/<day of week>.png
+        extension = '.pdf' if format == 'pdf' else '.png'
+        jobs = [(os.path.join(output, DAY_CODES[j] + extension), plots[j]) for j in range(DAYS_PER_WEEK) if plots[j]]
+
+        return (jobs, render_pdf if format == 'pdf' else render_sprite)
+
+    # returns (garages, (garages, 7, 96) array of the stored probabilities). garages without probabilities are left out
+    def load_probabilities(self):
+        garages = []
+        matrices = []
+
+        version = get_probability_state()[2]
+
+        for garage in Garage.objects.defer('probability'):
+            matrix = load_probability_matrix(garage, version)
+
+            if matrix is None:
+                data = pack_probabilities(garage.probability)
+                if data is None:
+                    continue
+                matrix = unpack_matrix(data)
+
+            garages.append(garage)
+            matrices.append(matrix)
 
+        return (garages, np.array(matrices).reshape((len(garages), DAYS_PER_WEEK, SLOTS_PER_DAY)))
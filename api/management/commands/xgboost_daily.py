@@ -1,17 +1,15 @@
 import csv
-import math
 import json
 import numpy as np
 import os
-import time
 import pickle
 import pandas as pd
 import xgboost as xgb
 
 from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import PyMongoError
 from xgboost import XGBClassifier
 from datetime import date
-from enum import IntEnum 
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 from sklearn import metrics
@@ -19,14 +17,16 @@ from sklearn.model_selection import GridSearchCV
 
 # local models
 from api.models import Garage, Probability, DayProbability, DAYS_OF_WEEK, Ticket, Park
-
-class WasTicketed(IntEnum):
-    NO = 0
-    YES = 1
+from api.cache import garage_response_cache, write_probabilities
+from api.garage_registry import garage_registry
+from api.probabilities import off_hours, DAYS_PER_WEEK, SLOTS_PER_DAY, PROBABILITY_DTYPE, OFF_HOURS_PROBABILITY
+from api.model_registry import register_model
+from api.tuning import ParameterTuner, load_best_params, save_best_params
+from api.training import TrainingDataset, DATASET_PATH, TRAINING_COLUMNS, fetch_parks, expand_parks, to_rows, load_training_set, prediction_grid
 
 # Designed to be run once daily 
-# Loads and formats training data into .csv for processing and redundancy
-# Attempts to recalibrate model based on new ticket data
+# Loads new training data into the binary training set (see api/training.py), optionally exported to .csv
+# Attempts to recalibrate model based on new ticket data (see api/tuning.py)
 # Updates the ticketing probabilities in the DB
 
 
@@ -52,39 +52,49 @@ class WasTicketed(IntEnum):
 class Command(BaseCommand):
     help = '*Create Help Text*'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--full-rebuild', action='store_true', help='re-extract every park instead of only the parks modified since the last run')
+        parser.add_argument('--csv', action='store_true', help='also export the training set to training_data/tickets_<date>.csv')
+        parser.add_argument('--time-budget', type=int, default=1800, help='seconds spent tuning the model parameters and number of trees')
+        parser.add_argument('--candidates', type=int, default=27, help='number of random parameter sets tried in the first tuning round')
+        parser.add_argument('--n-jobs', type=int, default=4, help='threads used by xgboost')
+        parser.add_argument('--no-warm-start', action='store_true', help='ignore the best parameters cached by the last run')
+
     def handle(self, *args, **options):
-        # load today's training data
-        self.create_csv()
+        # bring the training set up to date with the DB
+        self.update_dataset(DATASET_PATH, full=options['full_rebuild'])
 
-        # load today's data
-        today = date.today()
-        dataset = np.loadtxt('training_data/tickets_' + today.strftime("%m-%d-%Y") +'.csv', delimiter=",", usecols=range(4), skiprows=1)
+        if options['csv']:
+            self.create_csv(dataset_path=DATASET_PATH)
 
-        # split data into X and y
-        X = dataset[:,0:3]
-        Y = dataset[:,3]
+        # memory-mapped, X: (n, 3) int16 and Y: (n,) int8
+        X, Y = load_training_set(DATASET_PATH)
 
-        # tune the xgboost parameters
-        depth_weight = self.tune_depth_weight(X,Y)
-        gamma = self.tune_gamma(X, Y)
-        subsample_colsample = self.tune_subsample_colsample(X,Y)
+        # tune the xgboost parameters, starting from the best params of the last run
+        tuner = ParameterTuner(X, Y, n_jobs=options['n_jobs'])
+        warm_start = None if options['no_warm_start'] else load_best_params()
+        # the time budget covers the number of trees at the final learning rate too
+        params, score, n_estimators = tuner.tune(options['time_budget'], candidates=options['candidates'], final_learning_rate=0.01, warm_start=warm_start)
 
-        if(depth_weight == False or gamma == False or subsample_colsample == False):
+        if params is None:
             self.stdout.write('There was an error tuning model parameters')
             return
 
+        save_best_params(params, score, n_estimators)
+        self.stdout.write('Tuned params: ' + str(params) + ' auc=' + str(score) + ' n_estimators=' + str(n_estimators))
+
         # init model with new parameters
         model = XGBClassifier(
             learning_rate = 0.01,
-            n_estimators = 3000,
+            n_estimators = n_estimators,
             scale_pos_weight=3,
-            max_depth = depth_weight[0],
-            min_child_weight = depth_weight[1],
-            gamma = gamma,
-            subsample = subsample_colsample[0],
-            colsample_bytree = subsample_colsample[1],
+            max_depth = params['max_depth'],
+            min_child_weight = params['min_child_weight'],
+            gamma = params['gamma'],
+            subsample = params['subsample'],
+            colsample_bytree = params['colsample_bytree'],
             objective = 'binary:logistic',
-            nthread = 4,
+            nthread = options['n_jobs'],
             seed = 27
         )
 
@@ -94,99 +104,65 @@ class Command(BaseCommand):
         # evaluate model performance
         #self.modelfit(model, X, Y, useTrainCV=True, cv_folds=5, early_stopping_rounds=50)
 
-        # save model params to file for loading later (TODO)
+        # save the model in the registry, the api's predictor loads it on the next prediction
         today = date.today()
-        filename = 'xgboost_models/' + today.strftime("%m-%d-%Y") + '.dat'
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-
-        with open(filename, 'wb') as outfile:
-            pickle.dump(model, outfile)
+        metrics = {'tuning_cv_auc': score, 'rows': int(len(Y)), 'ticketed': int(Y.sum())}
+        register_model(model, params=dict(params, learning_rate=0.01, n_estimators=n_estimators), metrics=metrics)
 
         # use updated model to write new probabilites for each time interval to the DB
-        self.write_probabilities_to_database(model)
+        if self.write_probabilities_to_database(model):
+            # render the responses of the new generation
+            garage_response_cache.warm()
 
         self.stdout.write('The xgboost_daily task was ran at ' + str(today))
 
     # writes new probabilities to DB, based on the newly updated model
-    def write_probabilities_to_database(self, model):
+        # garages: pks of the garages to update, every garage in the DB if None
+    def write_probabilities_to_database(self, model, garages=None):
         if(model is None):
             return False
 
-        # get all garages
-        queryset = Garage.objects.all()
-
-        # there are 51744 probabilites to write (7 days * 77 garages * 96 intervals in the day)
-        X_test = np.zeros((51744,3))
-        inx = 0
-        # init the input dataset that we are going to use the model to predict on
-        for i in range(77):
-            for j in range(7):
-                for k in range(96):
-                    # time interval
-                    X_test[inx][0] = k
-                    # day of week
-                    X_test[inx][1] = j
-                    # garage
-                    X_test[inx][2] = i + 1
-                    inx = inx + 1
-
         try:
-            # output is the probabilites for each time interval
-            preds = model.predict_proba(X_test)
+            # output is the probabilites for each garage, day and time interval
+            garages, probabilities = self.predict_probabilities(model, garages)
         except:
             return False
 
-        i=0
-        weekend = False
-        # loop over all garages in DB and update with the new probabilites
-        
+        probabilities[:, off_hours()] = OFF_HOURS_PROBABILITY
+
+        # single bulk write of every garage, bumps the probability generation once done
         try:
-            for garage in queryset:
-                garage_probs_new = []
-                for garage_day_prob in garage.probability:
-                    if garage_day_prob.day_of_week == DAYS_OF_WEEK[0][0] or garage_day_prob.day_of_week == DAYS_OF_WEEK[6][0]:
-                        weekend = True
-                    else:
-                        weekend = False
-
-                    day_probs_new = []
-                    j=0
-                    for garage_interval_prob in garage_day_prob.probability:
-                        # time < 7:00am or time > 6:00pm
-                        if j < 28 or j > 72 or weekend == True:
-                            garage_interval_prob.probability = 0.01
-                        else:
-                            garage_interval_prob.probability = preds[i][1]
-                        i=i+1
-                        j=j+1
-
-                        day_probs_new.append(garage_interval_prob)
-                    garage_day_prob.probability = day_probs_new
-                    garage_probs_new.append(garage_day_prob)
-                # overwrite old probabiliy list
-                garage.probability = garage_probs_new
-                
-                if garage and garage_probs_new:
-                    garage.save()
-        except:
+            write_probabilities(dict(zip(garages, probabilities)))
+        except PyMongoError as e:
+            self.stdout.write('There was an error writing the probabilities: ' + str(e))
             return False
 
         return True
 
-    # outputs probs to a file
-    def output_probs(self, model, filepath="training_data/pred.txt"):
-        X_test = np.zeros((51744,3))
-        inx = 0
-        for i in range(77):
-            for j in range(7):
-                for k in range(96):
-                    X_test[inx][0] = k
-                    X_test[inx][1] = j
-                    X_test[inx][2] = i
-                    inx = inx + 1
+    # predicts the probabilities for any subset of garages, days and time intervals
+        # garages: garage pks, every garage in the DB if None
+        # days: days of week (0 = Sunday), every day if None
+        # slots: time intervals, every interval if None
+    # returns (garage pks, array of shape (garages, days, time intervals))
+    def predict_probabilities(self, model, garages=None, days=None, slots=None):
+        if garages is None:
+            garages = garage_registry.pks()
 
+        X_test = prediction_grid(garages, days, slots)
+        preds = model.predict_proba(X_test)
+
+        shape = (len(garages), DAYS_PER_WEEK if days is None else len(days), SLOTS_PER_DAY if slots is None else len(slots))
+
+        return (garages, preds[:, 1].astype(PROBABILITY_DTYPE).reshape(shape))
+
+    # outputs probs to a file
+        # garages: garage pks, every garage in the DB if None
+    def output_probs(self, model, filepath="training_data/pred.txt", garages=None):
         try:
-            preds = model.predict_proba(X_test)
+            if garages is None:
+                garages = garage_registry.pks()
+
+            preds = model.predict_proba(prediction_grid(garages))
             
             with open(filepath, "w") as file:
                 np.savetxt(file, preds)
@@ -194,11 +170,21 @@ class Command(BaseCommand):
             return False
         
         return True
-                      
 
+    # extracts the parks modified since the last run into the training set stored at dataset_path
+        # full: re-extract every park
+    def update_dataset(self, dataset_path, full=False):
+        dataset = TrainingDataset(dataset_path)
+        dataset.load()
+        count = dataset.update(full=full)
+        dataset.save()
+        self.stdout.write('Extracted ' + str(count) + ' new or modified parks')
+
+        return dataset
 
     # Creates /opt/capstone/training_data/tickets<date>.csv with relevent training data from current DB state
-    def create_csv(self, filename=('training_data/tickets_'+date.today().strftime("%m-%d-%Y") +'.csv')):
+        # dataset_path: export the training set stored at dataset_path (see api/training.py) instead of reading the DB
+    def create_csv(self, filename=('training_data/tickets_'+date.today().strftime("%m-%d-%Y") +'.csv'), dataset_path=None):
         training_set = None
         writer = None
         try:
@@ -211,74 +197,18 @@ class Command(BaseCommand):
         try:
             # the data we are training on
             writer = csv.writer(training_set)
-            writer.writerow(['time','day_of_week', 'garage', 'ticketed'])
+            writer.writerow(TRAINING_COLUMNS)
         except:
             return False
 
-        # gets all parks that do have a ticket
-        parksTicketed = Park.objects.exclude(ticket = None).exclude(end = None).iterator()
-        ticketCount = Park.objects.exclude(ticket = None).exclude(end = None).count()
-
-        if(parksTicketed is not None):
-            write_queue = []
-
-            for park in parksTicketed:
-                startTime = park.start
-                endTime = park.end
-                # the int representation of a garage
-                garage = park.garage.id
-                # the time the park recieved a ticket
-                dateTimeTicketed = park.ticket.date 
+        if dataset_path is not None:
+            dataset = TrainingDataset(dataset_path)
+            dataset.load(mmap=True)
+            rows = dataset.rows()
+        else:
+            rows = to_rows(expand_parks(fetch_parks()))
 
-                # gets 15 minute time interval offset
-                startOffset = math.floor(((startTime.hour * 60) + startTime.minute)/15)
-                endOffset = math.floor(((endTime.hour * 60) + endTime.minute)/15)
-                
-                # this is the 15 minute time interval in which the park recieved a ticket
-                ticketOffset = math.floor(((dateTimeTicketed.hour * 60) + dateTimeTicketed.minute)/15)
-
-                # the int representation of a weekday
-                dayCode = ((dateTimeTicketed.weekday() + 1) % 7)
-
-                # ticket the time interval of ticketing, otherwise create a non ticket event
-                for i in range(startOffset, endOffset + 1):
-                    if(i == ticketOffset): 
-                        write_queue.append((i, dayCode, garage, int(WasTicketed.YES)))
-                    else:
-                        write_queue.append((i, dayCode, garage, int(WasTicketed.NO)))
-
-                if len(write_queue) > 100 or ticketCount < 100:
-                    writer.writerows(write_queue)  
-                    write_queue.clear()
-                    time.sleep(0.01)
-
-        # gets all parks that did not result in a ticket
-        parksNotTicketed = Park.objects.filter(ticket = None).exclude(end = None).iterator()
-        ticketCount = Park.objects.filter(ticket = None).exclude(end = None).count()
-        if(parksNotTicketed is not None):
-            write_queue = []
-
-            for park in parksNotTicketed:
-                startTime = park.start
-                endTime = park.end
-                # the int representation of a garage
-                garage = park.garage.id
-
-                # gets 15 minute time interval offset
-                startOffset = math.floor(((startTime.hour * 60) + startTime.minute)/15)
-                endOffset = math.floor(((endTime.hour * 60) + endTime.minute)/15)
-
-                # the int representation of a weekday
-                dayCode = ((startTime.weekday() + 1) % 7)
-
-                # there will always be not ticket events
-                for i in range(startOffset, endOffset + 1):
-                    write_queue.append((i, dayCode, garage, int(WasTicketed.NO)))
-                
-                if len(write_queue) > 100 or ticketCount < 100:
-                    writer.writerows(write_queue)  
-                    write_queue.clear()
-                    time.sleep(0.01)
+        writer.writerows(rows.tolist())
 
         training_set.close()
 
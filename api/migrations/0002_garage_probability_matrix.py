@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+# packs the existing nested probabilities of every garage into the new field
+def pack_garage_probabilities(apps, schema_editor):
+    from api.probabilities import pack_probabilities
+
+    Garage = apps.get_model('api', 'Garage')
+
+    for garage in Garage.objects.all():
+        garage.probability_matrix = pack_probabilities(garage.probability)
+        garage.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='garage',
+            name='probability_matrix',
+            field=models.BinaryField(blank=True, default=None, null=True),
+        ),
+        migrations.RunPython(pack_garage_probabilities, migrations.RunPython.noop),
+    ]
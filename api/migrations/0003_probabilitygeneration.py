@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_garage_probability_matrix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProbabilityGeneration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(blank=True, default=None, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# existing parks have never been extracted incrementally, mark them as modified now
+def set_park_modified(apps, schema_editor):
+    Park = apps.get_model('api', 'Park')
+
+    Park.objects.filter(modified=None).update(modified=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_probabilitygeneration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='park',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+        migrations.RunPython(set_park_modified, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_park_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='garage',
+            name='probability_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+from api.indexes import create_indexes
+
+# the indexes as they were defined when this migration was written, api/indexes.py keeps changing
+PARK_INDEXES = [
+    {
+        'name': 'park_user_start',
+        'keys': [('user_id', 1), ('start', 1), ('id', 1)],
+    },
+    {
+        'name': 'park_end_ticket_garage',
+        'keys': [('end', 1), ('ticket.date', 1), ('garage_id', 1)],
+    },
+    {
+        'name': 'park_open',
+        'keys': [('user_id', 1), ('start', 1)],
+        'options': {'partialFilterExpression': {'end': {'$type': 'null'}}},
+    },
+    {
+        'name': 'park_modified',
+        'keys': [('modified', 1)],
+    },
+]
+
+
+def create_park_indexes(apps, schema_editor):
+    Park = apps.get_model('api', 'Park')
+    schema_editor.connection.ensure_connection()
+
+    create_indexes(schema_editor.connection.connection[Park._meta.db_table], PARK_INDEXES)
+
+
+def drop_park_indexes(apps, schema_editor):
+    Park = apps.get_model('api', 'Park')
+    schema_editor.connection.ensure_connection()
+    collection = schema_editor.connection.connection[Park._meta.db_table]
+
+    for index in PARK_INDEXES:
+        if index['name'] in collection.index_information():
+            collection.drop_index(index['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_garage_probability_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_park_indexes, drop_park_indexes),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+from api.indexes import create_indexes
+
+# the index as it was defined when this migration was written, api/indexes.py keeps changing
+PARK_INDEXES = [
+    {
+        'name': 'park_unassigned_ticket',
+        'keys': [('user_id', 1), ('start', 1), ('id', 1), ('ticket.date', 1)],
+        'options': {'partialFilterExpression': {'end': {'$type': 'null'}, 'ticket': {'$type': 'object'}}},
+    },
+]
+
+
+def create_park_unassigned_ticket_index(apps, schema_editor):
+    Park = apps.get_model('api', 'Park')
+    schema_editor.connection.ensure_connection()
+
+    create_indexes(schema_editor.connection.connection[Park._meta.db_table], PARK_INDEXES)
+
+
+def drop_park_unassigned_ticket_index(apps, schema_editor):
+    Park = apps.get_model('api', 'Park')
+    schema_editor.connection.ensure_connection()
+    collection = schema_editor.connection.connection[Park._meta.db_table]
+
+    for index in PARK_INDEXES:
+        if index['name'] in collection.index_information():
+            collection.drop_index(index['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_park_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_park_unassigned_ticket_index, drop_park_unassigned_ticket_index),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_park_unassigned_ticket_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='garage',
+            name='staged_probability_matrix',
+            field=models.BinaryField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='probabilitygeneration',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
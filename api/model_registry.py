@@ -0,0 +1,133 @@
+import datetime
+import json
+import os
+import threading
+import numpy as np
+import xgboost as xgb
+
+from api.probabilities import off_hours, MINUTES_PER_SLOT, PROBABILITY_DTYPE, OFF_HOURS_PROBABILITY
+
+# Registry of the models trained by xgboost_daily
+# Each model is saved in xgboost's native format (booster.save_model, not pickle) next to registry.json,
+# which records every model with its training metrics and feature schema, and which model is current.
+#     {"current": "<name>", "models": [{"name", "file", "created", "features", "params", "metrics"}, ...]}
+
+MODELS_DIR = 'xgboost_models/'
+REGISTRY_FILENAME = 'registry.json'
+
+# feature columns the models are trained on, in order. see api/training.py
+FEATURES = ['time', 'day_of_week', 'garage']
+
+def registry_path(directory=MODELS_DIR):
+    return os.path.join(directory, REGISTRY_FILENAME)
+
+# returns the registry stored in directory, an empty registry if there is none
+def load_registry(directory=MODELS_DIR):
+    try:
+        with open(registry_path(directory)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {'current': None, 'models': []}
+
+# returns the registry entry of the current model, None if there is none
+def current_entry(registry):
+    for entry in registry['models']:
+        if entry['name'] == registry['current']:
+            return entry
+
+    return None
+
+# saves a trained model (XGBClassifier or Booster) and makes it the current model
+    # params: training params of the model
+    # metrics: dict of metric name -> value, ie) {'cv_auc': 0.83}
+# returns the registry entry of the model
+def register_model(model, params=None, metrics=None, name=None, directory=MODELS_DIR):
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    name = name or datetime.date.today().strftime("%m-%d-%Y")
+
+    os.makedirs(directory, exist_ok=True)
+    filename = name + '.bin'
+    booster.save_model(os.path.join(directory, filename))
+
+    entry = {
+        'name': name,
+        'file': filename,
+        'created': datetime.datetime.now().isoformat(),
+        'features': FEATURES,
+        'params': params or {},
+        'metrics': metrics or {},
+    }
+
+    # a model registered again under the same name (ie. run twice in a day) replaces the old entry
+    registry = load_registry(directory)
+    registry['models'] = [model_entry for model_entry in registry['models'] if model_entry['name'] != name]
+    registry['models'].append(entry)
+    registry['current'] = name
+
+    # replaced in one step, so predictors never read a partially written registry
+    path = registry_path(directory)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(registry, file, indent=4)
+    os.replace(path + '.tmp', path)
+
+    return entry
+
+# Process-wide access to the current model for online predictions
+# The booster is only loaded on the first prediction, and loaded again whenever a new model is registered.
+class Predictor:
+    def __init__(self, directory=MODELS_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.booster = None
+        self.entry = None
+        self.mtime = None
+
+    # returns (booster, registry entry) of the current model, (None, None) if there is none
+    def get_model(self):
+        try:
+            mtime = os.stat(registry_path(self.directory)).st_mtime_ns
+        except OSError:
+            return (None, None)
+
+        with self.lock:
+            if mtime != self.mtime:
+                entry = current_entry(load_registry(self.directory))
+                booster = None
+
+                # models trained on other features can not be used
+                if entry is not None and entry['features'] == FEATURES:
+                    booster = xgb.Booster()
+                    booster.load_model(os.path.join(self.directory, entry['file']))
+
+                self.booster = booster
+                self.entry = entry if booster is not None else None
+                self.mtime = mtime
+
+            return (self.booster, self.entry)
+
+    # returns the probability of a ticket for each garage, None if no model has been registered
+        # garages: garage pks
+        # day_index: day of week, 0 = Sunday
+        # minutes: minutes since midnight, predicted for the 15 minute interval it falls in (the time feature the models are trained on)
+    def predict(self, garages, day_index, minutes):
+        booster, entry = self.get_model()
+
+        if booster is None:
+            return None
+
+        slot = minutes // MINUTES_PER_SLOT
+
+        # the intervals outside of enforcement get the probability xgboost_daily stores for them
+        if off_hours([day_index], [slot])[0][0]:
+            return np.full(len(garages), OFF_HOURS_PROBABILITY, dtype=PROBABILITY_DTYPE)
+
+        X = np.zeros((len(garages), len(FEATURES)), dtype=np.float32)
+        X[:, 0] = slot
+        X[:, 1] = day_index
+        X[:, 2] = garages
+
+        # widened like the stored probabilities, so both endpoints serve the same values
+        return booster.predict(xgb.DMatrix(X)).astype(PROBABILITY_DTYPE)
+
+# process-wide instance used by the garage views
+predictor = Predictor()
@@ -40,13 +40,50 @@ class Garage(models.Model):
     # whether the enforcement period applies to weekends. Default is False
     enforced_on_weekends = models.BooleanField(default=False)
     # array/list of DayProbability. [0] = Sunday, ..., [6] = Saturday
+    # packed into probability_matrix when it is set, xgboost_daily writes both
+    # assign a new list to change the probabilities, changes made in place are not packed
     probability = models.ArrayField(model_container=DayProbability)
+    # packed 7x96 copy of probability, read by the api instead of the nested documents. see api/probabilities.py
+    probability_matrix = models.BinaryField(null=True, blank=True, default=None)
+    # probabilities written by xgboost_daily for probability_version, only read once that version is committed. see api/cache.py
+    staged_probability_matrix = models.BinaryField(null=True, blank=True, default=None)
+    # probability version staged_probability_matrix was written for
+    probability_version = models.IntegerField(default=0)
     latitude = models.FloatField()
     longitude = models.FloatField()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Garage, cls).from_db(db, field_names, values)
+        # the nested documents as loaded, None if they were deferred. see save
+        instance._loaded_probability = instance.__dict__.get('probability')
+
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .probabilities import pack_probabilities
+
+        # only pack the nested documents when they were set, a garage loaded with defer('probability') does not load them
+        # and a garage saved with the documents it was loaded with keeps the matrix written by xgboost_daily
+        probability = self.__dict__.get('probability')
+        if probability is not None and (self._state.adding or probability is not getattr(self, '_loaded_probability', None)):
+            self.probability_matrix = pack_probabilities(probability)
+
+        super(Garage, self).save(*args, **kwargs)
+
+        self._loaded_probability = probability
+
     def __str__(self):
         return self.name
 
+class ProbabilityGeneration(models.Model):
+    # incremented every time the garage probabilities are rewritten. used to invalidate cached responses
+    generation = models.IntegerField(default=0)
+    # dateTime of the last increment
+    updated = models.DateTimeField(null=True, blank=True, default=None)
+    # last probability version committed by write_probabilities, the staged matrices of versions up to it are read
+    version = models.IntegerField(default=0)
+
 class Ticket(models.Model):
     # dateTime of the ticket. Cannot be None/NULL
     date = models.DateTimeField(null=False, blank=False)
@@ -68,6 +105,8 @@ class Park(models.Model):
     garage = models.ForeignKey(Garage, on_delete=models.CASCADE, null=False, blank=False)
     # user who created the park. Cannot be None/NULL
     user = models.ForeignKey('User', on_delete=models.SET_NULL, null=True, blank=True)
+    # dateTime of the last save. used to only extract new/changed parks for the training data
+    modified = models.DateTimeField(auto_now=True, null=True)
 
 class User(AbstractUser):
     username = None
@@ -0,0 +1,54 @@
+from django.db import connections, DEFAULT_DB_ALIAS
+from pymongo import ReturnDocument
+
+# Direct access to the mongo collections behind the djongo models,
+# for the batched writes that djongo's SQL translation issues one document at a time.
+
+# returns the pymongo collection of a model
+def get_collection(model, using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    connection.ensure_connection()
+
+    return connection.connection[model._meta.db_table]
+
+# returns value the way djongo stores it for the field of model, so documents written directly read back the same
+def to_db_value(model, field_name, value, using=DEFAULT_DB_ALIAS):
+    field = model._meta.get_field(field_name)
+
+    return field.get_db_prep_save(value, connections[using])
+
+# returns the fields of a model instance the way djongo stores them, for direct $set updates
+# auto_now fields are set to the current date, as in save()
+def to_document(instance, field_names, using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    document = {}
+
+    for name in field_names:
+        field = instance._meta.get_field(name)
+        value = field.pre_save(instance, False)
+        document[field.attname] = field.get_db_prep_save(value, connection)
+
+    return document
+
+# reserves count consecutive auto ids of a model, from the counter djongo uses for its inserts
+# documents given these ids can be inserted directly and keep their pks. returns the list of ids
+# The counter is djongo internals: djongo 1.3 (the version in requirements.txt) keeps one document per table in the
+# __schema__ collection, {'name': <table>, 'auto': {'field_names': [...], 'seq': <last id>}}, and increments auto.seq
+# for every insert. A counter of our own would hand out ids djongo also gives to its inserts, so this one is used.
+# raises RuntimeError if there is no such counter, ie. with a djongo version that stores it differently
+def reserve_ids(model, count, using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    connection.ensure_connection()
+
+    schema = connection.connection['__schema__'].find_one_and_update(
+        {'name': model._meta.db_table, 'auto.seq': {'$type': 'number'}},
+        {'$inc': {'auto.seq': count}},
+        return_document=ReturnDocument.AFTER
+    )
+
+    if schema is None:
+        raise RuntimeError('No djongo auto id counter for ' + model._meta.db_table)
+
+    last = schema['auto']['seq']
+
+    return list(range(last - count + 1, last + 1))
@@ -0,0 +1,62 @@
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# Cursor (keyset) pagination over a datetime field and the pk
+# The cursor encodes the (datetime, pk) of the last item of a page, the next page is every item after it in (datetime, pk) order.
+# Unlike offsets, pages stay correct while items are added, and every page costs the same query.
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(date, pk):
+    return base64.urlsafe_b64encode((date.isoformat() + '|' + str(pk)).encode()).decode()
+
+# returns (date, pk), None if the cursor is invalid
+def decode_cursor(cursor):
+    try:
+        date, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except:
+        return None
+
+    if date is None:
+        return None
+
+    return (date, pk)
+
+# returns limit parsed from the query params, DEFAULT_PAGE_SIZE if None, None if invalid
+def parse_limit(limit):
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+
+    try:
+        limit = int(limit)
+    except:
+        return None
+
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return None
+
+    return limit
+
+# returns (items, next cursor) of the page of queryset after cursor. the next cursor is None on the last page
+    # field: datetime field the items are ordered by, ties are ordered by pk
+    # cursor: decoded cursor (see decode_cursor), the first page if None
+def paginate(queryset, field, cursor, limit):
+    if cursor is not None:
+        date, pk = cursor
+        queryset = queryset.filter(Q(**{field + '__gt': date}) | Q(**{field: date, 'pk__gt': pk}))
+
+    # one more than the limit, to know whether there is a next page
+    items = list(queryset.order_by(field, 'pk')[:limit + 1])
+
+    if len(items) <= limit:
+        return (items, None)
+
+    items = items[:limit]
+    last = items[-1]
+
+    return (items, encode_cursor(getattr(last, field), last.pk))
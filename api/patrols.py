@@ -0,0 +1,65 @@
+import bisect
+import numpy as np
+
+# Index of the patrol visits of each garage, built once from get_patrol_times_list (api/views.py)
+# The visits of each garage are kept sorted by start, as seconds since midnight since the patrols repeat every day.
+# The visits overlapping a time range are found with a bisect on the starts instead of scanning every route's patrol times:
+# a visit can only overlap [start, end) if it starts in (start - longest visit, end).
+
+def seconds_since_midnight(date):
+    return date.hour * 3600 + date.minute * 60 + date.second
+
+class PatrolIndex:
+    # patrol_times: list of get_patrol_times_list results (lot name, visit start, visit end), one per route
+    def __init__(self, patrol_times):
+        visits = {}
+
+        for route_times in patrol_times:
+            for lot_name, lot_start, lot_end in route_times:
+                visits.setdefault(lot_name, []).append((seconds_since_midnight(lot_start), seconds_since_midnight(lot_end)))
+
+        self.starts = {}
+        self.ends = {}
+        # length of the longest visit, bounds how far before a time range an overlapping visit can start
+        self.max_length = 0
+
+        for lot_name, lot_visits in visits.items():
+            lot_visits.sort()
+            self.starts[lot_name] = [visit[0] for visit in lot_visits]
+            self.ends[lot_name] = [visit[1] for visit in lot_visits]
+            self.max_length = max([self.max_length] + [end - start for start, end in lot_visits])
+
+    def __contains__(self, garage):
+        return garage in self.starts
+
+    # returns the names of the garages that are patrolled
+    def garages(self):
+        return list(self.starts)
+
+    # returns (visit starts, visit ends) of a garage as arrays, for vectorized lookups. empty arrays if it is not patrolled
+    def windows(self, garage):
+        return (np.array(self.starts.get(garage, []), dtype=np.int64), np.array(self.ends.get(garage, []), dtype=np.int64))
+
+    # returns the visits (start, end) of a garage that overlap [start, end), seconds since midnight
+    def overlapping(self, garage, start, end):
+        if garage not in self.starts:
+            return []
+
+        starts = self.starts[garage]
+        ends = self.ends[garage]
+
+        low = bisect.bisect_right(starts, start - self.max_length)
+        high = bisect.bisect_left(starts, end)
+
+        return [(starts[i], ends[i]) for i in range(low, high) if ends[i] > start]
+
+    # returns the visits of a garage in progress at time, seconds since midnight
+    def active(self, garage, time):
+        return self.overlapping(garage, time, time + 1)
+
+    # returns the start of the next visit of a garage at or after time, None if there is none that day
+    def next_visit(self, garage, time):
+        starts = self.starts.get(garage, [])
+        i = bisect.bisect_left(starts, time)
+
+        return starts[i] if i < len(starts) else None
@@ -0,0 +1,108 @@
+import datetime
+import numpy as np
+
+# local models
+from api.models import DAYS_OF_WEEK, DayProbability, Probability
+
+# a garage's probabilities are stored as one packed 7x96 matrix of little-endian doubles
+# row = day of week ([0] = Sunday, ..., [6] = Saturday), column = 15 minute time interval ([0] = 00:00, ..., [95] = 23:45)
+# doubles are used (instead of float32) so the values served match the values written exactly
+DAYS_PER_WEEK = 7
+SLOTS_PER_DAY = 96
+MINUTES_PER_SLOT = 15
+PROBABILITY_DTYPE = np.dtype('<f8')
+# matrices packed as float32 for a while, still read until they are rewritten
+FLOAT32_PROBABILITY_DTYPE = np.dtype('<f4')
+
+# short day codes in the same order as the matrix rows. ie) DAY_CODES[0] == 'Sun'
+DAY_CODES = [day[0] for day in DAYS_OF_WEEK]
+DAY_INDEXES = {day_code: i for i, day_code in enumerate(DAY_CODES)}
+
+# start time of each time interval, column order
+SLOT_TIME_OBJECTS = [datetime.time(hour=(i * MINUTES_PER_SLOT) // 60, minute=(i * MINUTES_PER_SLOT) % 60) for i in range(SLOTS_PER_DAY)]
+# the time strings as they are serialized by the api. ie) SLOT_TIMES[1] == '00:15:00'
+SLOT_TIMES = [slot_time.isoformat() for slot_time in SLOT_TIME_OBJECTS]
+
+# probability of the intervals outside of enforcement, written by xgboost_daily and served by the predict endpoint
+OFF_HOURS_PROBABILITY = 0.01
+
+# returns a boolean array of shape (days, time intervals), True for the intervals outside of enforcement:
+# weekends, and before 7:00am or after 6:00pm on weekdays
+# days: days of week (0 = Sunday), every day if None
+# slots: time intervals, every interval if None
+def off_hours(days=None, slots=None):
+    days = np.arange(DAYS_PER_WEEK) if days is None else np.asarray(days)
+    slots = np.arange(SLOTS_PER_DAY) if slots is None else np.asarray(slots)
+
+    day_grid, slot_grid = np.meshgrid(days, slots, indexing='ij')
+
+    return (slot_grid < 28) | (slot_grid > 72) | (day_grid == DAY_INDEXES['Sun']) | (day_grid == DAY_INDEXES['Sat'])
+
+# packs a list of DayProbability into the bytes stored on Garage.probability_matrix
+# returns None if the list does not describe every interval of every day in order
+def pack_probabilities(day_probabilities):
+    if day_probabilities is None or len(day_probabilities) != DAYS_PER_WEEK:
+        return None
+
+    matrix = np.zeros((DAYS_PER_WEEK, SLOTS_PER_DAY), dtype=PROBABILITY_DTYPE)
+
+    for i, day_probability in enumerate(day_probabilities):
+        if day_probability.day_of_week != DAY_CODES[i] or len(day_probability.probability) != SLOTS_PER_DAY:
+            return None
+
+        for j, interval_probability in enumerate(day_probability.probability):
+            if interval_probability.time != SLOT_TIME_OBJECTS[j]:
+                return None
+
+            matrix[i][j] = interval_probability.probability
+
+    return pack_matrix(matrix)
+
+# builds the list of DayProbability stored on Garage.probability from a 7x96 array-like of probabilities
+def unpack_probabilities(matrix):
+    rows = np.asarray(matrix, dtype=PROBABILITY_DTYPE).tolist()
+
+    day_probabilities = []
+    for day_code, day_probs in zip(DAY_CODES, rows):
+        interval_probabilities = [Probability(time=slot_time, probability=p) for slot_time, p in zip(SLOT_TIME_OBJECTS, day_probs)]
+        day_probabilities.append(DayProbability(day_of_week=day_code, probability=interval_probabilities))
+
+    return day_probabilities
+
+# packs a 7x96 array-like of probabilities
+def pack_matrix(matrix):
+    return np.ascontiguousarray(matrix, dtype=PROBABILITY_DTYPE).reshape((DAYS_PER_WEEK, SLOTS_PER_DAY)).tobytes()
+
+# returns a read-only 7x96 view over packed bytes (no copy is made)
+def unpack_matrix(data):
+    dtype = FLOAT32_PROBABILITY_DTYPE if len(data) == DAYS_PER_WEEK * SLOTS_PER_DAY * FLOAT32_PROBABILITY_DTYPE.itemsize else PROBABILITY_DTYPE
+
+    return np.frombuffer(data, dtype=dtype).reshape((DAYS_PER_WEEK, SLOTS_PER_DAY))
+
+# returns probabilities as rounded uint8 percentages (0-100), the compact api format
+def to_percentages(probabilities):
+    return np.rint(np.asarray(probabilities) * 100).astype(np.uint8)
+
+# returns the garage's probabilities as a 7x96 array, or None if they have not been packed yet
+# version: committed probability version (see api/cache.py). the staged probabilities are read if they were written
+# for it or an earlier version. None to ignore the staged probabilities
+def load_probability_matrix(garage, version=None):
+    data = garage.probability_matrix
+
+    staged = garage.staged_probability_matrix
+    if staged and version is not None and garage.probability_version <= version:
+        data = staged
+
+    if not data:
+        return None
+
+    return unpack_matrix(bytes(data))
+
+# converts a "HH:MM" string into its time interval index. returns None if the string is invalid
+def parse_slot(time):
+    try:
+        time_object = datetime.datetime.strptime(time, "%H:%M")
+    except:
+        return None
+
+    return (time_object.hour * 60 + time_object.minute) // MINUTES_PER_SLOT
@@ -0,0 +1,6 @@
+from rest_framework.renderers import JSONRenderer
+
+# JSON renderer selected with ?format=compact
+# the garage views render the compact probability format for it (see compact_probability_data in api/serializers.py)
+class CompactJSONRenderer(JSONRenderer):
+    format = 'compact'
@@ -6,6 +6,7 @@ from rest_framework.fields import CurrentUserDefault
 import re
 
 from .models import Probability, DayProbability, Garage, Ticket, Park, User, PasswordResetToken
+from .probabilities import load_probability_matrix, pack_probabilities, unpack_matrix, to_percentages, parse_slot, DAY_CODES, DAY_INDEXES, DAYS_PER_WEEK, SLOTS_PER_DAY, SLOT_TIMES
 
 class ProbabilitySerializer(serializers.ModelSerializer):
     class Meta:
@@ -43,6 +44,11 @@ class GarageSerializer(serializers.ModelSerializer):
     def get_probability_data(self, obj):
         day_of_week = self.context.get('day_of_week', None)
 
+        # read from the packed matrix when available, avoids decoding the nested documents
+        matrix = load_probability_matrix(obj, self.context.get('probability_version', None))
+        if matrix is not None:
+            return self.get_matrix_probability_data(matrix, day_of_week)
+
         if day_of_week:
             days_of_week = {
                 'Sun': 0,
@@ -63,10 +69,133 @@ class GarageSerializer(serializers.ModelSerializer):
             serializer = DayProbabilitySerializer(obj.probability, many=True, context=self.context)
             return serializer.data
 
+    # same output as DayProbabilitySerializer, built from a 7x96 probability matrix
+    def get_matrix_probability_data(self, matrix, day_of_week):
+        time = self.context.get('time', None)
+
+        return matrix_probability_data(matrix, get_day_index(day_of_week), get_time_slot(time))
+
     class Meta:
         model = Garage
         fields = ('pk', 'name', 'start_enforce_time', 'end_enforce_time', 'enforced_on_weekends', 'probability', 'latitude', 'longitude')
 
+# marks an invalid day_of_week/time in the url
+INVALID = -1
+
+# returns the matrix row requested by day_of_week. INVALID for an invalid day, None when no day was requested
+def get_day_index(day_of_week):
+    if not day_of_week:
+        return None
+
+    if day_of_week not in DAY_INDEXES:
+        return INVALID
+
+    return DAY_INDEXES[day_of_week]
+
+# returns the time interval requested by time. INVALID for an invalid time, None when no time was requested
+def get_time_slot(time):
+    if not time:
+        return None
+
+    slot = parse_slot(time)
+
+    if slot is None:
+        return INVALID
+
+    return slot
+
+# builds the serialized probability data of a garage from its 7x96 probability matrix
+    # day_index: matrix row of the requested day, None for every day, INVALID for an invalid day
+    # slot: time interval of the requested time, None for every interval, INVALID for an invalid time
+def matrix_probability_data(matrix, day_index, slot):
+    if day_index == INVALID:
+        return None
+
+    if day_index is None:
+        rows = matrix.tolist()
+        day_indexes = range(DAYS_PER_WEEK)
+    else:
+        rows = [matrix[day_index].tolist()]
+        day_indexes = [day_index]
+
+    data = []
+    for i, day_probs in zip(day_indexes, rows):
+        if slot is None:
+            probability = [{'time': slot_time, 'probability': p} for slot_time, p in zip(SLOT_TIMES, day_probs)]
+        elif slot == INVALID:
+            probability = None
+        else:
+            probability = {'time': SLOT_TIMES[slot], 'probability': day_probs[slot]}
+
+        data.append({'day_of_week': DAY_CODES[i], 'probability': probability})
+
+    if day_index is not None:
+        return data[0]
+
+    return data
+
+# builds the compact probability data of a garage from its 7x96 probability matrix, as percentages (0-100)
+# the time intervals are implied by the position: 7x96 for every day, 96 for one day, one value for one day and time
+def compact_probability_data(matrix, day_index, slot):
+    if day_index == INVALID or slot == INVALID:
+        return None
+
+    percentages = to_percentages(matrix if day_index is None else matrix[day_index])
+
+    if slot is not None:
+        percentages = percentages[..., slot]
+
+    return percentages.tolist()
+
+# same output as TimeField.to_representation
+def time_representation(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, str):
+        return value
+
+    return value.isoformat()
+
+# Read-only fast path for GarageSerializer, produces the exact same output.
+# Builds each garage's data directly from its probability matrix instead of going through a DRF field per value.
+# Garages that do not have a packed probability matrix are passed to GarageSerializer.
+# With context['compact'], the probability is given by compact_probability_data instead.
+class GarageReadSerializer(serializers.BaseSerializer):
+    def to_representation(self, obj):
+        matrix = load_probability_matrix(obj, self.context.get('probability_version', None))
+        compact = self.context.get('compact', False)
+
+        if matrix is None and compact:
+            data = pack_probabilities(obj.probability)
+            matrix = unpack_matrix(data) if data is not None else None
+
+        if matrix is None and not compact:
+            return GarageSerializer(obj, context=self.context).data
+
+        # the day/time are the same for every garage, only parse them once
+        if not hasattr(self, 'probability_args'):
+            self.probability_args = (get_day_index(self.context.get('day_of_week', None)), get_time_slot(self.context.get('time', None)))
+
+        return {
+            'pk': obj.pk,
+            'name': obj.name,
+            'start_enforce_time': time_representation(obj.start_enforce_time),
+            'end_enforce_time': time_representation(obj.end_enforce_time),
+            'enforced_on_weekends': bool(obj.enforced_on_weekends),
+            'probability': self.get_probability_data(matrix, compact),
+            'latitude': float(obj.latitude),
+            'longitude': float(obj.longitude),
+        }
+
+    def get_probability_data(self, matrix, compact):
+        if not compact:
+            return matrix_probability_data(matrix, *self.probability_args)
+
+        if matrix is None:
+            return None
+
+        return compact_probability_data(matrix, *self.probability_args)
+
 class GarageSimpleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Garage
@@ -78,12 +207,44 @@ class TicketSerializer(serializers.ModelSerializer):
         fields = ('date', 'day_of_week')
         read_only_fields = ('day_of_week',)
 
+# reads the garage from a map of garage pk -> Garage in the context when there is one, instead of a query per park
+class GarageRelatedField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        garages = self.context.get('garages', None)
+
+        if garages is not None:
+            try:
+                return garages[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        return super(GarageRelatedField, self).to_internal_value(data)
+
 class ParkSerializer(serializers.ModelSerializer):
-    garage = GarageSimpleSerializer(read_only=True)
-    garage_id = serializers.PrimaryKeyRelatedField(queryset=Garage.objects.all(), source='garage', write_only=True)
+    garage = serializers.SerializerMethodField('get_garage_data')
+    garage_id = GarageRelatedField(queryset=Garage.objects.all(), source='garage', write_only=True)
     ticket = TicketSerializer(required=False, allow_null=True, default=None)
     end = serializers.DateTimeField(required=False, allow_null=True, default=None)
 
+    # fields: only serialize these fields
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+
+        super(ParkSerializer, self).__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    # same output as GarageSimpleSerializer. the garage is not fetched when the context has a map of garage pk -> name
+    def get_garage_data(self, obj):
+        garage_names = self.context.get('garage_names', None)
+
+        if garage_names is not None and obj.garage_id in garage_names:
+            return {'pk': obj.garage_id, 'name': garage_names[obj.garage_id]}
+
+        return GarageSimpleSerializer(obj.garage).data
+
     class Meta:
         model = Park
         fields = ('pk', 'start', 'end', 'ticket', 'garage', 'garage_id', 'user')
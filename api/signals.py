@@ -0,0 +1,63 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+# local models
+from api.models import Garage, User
+from api.cache import garage_response_cache, probability_window_index, bump_probability_generation
+from api.authentication import token_cache
+from api.garage_registry import garage_registry
+from rest_framework.authtoken.models import Token
+
+# the garage fields the garage responses are rendered from
+GARAGE_RESPONSE_FIELDS = ('name', 'start_enforce_time', 'end_enforce_time', 'enforced_on_weekends', 'probability_matrix', 'latitude', 'longitude')
+
+def get_response_state(instance):
+    # deferred fields are not loaded just for this
+    return tuple(instance.__dict__.get(name) for name in GARAGE_RESPONSE_FIELDS)
+
+@receiver(post_init, sender=Garage)
+def garage_loaded(sender, instance, **kwargs):
+    instance._response_state = get_response_state(instance)
+
+# a garage created, deleted or saved with a change to its response invalidates the cached garage responses of every process
+# other saves (ie. the same values) keep the cached responses and ETags
+@receiver(post_save, sender=Garage)
+@receiver(post_delete, sender=Garage)
+def garage_changed(sender, instance, created=False, **kwargs):
+    state = get_response_state(instance)
+    changed = created or kwargs['signal'] is post_delete or state != getattr(instance, '_response_state', None)
+    instance._response_state = state
+
+    if not changed:
+        return
+
+    bump_probability_generation()
+    garage_response_cache.clear()
+    probability_window_index.clear()
+    # the registry holds the names and coordinates, which are part of the responses
+    garage_registry.invalidate()
+
+# a deleted token (logout) can not be used anymore
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+# the fields that decide whether a user can authenticate, as they were loaded
+def get_credentials_state(instance):
+    # deferred fields are not loaded just for this
+    return (instance.__dict__.get('is_active'), instance.__dict__.get('password'))
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance._credentials_state = get_credentials_state(instance)
+
+# a user that was deactivated or changed their password (update, password reset) is looked up again on its next request
+# other changes don't affect authentication, the views that return the user's details read it again
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    state = get_credentials_state(instance)
+
+    if not created and state != getattr(instance, '_credentials_state', None):
+        token_cache.invalidate_user(instance.pk)
+
+    instance._credentials_state = state
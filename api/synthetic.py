@@ -0,0 +1,173 @@
+import datetime
+import numpy as np
+
+from django.utils import timezone
+
+# local models
+from api.models import Park
+from api.mongo import get_collection, reserve_ids
+
+# Synthetic park data for load testing, same model as create_parks_updated in api/views.py:
+# every PARK_INTERVAL minutes of the enforcement hours a park is attempted in each garage, and a park that overlaps
+# a patrol visit of its garage (on a weekday, see api/patrols.py) is ticketed during the visit.
+# The parks of a day are sampled as arrays with a seeded numpy Generator, and written as raw Park documents
+# with insert_many in chunks instead of one Park.objects.create per park.
+
+# start of the patrols (7:00am) and length of the enforcement hours (until 6:00pm), in minutes
+PATROL_START = 7 * 60
+PATROL_MINUTES = 660
+# parks are attempted every PARK_INTERVAL minutes
+PARK_INTERVAL = 5
+# documents per insert_many
+CHUNK_SIZE = 10000
+
+# samples the parks of one day
+    # rng: numpy.random.Generator
+    # day: date of the day, tickets are only given on weekdays
+    # garages: garage names, the parks reference garages by their index in this list
+    # patrols: PatrolIndex of the patrol visits
+    # park_percent_thresh, park_ticket_percent_thresh, park_max_time, park_min_time, parks_per_iteration: see create_parks_updated
+# returns dict of arrays, one value per park:
+#     start, end, ticket: seconds since midnight of day. ticket is -1 if the park is not ticketed
+#     garage: index of the garage in garages
+def generate_day(rng, day, garages, patrols, park_percent_thresh=35, park_ticket_percent_thresh=98, park_max_time=240, park_min_time=10, parks_per_iteration=1):
+    # random start within 0-45 minutes of the start of the patrols
+    begin = (PATROL_START + int(rng.integers(0, 45))) * 60
+
+    # one row per start time, the same start/length is attempted in every garage
+    start = begin + np.repeat(np.arange(0, PATROL_MINUTES, PARK_INTERVAL), parks_per_iteration) * 60
+    end = start + rng.integers(park_min_time, park_max_time, len(start)) * 60
+
+    # decide whether or not to attempt a park in each garage
+    attempted = rng.random((len(start), len(garages))) * 100 > park_percent_thresh
+    ticket = np.full(attempted.shape, -1, dtype=np.int64)
+
+    # only give out tickets on weekdays
+    if day.weekday() < 5:
+        for g, name in enumerate(garages):
+            if name not in patrols:
+                continue
+
+            visit_start, visit_end = patrols.windows(name)
+            rows = np.flatnonzero(attempted[:, g])
+
+            # only the visits starting in (park start - longest visit, park end) can overlap a park,
+            # their range is found with a bisect on the sorted visit starts (see PatrolIndex)
+            first_visit = np.searchsorted(visit_start, start[rows] - patrols.max_length, side='right')
+            last_visit = np.searchsorted(visit_start, end[rows], side='left')
+            width = int((last_visit - first_visit).max()) if len(rows) else 0
+
+            if width == 0:
+                continue
+
+            # (parks, candidate visits), parks with fewer candidates than width are padded with masked out visits
+            candidates = first_visit[:, None] + np.arange(width)
+            valid = candidates < last_visit[:, None]
+            candidates = np.minimum(candidates, len(visit_start) - 1)
+            candidate_start = visit_start[candidates]
+            candidate_end = visit_end[candidates]
+            park_start = start[rows, None]
+            park_end = end[rows, None]
+
+            # the park overlaps the start of the visit, or starts during the visit
+            before = valid & (park_start < candidate_start) & (park_end > candidate_start)
+            during = valid & (candidate_start < park_start) & (candidate_end > park_start)
+
+            # each overlapping visit tickets the park with the ticket probability, the first one that does is kept
+            tickets = (before | during) & (rng.random(before.shape) * 100 < park_ticket_percent_thresh)
+            ticketed = tickets.any(axis=1)
+            candidate = tickets.argmax(axis=1)[ticketed]
+            visit = candidates[ticketed, candidate]
+            rows = rows[ticketed]
+
+            # ticket at a random second of the overlap
+            visit_before = before[ticketed, candidate]
+            low = np.where(visit_before, visit_start[visit], start[rows])
+            high = np.where(visit_before, end[rows], visit_end[visit])
+            ticket[rows, g] = low + rng.integers(0, high - low + 1)
+
+    # parks without a ticket are tested against the threshold again, too many parks would be created otherwise
+    created = (ticket >= 0) | (attempted & (rng.random(attempted.shape) * 100 > park_percent_thresh))
+    rows, garage = np.nonzero(created)
+
+    return {
+        'start': start[rows],
+        'end': end[rows],
+        'ticket': ticket[rows, garage],
+        'garage': garage,
+    }
+
+# converts seconds since midnight of day into datetimes, with the millisecond precision of the DB
+def to_datetimes(day, seconds):
+    midnight = np.datetime64(datetime.datetime.combine(day, datetime.time()), 'ms')
+
+    return (midnight + np.asarray(seconds).astype('timedelta64[s]')).tolist()
+
+# returns the parks of generate_day as Park documents, stored the way djongo stores them
+    # garage_pks: pk of each garage index
+    # users: user pk of each park
+    # pks: pk of each park, see reserve_ids
+def to_documents(parks, day, garage_pks, users, pks):
+    starts = to_datetimes(day, parks['start'])
+    ends = to_datetimes(day, parks['end'])
+    tickets = to_datetimes(day, np.maximum(parks['ticket'], 0))
+    ticketed = (parks['ticket'] >= 0).tolist()
+    garages = np.asarray(garage_pks)[parks['garage']].tolist()
+    modified = timezone.now()
+
+    return [
+        {
+            'id': pk,
+            'start': start,
+            'end': end,
+            'ticket': {'date': ticket} if is_ticketed else None,
+            'garage_id': garage_pk,
+            'user_id': user_pk,
+            'modified': modified,
+        }
+        for pk, start, end, ticket, is_ticketed, garage_pk, user_pk in zip(pks, starts, ends, tickets, ticketed, garages, users)
+    ]
+
+# writes the parks of generate_day to the DB. returns the number of parks written
+    # garage_pks: pk of each garage index
+    # user_pks: the parks are assigned to these users at random
+def insert_parks(rng, parks, day, garage_pks, user_pks, chunk_size=CHUNK_SIZE):
+    count = len(parks['start'])
+    if count == 0:
+        return 0
+
+    users = np.asarray(user_pks)[rng.integers(0, len(user_pks), count)].tolist()
+    pks = reserve_ids(Park, count)
+    collection = get_collection(Park)
+
+    for i in range(0, count, chunk_size):
+        chunk = {name: values[i:i + chunk_size] for name, values in parks.items()}
+        collection.insert_many(to_documents(chunk, day, garage_pks, users[i:i + chunk_size], pks[i:i + chunk_size]), ordered=False)
+
+    return count
+
+# returns a seed for each day, so that a day generates the same parks whichever process generates it
+def day_seeds(seed, count):
+    return np.random.SeedSequence(seed).spawn(count)
+
+# generates and writes the parks of one day. returns (parks, tickets) written
+    # seed: seed of the day, see day_seeds
+    # garages: list of (pk, name)
+    # options: see generate_day
+def generate_parks_for_day(seed, day, garages, patrols, user_pks, chunk_size=CHUNK_SIZE, **options):
+    rng = np.random.default_rng(seed)
+
+    parks = generate_day(rng, day, [name for pk, name in garages], patrols, **options)
+    count = insert_parks(rng, parks, day, [pk for pk, name in garages], user_pks, chunk_size)
+
+    return (count, int((parks['ticket'] >= 0).sum()))
+
+# generates and writes the parks of every day. returns the number of parks written
+    # seed: the same seed generates the same parks
+def generate_parks(days, garages, patrols, user_pks, seed=None, chunk_size=CHUNK_SIZE, **options):
+    count = 0
+
+    for day, day_seed in zip(days, day_seeds(seed, len(days))):
+        count += generate_parks_for_day(day_seed, day, garages, patrols, user_pks, chunk_size, **options)[0]
+
+    return count
@@ -0,0 +1,232 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import json
+import gzip
+import pickle
+import numpy as np
+from pymongo.errors import PyMongoError
+from unittest.mock import patch
+
+from api.models import Garage, User
+from api.serializers import GarageSerializer
+from api.authentication import token_cache
+from api.cache import GarageResponseCache, garage_response_cache, bump_probability_generation, get_probability_generation, write_probabilities, get_probability_state
+from api.probabilities import load_probability_matrix, pack_probabilities, pack_matrix, unpack_matrix
+
+class GarageCacheTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        garage_response_cache.clear()
+        token_cache.clear()
+
+        # import first (209 Hitt St) and second garage (AV1) from pickle dump
+        with(open("api/tests/xgboost_tests_resources/garages.dat", "rb")) as file:
+            garages = pickle.load(file)
+            garage = garages[0]
+            self.garage1 = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+            garage = garages[1]
+            self.garage2 = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+
+        existing_user_data = {
+            "email": "existing@user.com",
+            "first_name": "Existing",
+            "last_name": "User",
+            "phone": "5735735733"
+        }
+
+        self.user = User.objects.create(**existing_user_data)
+        self.user.set_password("defaultpassword")
+        self.user.save()
+
+        self.user_token = Token.objects.create(user=self.user)
+
+    def test_bump_probability_generation(self):
+        generation, updated = get_probability_generation()
+
+        res = bump_probability_generation()
+
+        self.assertEqual(res, generation + 1)
+        self.assertEqual(get_probability_generation()[0], generation + 1)
+
+    def test_get_or_render_caches_response(self):
+        cache = GarageResponseCache(check_interval=0)
+
+        content = cache.get_or_render((None, 'Mon', '12:00'))
+
+        self.assertEqual(cache.get((None, 'Mon', '12:00')), content)
+        self.assertEqual(json.loads(content), GarageSerializer(Garage.objects.all(), many=True, context={'day_of_week': 'Mon', 'time': '12:00'}).data)
+
+    def test_generation_bump_clears_cache(self):
+        cache = GarageResponseCache(check_interval=0)
+        cache.get_or_render((self.garage1.pk, None, None))
+
+        bump_probability_generation()
+
+        assert cache.get((self.garage1.pk, None, None)) is None
+
+    def test_garage_save_clears_cache(self):
+        garage_response_cache.get_or_render((None, None, None))
+
+        self.garage2.name = 'Renamed'
+        self.garage2.save()
+
+        response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        response_content = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_content[1]['name'], 'Renamed')
+
+    def test_unchanged_garage_save_keeps_cache(self):
+        generation = get_probability_generation()[0]
+
+        garage = Garage.objects.get(pk=self.garage2.pk)
+        garage.save()
+        garage = Garage.objects.defer('probability').get(pk=self.garage2.pk)
+        garage.save()
+
+        self.assertEqual(get_probability_generation()[0], generation)
+
+        garage.latitude = garage.latitude + 1
+        garage.save()
+
+        self.assertEqual(get_probability_generation()[0], generation + 1)
+
+    def test_max_entries(self):
+        cache = GarageResponseCache(check_interval=0, max_entries=2)
+
+        cache.get_or_render((None, 'Mon', None))
+        cache.get_or_render((None, 'Tue', None))
+        cache.get_or_render((None, 'Wed', None))
+
+        self.assertEqual(len(cache.responses), 2)
+        assert (None, 'Mon', None) not in cache.responses
+
+    def test_warm(self):
+        cache = GarageResponseCache(check_interval=0)
+
+        res = cache.warm()
+
+        # full list, one list per day and one response per garage
+        self.assertEqual(res, 1 + 7 + 2)
+        self.assertEqual(json.loads(cache.get((self.garage1.pk, None, None))), GarageSerializer(self.garage1).data)
+
+    def test_write_probabilities(self):
+        generation, updated = get_probability_generation()
+        matrix1 = np.full((7, 96), 0.25)
+        matrix2 = np.full((7, 96), 0.75)
+
+        res = write_probabilities({self.garage1.pk: matrix1, self.garage2.pk: matrix2})
+
+        self.assertEqual(res, generation + 1)
+
+        garage1 = Garage.objects.get(pk=self.garage1.pk)
+        self.assertEqual(garage1.probability_version, get_probability_state()[2])
+        self.assertEqual(load_probability_matrix(garage1).tolist(), matrix1.tolist())
+        # the staged matrix is moved once committed, and the nested documents are written too
+        self.assertIsNone(garage1.staged_probability_matrix)
+        self.assertEqual(unpack_matrix(pack_probabilities(garage1.probability)).tolist(), matrix1.tolist())
+        self.assertEqual(load_probability_matrix(Garage.objects.get(pk=self.garage2.pk)).tolist(), matrix2.tolist())
+
+    def test_staged_probabilities_not_read_until_committed(self):
+        cache = GarageResponseCache(check_interval=0)
+        expected = cache.get_or_render((self.garage1.pk, None, None))
+        cache.clear()
+
+        # a garage written for the next version, which has not been committed yet
+        version = get_probability_state()[2] + 1
+        Garage.objects.filter(pk=self.garage1.pk).update(staged_probability_matrix=pack_matrix(np.zeros((7, 96))), probability_version=version)
+
+        self.assertEqual(cache.get_or_render((self.garage1.pk, None, None)), expected)
+
+        # committed with the generation bump, every reader switches to the staged matrix
+        bump_probability_generation(version)
+
+        content = json.loads(cache.get_or_render((self.garage1.pk, None, None)))
+        self.assertEqual(content['probability'][0]['probability'][0]['probability'], 0)
+
+    def test_failed_write_is_not_committed(self):
+        version = get_probability_state()[2]
+
+        with patch('pymongo.collection.Collection.bulk_write', side_effect=PyMongoError('test exception')):
+            with self.assertRaises(PyMongoError):
+                write_probabilities({self.garage1.pk: np.zeros((7, 96))})
+
+        self.assertEqual(get_probability_state()[2], version)
+        self.assertIsNone(Garage.objects.get(pk=self.garage1.pk).staged_probability_matrix)
+
+    def test_garages_get_etag(self):
+        response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        etag = response['ETag']
+
+        # not modified, answered without any query
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(queries), 0)
+
+        # weakened ETags of compressed responses still match
+        response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key, HTTP_IF_NONE_MATCH='W/' + etag)
+        self.assertEqual(response.status_code, 304)
+
+        # every response has its own ETag
+        response = self.client.get('/api/garages/Mon/', HTTP_AUTHORIZATION='Token ' + self.user_token.key, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_garages_get_etag_changes_with_generation(self):
+        response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        etag = response['ETag']
+
+        write_probabilities({self.garage1.pk: np.zeros((7, 96))})
+        garage_response_cache.clear()
+
+        response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_garages_get_if_modified_since(self):
+        bump_probability_generation()
+        garage_response_cache.clear()
+
+        response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        last_modified = response['Last-Modified']
+
+        response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_garages_get_compact(self):
+        response = self.client.get('/api/garages/?format=compact', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        response_content = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response_content), 2)
+
+        for garage, garage_content in zip([self.garage1, self.garage2], response_content):
+            self.assertEqual(garage_content['name'], garage.name)
+
+            for i in range(7):
+                for j in range(96):
+                    self.assertEqual(garage_content['probability'][i][j], round(garage.probability[i].probability[j].probability * 100))
+
+        # one day, one time interval
+        response = self.client.get('/api/garage/' + str(self.garage1.pk) + '/Mon/12:20/?format=compact', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        response_content = json.loads(response.content)
+
+        self.assertEqual(response_content['probability'], round(self.garage1.probability[1].probability[49].probability * 100))
+
+    def test_garages_get_gzip(self):
+        response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        content = response.content
+
+        response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key, HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), content)
+        assert response['ETag'].startswith('W/')
@@ -8,11 +8,15 @@ import datetime
 
 from api.models import Garage, User
 from api.serializers import GarageSerializer
+from api.cache import garage_response_cache
 
 class GarageGetTestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
 
+        # responses cached by other tests are not tied to this test's DB
+        garage_response_cache.clear()
+
         existing_user_data = {
             "email": "existing@user.com",
             "first_name": "Existing",
@@ -0,0 +1,92 @@
+from django.test import TestCase
+import json
+import os
+import pickle
+import tempfile
+
+from api.models import Garage
+from api.garage_registry import GarageRegistry, garage_registry, load_coordinates
+from api.cache import bump_probability_generation
+
+class GarageRegistryTestCase(TestCase):
+    def setUp(self):
+        garage_registry.clear()
+
+        # import first (209 Hitt St) and second garage (AV1) from pickle dump
+        with(open("api/tests/xgboost_tests_resources/garages.dat", "rb")) as file:
+            garages = pickle.load(file)
+            garage = garages[0]
+            self.garage1 = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+            garage = garages[1]
+            self.garage2 = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+
+        # coordinates file with the first garage and a garage that is not in the DB
+        coordinates = [
+            {"name": "Only In File", "latitude": 38.94, "longitude": -92.32, "group": 2},
+            {"name": self.garage1.name, "latitude": 38.95, "longitude": -92.33, "group": 2},
+        ]
+
+        file, self.coordinates_file = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(file, 'w') as coordinates_file:
+            json.dump(coordinates, coordinates_file)
+
+        self.registry = GarageRegistry(coordinates_file=self.coordinates_file)
+
+    def tearDown(self):
+        os.remove(self.coordinates_file)
+
+    def test_lookup_by_name_and_pk(self):
+        entry = self.registry.by_name(self.garage2.name)
+
+        self.assertEqual(entry.pk, self.garage2.pk)
+        self.assertEqual(self.registry.by_pk(self.garage2.pk), entry)
+        self.assertIsNone(entry.group)
+        self.assertIsNone(self.registry.by_name('Not A Garage'))
+        self.assertEqual(self.registry.pks(), [self.garage1.pk, self.garage2.pk])
+
+    def test_coordinates_file_groups(self):
+        only_in_file = self.registry.by_name('Only In File')
+
+        self.assertIsNone(only_in_file.pk)
+        self.assertEqual(self.registry.by_name(self.garage1.name).group, 2)
+        # the garage only in the file is not a DB garage
+        self.assertEqual(len(self.registry.garages()), 2)
+        self.assertEqual(len(self.registry.all()), 3)
+        # groups keep the order of the file
+        self.assertEqual([entry.name for entry in self.registry.group(2)], ['Only In File', self.garage1.name])
+        self.assertEqual(self.registry.group(1), [])
+
+    def test_garage_save_clears_registry(self):
+        self.assertIsNotNone(garage_registry.by_pk(self.garage1.pk))
+
+        self.garage1.name = 'Renamed Garage'
+        self.garage1.save()
+
+        self.assertEqual(garage_registry.by_pk(self.garage1.pk).name, 'Renamed Garage')
+
+        garage = Garage.objects.create(name='New Garage', start_enforce_time=self.garage1.start_enforce_time, end_enforce_time=self.garage1.end_enforce_time, enforced_on_weekends=True, probability=self.garage1.probability, latitude=38.9, longitude=-92.3)
+
+        self.assertEqual(garage_registry.by_name('New Garage').pk, garage.pk)
+
+    def test_invalidate_reloads_other_processes(self):
+        registry = GarageRegistry(coordinates_file=self.coordinates_file, check_interval=0)
+        self.assertEqual(registry.by_pk(self.garage2.pk).name, self.garage2.name)
+
+        # a change made without signals, then announced by another process
+        Garage.objects.filter(pk=self.garage2.pk).update(name='Renamed Garage')
+        self.assertEqual(registry.by_pk(self.garage2.pk).name, self.garage2.name)
+
+        GarageRegistry(coordinates_file=self.coordinates_file).invalidate()
+
+        self.assertEqual(registry.by_pk(self.garage2.pk).name, 'Renamed Garage')
+
+    def test_probability_generation_keeps_registry(self):
+        registry = GarageRegistry(coordinates_file=self.coordinates_file, check_interval=0)
+        entries = registry.get_entries()
+
+        bump_probability_generation()
+
+        self.assertIs(registry.get_entries(), entries)
+
+    def test_load_coordinates_invalid_file(self):
+        self.assertIsNone(load_coordinates('route_visualization/not_a_file.json'))
@@ -0,0 +1,103 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+import unittest.mock as mock
+import gzip
+import json
+import pickle
+import datetime
+
+from api.models import Garage, User
+from api.cache import ProbabilityWindowIndex, probability_window_index
+
+class GaragesNowGetTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        probability_window_index.clear()
+
+        # import first (209 Hitt St) and second garage (AV1) from pickle dump
+        with(open("api/tests/xgboost_tests_resources/garages.dat", "rb")) as file:
+            garages = pickle.load(file)
+            garage = garages[0]
+            self.garage1 = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+            garage = garages[1]
+            self.garage2 = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+
+        existing_user_data = {
+            "email": "existing@user.com",
+            "first_name": "Existing",
+            "last_name": "User",
+            "phone": "5735735733"
+        }
+
+        self.user = User.objects.create(**existing_user_data)
+        self.user.set_password("defaultpassword")
+        self.user.save()
+
+        self.user_token = Token.objects.create(user=self.user)
+
+    @mock.patch('api.viewsets.datetime')
+    def test_garages_now_get_valid(self, mock_datetime):
+        # Monday, 12:20 falls in the 12:15 time interval
+        mock_datetime.now.return_value = datetime.datetime(2020, 4, 6, 12, 20, 0)
+
+        response = self.client.get('/api/garages/now/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        response_content = json.loads(response.content)
+
+        correct_response_content = {
+            'day_of_week': 'Mon',
+            'time': '12:15:00',
+            'garages': [
+                {
+                    'pk': garage.pk,
+                    'name': garage.name,
+                    'lat': garage.latitude,
+                    'lon': garage.longitude,
+                    'p': garage.probability[1].probability[49].probability
+                } for garage in [self.garage1, self.garage2]
+            ]
+        }
+
+        # verify response is correct
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_content, correct_response_content)
+
+    def test_garages_now_get_gzip(self):
+        response = self.client.get('/api/garages/now/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        content = response.content
+
+        response = self.client.get('/api/garages/now/', HTTP_AUTHORIZATION='Token ' + self.user_token.key, HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), content)
+
+    def test_garages_now_get_invalid_not_authenticated(self):
+        response = self.client.get('/api/garages/now/')
+        response_content = json.loads(response.content)
+
+        correct_response_content = {
+            "detail": "Authentication credentials were not provided."
+        }
+
+        # verify response is correct
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response_content, correct_response_content)
+
+    def test_index_every_window(self):
+        index = ProbabilityWindowIndex(check_interval=0)
+        garages, probabilities = index.build()
+
+        self.assertEqual(probabilities.shape, (7, 96, 2))
+
+        for i in range(7):
+            for j in range(96):
+                self.assertEqual(probabilities[i][j][0], self.garage1.probability[i].probability[j].probability)
+                self.assertEqual(probabilities[i][j][1], self.garage2.probability[i].probability[j].probability)
+
+    def test_index_no_garages(self):
+        Garage.objects.all().delete()
+        index = ProbabilityWindowIndex(check_interval=0)
+
+        response_content = json.loads(index.get(0, 0))
+
+        self.assertEqual(response_content, {'day_of_week': 'Sun', 'time': '00:00:00', 'garages': []})
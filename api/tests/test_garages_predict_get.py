@@ -0,0 +1,148 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from xgboost import XGBClassifier
+import unittest.mock as mock
+import json
+import os
+import pickle
+import tempfile
+import numpy as np
+
+from api.models import Garage, User
+from api.model_registry import Predictor, predictor, register_model, load_registry, registry_path
+from api.probabilities import OFF_HOURS_PROBABILITY
+
+class GaragesPredictGetTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.directory = tempfile.mkdtemp()
+
+        # import first (209 Hitt St) and second garage (AV1) from pickle dump
+        with(open("api/tests/xgboost_tests_resources/garages.dat", "rb")) as file:
+            garages = pickle.load(file)
+            garage = garages[0]
+            self.garage1 = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+            garage = garages[1]
+            self.garage2 = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+
+        existing_user_data = {
+            "email": "existing@user.com",
+            "first_name": "Existing",
+            "last_name": "User",
+            "phone": "5735735733"
+        }
+
+        self.user = User.objects.create(**existing_user_data)
+        self.user.set_password("defaultpassword")
+        self.user.save()
+
+        self.user_token = Token.objects.create(user=self.user)
+
+    # trains a small model where tickets happen between 10:00 and 14:00 (time intervals 40 - 55)
+    def train_model(self, seed=27):
+        rng = np.random.default_rng(seed)
+        X = np.column_stack((rng.integers(0, 96, 1000), rng.integers(0, 7, 1000), rng.integers(1, 3, 1000)))
+        Y = ((X[:, 0] >= 40) & (X[:, 0] < 56)).astype(int)
+
+        return XGBClassifier(n_estimators=20, max_depth=3).fit(X, Y)
+
+    def test_register_model(self):
+        model = self.train_model()
+
+        entry = register_model(model, params={'max_depth': 3}, metrics={'tuning_cv_auc': 0.9}, name='first', directory=self.directory)
+
+        registry = load_registry(self.directory)
+        self.assertEqual(registry['current'], 'first')
+        self.assertEqual(registry['models'], [entry])
+        self.assertEqual(entry['features'], ['time', 'day_of_week', 'garage'])
+        assert os.path.isfile(os.path.join(self.directory, entry['file']))
+
+    def test_predictor_matches_model(self):
+        model = self.train_model()
+        register_model(model, name='first', directory=self.directory)
+
+        res = Predictor(self.directory).predict([1, 2], 1, 12 * 60)
+
+        expected = model.predict_proba(np.array([[48, 1, 1], [48, 1, 2]]))[:, 1]
+        np.testing.assert_allclose(res, expected, rtol=1e-6)
+
+    def test_predictor_snaps_to_interval(self):
+        register_model(self.train_model(), name='first', directory=self.directory)
+        local_predictor = Predictor(self.directory)
+
+        res = local_predictor.predict([1, 2], 1, 12 * 60 + 7)
+
+        np.testing.assert_array_equal(res, local_predictor.predict([1, 2], 1, 12 * 60))
+
+    def test_predictor_off_hours(self):
+        register_model(self.train_model(), name='first', directory=self.directory)
+        local_predictor = Predictor(self.directory)
+
+        # Sunday noon, Monday 3:00am and Monday 8:00pm
+        for day_index, minutes in [(0, 12 * 60), (1, 3 * 60), (1, 20 * 60)]:
+            self.assertEqual(local_predictor.predict([1, 2], day_index, minutes).tolist(), [OFF_HOURS_PROBABILITY] * 2)
+
+    def test_predictor_no_model(self):
+        res = Predictor(self.directory).predict([1, 2], 1, 12 * 60)
+
+        assert res is None
+
+    def test_predictor_hot_swap(self):
+        local_predictor = Predictor(self.directory)
+        register_model(self.train_model(1), name='first', directory=self.directory)
+        local_predictor.predict([1], 1, 12 * 60)
+
+        mtime = os.stat(registry_path(self.directory)).st_mtime_ns
+        register_model(self.train_model(2), name='second', directory=self.directory)
+        # the registry's modification time changes, whatever the resolution of the file system
+        os.utime(registry_path(self.directory), ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+        local_predictor.predict([1], 1, 12 * 60)
+
+        self.assertEqual(local_predictor.entry['name'], 'second')
+
+    def test_garages_predict_get_valid(self):
+        register_model(self.train_model(), name='first', directory=self.directory)
+
+        with mock.patch.object(predictor, 'directory', self.directory):
+            response = self.client.get('/api/garages/predict/Mon/12:07/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        response_content = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_content['day_of_week'], 'Mon')
+        self.assertEqual(response_content['time'], '12:07')
+        self.assertEqual([garage['pk'] for garage in response_content['garages']], [self.garage1.pk, self.garage2.pk])
+
+        for garage in response_content['garages']:
+            assert 0 <= garage['p'] <= 1
+
+    def test_garages_predict_get_weekend(self):
+        register_model(self.train_model(), name='first', directory=self.directory)
+
+        with mock.patch.object(predictor, 'directory', self.directory):
+            response = self.client.get('/api/garages/predict/Sat/12:00/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        response_content = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([garage['p'] for garage in response_content['garages']], [0.01, 0.01])
+
+    def test_garages_predict_get_invalid_day(self):
+        response = self.client.get('/api/garages/predict/Monday/12:00/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_garages_predict_get_invalid_time(self):
+        response = self.client.get('/api/garages/predict/Mon/noon/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_garages_predict_get_no_model(self):
+        with mock.patch.object(predictor, 'directory', self.directory):
+            response = self.client.get('/api/garages/predict/Mon/12:00/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+
+        self.assertEqual(response.status_code, 503)
+
+    def test_garages_predict_get_unauthorized(self):
+        response = self.client.get('/api/garages/predict/Mon/12:00/')
+
+        self.assertEqual(response.status_code, 401)
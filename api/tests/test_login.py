@@ -47,6 +47,19 @@ class LoginTestCase(TestCase):
         # verify response content is correct
         self.assertEqual(response_content, correct_response_content)
 
+    def test_login_not_gzipped(self):
+        login_data = {
+            "username": "existing@user.com",
+            "password": "defaultpassword"
+        }
+
+        response = self.client.post('/api/login/', login_data, HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        # responses with tokens are never compressed (BREACH)
+        self.assertEqual(response.status_code, 200)
+        assert not response.has_header('Content-Encoding')
+        assert 'token' in json.loads(response.content)
+
     def test_login_invalid_username(self):
         login_data = {
             "username": "invalid@user.com",
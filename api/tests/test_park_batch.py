@@ -0,0 +1,167 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+import json
+import pickle
+import datetime
+from pymongo.errors import BulkWriteError
+from unittest.mock import patch
+
+from api.models import User, Park, Garage, Ticket
+from api.viewsets import MAX_BATCH_SIZE
+
+class ParkBatchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        # import first garage (209 Hitt St) from pickle dump
+        with(open("api/tests/xgboost_tests_resources/garages.dat", "rb")) as file:
+            garages = pickle.load(file)
+            garage = garages[0]
+            self.garage = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+
+        existing_user_data = {
+            "email": "existing@user.com",
+            "first_name": "Existing",
+            "last_name": "User",
+            "phone": "5735735733"
+        }
+
+        self.user = User.objects.create(**existing_user_data)
+        self.user.set_password("defaultpassword")
+        self.user.save()
+
+        self.user_token = Token.objects.create(user=self.user)
+
+        other_user_data = {
+            "email": "other@user.com",
+            "first_name": "Other",
+            "last_name": "User",
+            "phone": "5735735734"
+        }
+
+        self.other_user = User.objects.create(**other_user_data)
+
+        self.start = datetime.datetime(2020, 4, 6, 12, 0, 0)
+        self.park = Park.objects.create(start=self.start, garage=self.garage, user=self.user)
+        self.other_park = Park.objects.create(start=self.start, garage=self.garage, user=self.other_user)
+
+    def post_batch(self, items):
+        response = self.client.post('/api/user/park/batch/', {"items": items}, format='json', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+
+        return (response, json.loads(response.content))
+
+    def test_park_batch_create(self):
+        items = [
+            {"op": "create", "data": {"start": (self.start + datetime.timedelta(hours=i)).isoformat(), "garage_id": self.garage.pk}}
+            for i in range(3)
+        ]
+
+        response, response_content = self.post_batch(items)
+
+        # verify response is correct
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response_content], [201, 201, 201])
+
+        # verify every park was created with its own pk
+        pks = [result['data']['pk'] for result in response_content]
+        self.assertEqual(len(set(pks)), 3)
+
+        for i, pk in enumerate(pks):
+            park = Park.objects.get(pk=pk)
+            self.assertEqual(park.user, self.user)
+            self.assertEqual(park.garage, self.garage)
+            self.assertEqual(park.start, self.start + datetime.timedelta(hours=i))
+            self.assertEqual(response_content[i]['data']['garage'], {"pk": self.garage.pk, "name": "209 Hitt St"})
+
+        # parks created afterwards do not reuse the pks
+        park = Park.objects.create(start=self.start, garage=self.garage, user=self.user)
+        self.assertNotIn(park.pk, pks)
+
+    def test_park_batch_update_and_ticket(self):
+        end = self.start + datetime.timedelta(hours=2)
+        ticket_date = self.start + datetime.timedelta(hours=1)
+
+        items = [
+            {"op": "ticket", "data": {"park_id": self.park.pk, "date": ticket_date.isoformat()}},
+            {"op": "update", "data": {"pk": self.park.pk, "end": end.isoformat()}}
+        ]
+
+        response, response_content = self.post_batch(items)
+
+        # verify response is correct
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response_content], [200, 200])
+
+        # verify park was updated
+        park = Park.objects.get(pk=self.park.pk)
+        self.assertEqual(park.end, end)
+        self.assertEqual(park.ticket.date, ticket_date)
+
+    def test_park_batch_invalid_items_not_saved(self):
+        items = [
+            {"op": "create", "data": {"start": self.start.isoformat()}},
+            {"op": "update", "data": {"pk": self.other_park.pk, "end": self.start.isoformat()}},
+            {"op": "ticket", "data": {"park_id": self.park.pk, "date": (self.start - datetime.timedelta(hours=1)).isoformat()}},
+            {"op": "update", "data": {"pk": 12345}},
+            {"op": "delete", "data": {"pk": self.park.pk}},
+            {"op": "create", "data": {"start": self.start.isoformat(), "garage_id": self.garage.pk}}
+        ]
+
+        response, response_content = self.post_batch(items)
+
+        # verify response is correct
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response_content], [400, 400, 400, 400, 400, 201])
+        self.assertEqual(response_content[0]['errors'], {"garage_id": ["This field is required."]})
+        self.assertEqual(response_content[1]['errors'], {"non_field_errors": ["The user does not own this park."]})
+        self.assertEqual(response_content[2]['errors'], {"date": ["The date of the ticket must be during park time."]})
+        self.assertEqual(response_content[3]['errors'], {"pk": ["Park with pk 12345 does not exist."]})
+
+        # verify only the valid item was saved
+        self.assertEqual(Park.objects.count(), 3)
+        self.assertEqual(Park.objects.get(pk=self.other_park.pk).end, None)
+        self.assertEqual(Park.objects.get(pk=self.park.pk).ticket, None)
+
+    def test_park_batch_failed_writes(self):
+        items = [
+            {"op": "create", "data": {"start": self.start.isoformat(), "garage_id": self.garage.pk}},
+            {"op": "update", "data": {"pk": self.park.pk, "end": (self.start + datetime.timedelta(hours=2)).isoformat()}},
+            {"op": "ticket", "data": {"park_id": self.park.pk, "date": (self.start + datetime.timedelta(hours=1)).isoformat()}}
+        ]
+        # the insert is written, the update of self.park (both last items) fails
+        error = BulkWriteError({'writeErrors': [{'index': 1, 'code': 2, 'errmsg': 'test exception'}], 'nInserted': 1})
+
+        with patch('pymongo.collection.Collection.bulk_write', side_effect=error):
+            response, response_content = self.post_batch(items)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response_content], [201, 500, 500])
+        self.assertEqual(response_content[1]['errors'], {"non_field_errors": ["The park could not be saved."]})
+
+    def test_park_batch_update_end_before_ticket(self):
+        self.park.ticket = Ticket(date=self.start + datetime.timedelta(hours=1))
+        self.park.save()
+
+        response, response_content = self.post_batch([
+            {"op": "update", "data": {"pk": self.park.pk, "end": (self.start + datetime.timedelta(minutes=30)).isoformat()}}
+        ])
+
+        self.assertEqual(response_content[0]['status'], 400)
+        self.assertEqual(response_content[0]['errors'], {"end": ["The end date of the park must be after the reported ticket date."]})
+        self.assertEqual(Park.objects.get(pk=self.park.pk).end, None)
+
+    def test_park_batch_invalid_items(self):
+        response, response_content = self.post_batch(None)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response_content, {"items": ["This field is required."]})
+
+        response, response_content = self.post_batch([{"op": "create", "data": {}}] * (MAX_BATCH_SIZE + 1))
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_park_batch_invalid_not_authenticated(self):
+        response = self.client.post('/api/user/park/batch/', {"items": []}, format='json')
+
+        self.assertEqual(response.status_code, 401)
@@ -180,4 +180,103 @@ class ParkGetTestCase(TestCase):
 
         # verify response is correct
         self.assertEqual(response.status_code, 401, msg="Invalid response status code.")
-        self.assertEqual(response_content, correct_response_content, msg="Invalid response content.")
\ No newline at end of file
+        self.assertEqual(response_content, correct_response_content, msg="Invalid response content.")
+
+    def test_park_get_valid_paginated(self):
+        get_park_data = {
+            "limit": 1
+        }
+
+        response = self.client.get('/api/user/park/', get_park_data, HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
+        response_content = json.loads(response.content)
+
+        # verify the first page only has the oldest park
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([park['pk'] for park in response_content['results']], [self.park2.pk])
+        self.assertIsNotNone(response_content['next'])
+
+        get_park_data['cursor'] = response_content['next']
+
+        response = self.client.get('/api/user/park/', get_park_data, HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
+        response_content = json.loads(response.content)
+
+        # verify the second page is the last one
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([park['pk'] for park in response_content['results']], [self.park1.pk])
+        self.assertIsNone(response_content['next'])
+
+    def test_park_get_valid_since_until(self):
+        get_park_data = {
+            "since": (self.park1.start - datetime.timedelta(hours=1)).isoformat()
+        }
+
+        response = self.client.get('/api/user/park/', get_park_data, HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
+        response_content = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([park['pk'] for park in response_content], [self.park1.pk])
+
+        get_park_data = {
+            "until": (self.park1.start - datetime.timedelta(hours=1)).isoformat()
+        }
+
+        response = self.client.get('/api/user/park/', get_park_data, HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
+        response_content = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([park['pk'] for park in response_content], [self.park2.pk])
+
+    def test_park_get_valid_fields(self):
+        get_park_data = {
+            "fields": "pk,garage"
+        }
+
+        response = self.client.get('/api/user/park/', get_park_data, HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
+        response_content = json.loads(response.content)
+
+        correct_response_content = [
+            {
+                'pk': self.park2.pk,
+                'garage': {
+                    'pk': self.garage2.pk,
+                    'name': self.garage2.name
+                }
+            },
+            {
+                'pk': self.park1.pk,
+                'garage': {
+                    'pk': self.garage1.pk,
+                    'name': self.garage1.name
+                }
+            }
+        ]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_content, correct_response_content)
+
+    def test_park_get_invalid_fields(self):
+        get_park_data = {
+            "fields": "pk,password"
+        }
+
+        response = self.client.get('/api/user/park/', get_park_data, HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_park_get_invalid_cursor(self):
+        get_park_data = {
+            "cursor": "invalid"
+        }
+
+        response = self.client.get('/api/user/park/', get_park_data, HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_park_get_invalid_since(self):
+        get_park_data = {
+            "since": "yesterday"
+        }
+
+        response = self.client.get('/api/user/park/', get_park_data, HTTP_AUTHORIZATION='Token ' + self.user1_token.key)
+
+        self.assertEqual(response.status_code, 400)
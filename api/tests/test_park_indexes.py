@@ -0,0 +1,61 @@
+from django.test import TestCase
+from django.core.management import call_command
+from io import StringIO
+import pickle
+import datetime
+
+from api.models import User, Park, Garage
+from api.indexes import PARK_INDEXES, UNASSIGNED_TICKET_FILTER, missing_indexes, explain_indexes
+from api.mongo import get_collection
+
+class ParkIndexesTestCase(TestCase):
+    def setUp(self):
+        # import first (209 Hitt St) garage from pickle dump
+        with(open("api/tests/xgboost_tests_resources/garages.dat", "rb")) as file:
+            garages = pickle.load(file)
+            garage = garages[0]
+            self.garage = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+
+        self.user = User.objects.create(email="existing@user.com", first_name="Existing", last_name="User", phone="5735735733")
+
+        start = datetime.datetime(2020,1,1,11,0,0)
+        for i in range(10):
+            Park.objects.create(start=start + datetime.timedelta(days=i), end=start + datetime.timedelta(days=i, hours=1), garage=self.garage, user=self.user)
+        Park.objects.create(start=start, garage=self.garage, user=self.user)
+
+        self.collection = get_collection(Park)
+
+    def test_indexes_created_by_migration(self):
+        res = missing_indexes(self.collection, PARK_INDEXES)
+
+        self.assertEqual(res, [])
+
+    def test_user_history_uses_index(self):
+        res = explain_indexes(self.collection, {'user_id': self.user.pk}, [('start', 1), ('id', 1)])
+
+        self.assertEqual(res, ['park_user_start'])
+
+    def test_open_parks_use_partial_index(self):
+        res = explain_indexes(self.collection, {'user_id': self.user.pk, 'end': {'$type': 'null'}})
+
+        assert 'park_open' in res
+
+    def test_unassigned_tickets_use_partial_index(self):
+        res = explain_indexes(self.collection, dict(UNASSIGNED_TICKET_FILTER, user_id=self.user.pk), [('start', 1), ('id', 1)])
+
+        self.assertEqual(res, ['park_unassigned_ticket'])
+
+    def test_index_keys_are_unique(self):
+        # MongoDB 4.2 rejects two indexes with the same keys, even with different partial filters
+        keys = [tuple(index['keys']) for index in PARK_INDEXES]
+
+        self.assertEqual(len(keys), len(set(keys)))
+
+    def test_ensure_indexes_command(self):
+        self.collection.drop_index('park_modified')
+        out = StringIO()
+
+        call_command('ensure_indexes', stdout=out)
+
+        self.assertIn('Created index park_modified', out.getvalue())
+        self.assertEqual(missing_indexes(self.collection, PARK_INDEXES), [])
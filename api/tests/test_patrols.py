@@ -0,0 +1,55 @@
+from django.test import TestCase
+import random
+import datetime
+
+from api.patrols import PatrolIndex
+from api.views import get_patrol_times_list, load_routes
+
+class PatrolIndexTestCase(TestCase):
+    def setUp(self):
+        random.seed(1)
+        date = datetime.datetime(2020, 4, 6, 7, 0, 0)
+
+        self.patrol_times = [
+            get_patrol_times_list(patrol_time_start=date, patrol_time_end=date + datetime.timedelta(minutes=660), patrol_lot_time_min=5, patrol_lot_time_max=15,
+                patrol_route=load_routes("route_visualization/CondensedRoutes/condensed_route_g" + str(i + 1) + ".json"))
+            for i in range(3)
+        ]
+        self.index = PatrolIndex(self.patrol_times)
+
+    # visits overlapping [start, end), scanning every route
+    def scan(self, garage, start, end):
+        visits = []
+
+        for route_times in self.patrol_times:
+            for lot_name, lot_start, lot_end in route_times:
+                visit = (lot_start.hour * 3600 + lot_start.minute * 60 + lot_start.second, lot_end.hour * 3600 + lot_end.minute * 60 + lot_end.second)
+
+                if lot_name == garage and visit[0] < end and visit[1] > start:
+                    visits.append(visit)
+
+        return sorted(visits)
+
+    def test_overlapping_same_as_scan(self):
+        garages = self.index.garages()
+        assert len(garages) > 0
+
+        for garage in garages:
+            for start in range(7 * 3600, 19 * 3600, 600):
+                for length in (60, 1800, 7200):
+                    self.assertEqual(self.index.overlapping(garage, start, start + length), self.scan(garage, start, start + length))
+
+    def test_active_and_next_visit(self):
+        garage = self.index.garages()[0]
+        starts, ends = self.index.windows(garage)
+        start = int(starts[0])
+
+        assert (start, int(ends[0])) in self.index.active(garage, start) or ends[0] <= starts[0]
+        self.assertEqual(self.index.next_visit(garage, start), start)
+        self.assertEqual(self.index.next_visit(garage, 24 * 3600), None)
+
+    def test_not_patrolled(self):
+        assert 'Not A Garage' not in self.index
+        self.assertEqual(self.index.overlapping('Not A Garage', 0, 24 * 3600), [])
+        self.assertEqual(self.index.next_visit('Not A Garage', 0), None)
+        self.assertEqual(len(self.index.windows('Not A Garage')[0]), 0)
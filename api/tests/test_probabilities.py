@@ -0,0 +1,124 @@
+from django.test import TestCase
+import copy
+import pickle
+import numpy as np
+
+from api.models import Garage
+from api.serializers import GarageSerializer, GarageReadSerializer
+from rest_framework.renderers import JSONRenderer
+from api.probabilities import *
+
+class ProbabilitiesTestCase(TestCase):
+    def setUp(self):
+        # import first (209 Hitt St) garage from pickle dump
+        with(open("api/tests/xgboost_tests_resources/garages.dat", "rb")) as file:
+            garages = pickle.load(file)
+            garage = garages[0]
+            self.garage = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+
+    def test_pack_probabilities_round_trip(self):
+        matrix = load_probability_matrix(Garage.objects.get(pk=self.garage.pk))
+
+        self.assertEqual(matrix.shape, (DAYS_PER_WEEK, SLOTS_PER_DAY))
+
+        for i in range(DAYS_PER_WEEK):
+            for j in range(SLOTS_PER_DAY):
+                self.assertEqual(matrix[i][j], self.garage.probability[i].probability[j].probability)
+
+    def test_unpack_probabilities_round_trip(self):
+        matrix = np.random.default_rng(27).random((DAYS_PER_WEEK, SLOTS_PER_DAY))
+
+        day_probabilities = unpack_probabilities(matrix)
+
+        self.assertEqual([day_probability.day_of_week for day_probability in day_probabilities], DAY_CODES)
+        self.assertEqual(unpack_matrix(pack_probabilities(day_probabilities)).tolist(), matrix.tolist())
+
+    def test_unpack_float32_matrix(self):
+        matrix = np.random.default_rng(27).random((DAYS_PER_WEEK, SLOTS_PER_DAY))
+
+        # matrices packed as float32 are still read
+        self.assertEqual(unpack_matrix(matrix.astype('<f4').tobytes()).tolist(), matrix.astype('<f4').tolist())
+        # new matrices are packed as doubles, the values written are served exactly
+        self.assertEqual(len(pack_matrix(matrix)), DAYS_PER_WEEK * SLOTS_PER_DAY * 8)
+        self.assertEqual(unpack_matrix(pack_matrix(np.full((DAYS_PER_WEEK, SLOTS_PER_DAY), 0.01)))[0][0], 0.01)
+
+    def test_save_only_packs_changed_probability(self):
+        matrix = np.full((DAYS_PER_WEEK, SLOTS_PER_DAY), 0.5)
+        Garage.objects.filter(pk=self.garage.pk).update(probability_matrix=pack_matrix(matrix))
+
+        # saved with the nested documents it was loaded with, or without loading them
+        garage = Garage.objects.get(pk=self.garage.pk)
+        garage.name = 'Renamed'
+        garage.save()
+        garage = Garage.objects.defer('probability').get(pk=self.garage.pk)
+        garage.save()
+
+        self.assertEqual(load_probability_matrix(Garage.objects.get(pk=self.garage.pk)).tolist(), matrix.tolist())
+
+        # new nested documents are packed
+        garage = Garage.objects.get(pk=self.garage.pk)
+        garage.probability = unpack_probabilities(np.full((DAYS_PER_WEEK, SLOTS_PER_DAY), 0.25))
+        garage.save()
+
+        self.assertEqual(load_probability_matrix(Garage.objects.get(pk=self.garage.pk)).tolist(), np.full((DAYS_PER_WEEK, SLOTS_PER_DAY), 0.25).tolist())
+
+    def test_pack_probabilities_incomplete(self):
+        res = pack_probabilities(self.garage.probability[:6])
+
+        assert res is None
+
+    def test_pack_probabilities_out_of_order(self):
+        day_probabilities = list(self.garage.probability)
+        day_probabilities[0], day_probabilities[1] = day_probabilities[1], day_probabilities[0]
+
+        res = pack_probabilities(day_probabilities)
+
+        assert res is None
+
+    def test_parse_slot(self):
+        self.assertEqual(parse_slot('00:00'), 0)
+        self.assertEqual(parse_slot('08:14'), 32)
+        self.assertEqual(parse_slot('23:59'), 95)
+        assert parse_slot('25:00') is None
+        assert parse_slot('bad') is None
+
+    def test_serializer_matrix_matches_nested(self):
+        garage = Garage.objects.get(pk=self.garage.pk)
+        nested_garage = copy.copy(garage)
+        nested_garage.probability_matrix = None
+
+        contexts = [
+            {},
+            {'day_of_week': 'Mon'},
+            {'day_of_week': 'None'},
+            {'day_of_week': 'Tue', 'time': '12:30'},
+            {'time': '07:45'},
+            {'time': 'bad'},
+        ]
+
+        for context in contexts:
+            self.assertEqual(GarageSerializer(garage, context=context).data, GarageSerializer(nested_garage, context=context).data)
+
+    def test_read_serializer_matches_serializer(self):
+        garages = Garage.objects.all()
+
+        contexts = [
+            {},
+            {'day_of_week': 'Sat'},
+            {'day_of_week': 'Bad'},
+            {'day_of_week': 'Wed', 'time': '23:59'},
+            {'time': '00:00'},
+            {'time': '24:00'},
+        ]
+
+        for context in contexts:
+            correct_content = JSONRenderer().render(GarageSerializer(garages, many=True, context=context).data)
+            content = JSONRenderer().render(GarageReadSerializer(garages, many=True, context=context).data)
+
+            self.assertEqual(content, correct_content)
+
+    def test_read_serializer_without_matrix(self):
+        garage = Garage.objects.get(pk=self.garage.pk)
+        garage.probability_matrix = None
+
+        self.assertEqual(GarageReadSerializer(garage).data, GarageSerializer(garage).data)
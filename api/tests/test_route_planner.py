@@ -0,0 +1,88 @@
+from django.test import TestCase
+from unittest.mock import MagicMock
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from route_visualization.route_planner import *
+from route_visualization.coordinates import load_coordinates
+
+class RoutePlannerTestCase(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        # (longitude, latitude) of three garages
+        self.coords = [(-92.324080, 38.940817), (-92.324780, 38.940084), (-92.328912, 38.945830)]
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_haversine_matrix(self):
+        # one degree of latitude is about 111.2 km
+        distances = haversine_matrix([(0, 0), (0, 1)])
+
+        self.assertAlmostEqual(distances[0][1], 111195, delta=1)
+        self.assertEqual(distances[0][1], distances[1][0])
+        self.assertEqual(distances[0][0], 0)
+
+    def test_manhattan_matrix(self):
+        haversine = haversine_matrix(self.coords)
+        manhattan = manhattan_matrix(self.coords)
+
+        self.assertEqual(manhattan.shape, (3, 3))
+        # the street grid distance is never shorter than the straight line
+        self.assertTrue((manhattan >= haversine - 1e-6).all())
+        self.assertTrue((manhattan == manhattan.T).all())
+
+    def test_matrix_key(self):
+        self.assertEqual(matrix_key(self.coords), matrix_key(list(self.coords)))
+        # the rows of the matrix follow the order of the coordinates
+        self.assertNotEqual(matrix_key(self.coords), matrix_key(self.coords[::-1]))
+        self.assertNotEqual(matrix_key(self.coords), matrix_key(self.coords, profile='foot-walking'))
+
+    def test_get_matrix_without_client(self):
+        matrix = get_matrix(self.coords, cache_dir=self.cache_dir)
+
+        self.assertEqual(matrix['source'], 'manhattan')
+        self.assertEqual(len(matrix['durations']), 3)
+        self.assertEqual(matrix['durations'][0][0], 0)
+        # the fallback is not cached
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+        self.assertIsNone(get_matrix(self.coords, cache_dir=self.cache_dir, fallback=None))
+
+    def test_get_matrix_caches_api_matrix(self):
+        durations = [[0, 10, 20], [10, 0, 30], [20, 30, 0]]
+        clnt = MagicMock()
+        clnt.distance_matrix.return_value = {'durations': durations}
+
+        matrix = get_matrix(self.coords, clnt, cache_dir=self.cache_dir)
+        self.assertEqual(matrix['durations'], durations)
+
+        # the second call reads the matrix from the disk cache
+        matrix = get_matrix(self.coords, clnt, cache_dir=self.cache_dir)
+        self.assertEqual(matrix['durations'], durations)
+        self.assertEqual(clnt.distance_matrix.call_count, 1)
+
+        # a refresh that fails keeps the cached matrix
+        clnt.distance_matrix.side_effect = Exception("test exception")
+        matrix = get_matrix(self.coords, clnt, cache_dir=self.cache_dir, refresh=True)
+        self.assertEqual(matrix['durations'], durations)
+
+    def test_get_matrix_unreachable_api(self):
+        clnt = MagicMock()
+        clnt.distance_matrix.side_effect = Exception("test exception")
+
+        matrix = get_matrix(self.coords, clnt, cache_dir=self.cache_dir, fallback='haversine')
+
+        self.assertEqual(matrix['source'], 'haversine')
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_load_coordinates_without_django(self):
+        code = 'import sys; from route_visualization.coordinates import load_coordinates; load_coordinates(); print("django" in sys.modules)'
+
+        res = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, universal_newlines=True, env=dict(os.environ, DJANGO_SETTINGS_MODULE=''))
+
+        self.assertEqual(res.stdout.strip(), 'False')
+        self.assertIsNotNone(load_coordinates())
@@ -0,0 +1,114 @@
+from django.test import TestCase
+from django.core.management import call_command
+from io import StringIO
+import numpy as np
+import pickle
+import datetime
+
+from api.models import User, Park, Garage
+from api.synthetic import generate_day, insert_parks, generate_parks
+from api.patrols import PatrolIndex
+
+class SyntheticParksTestCase(TestCase):
+    def setUp(self):
+        # import first (209 Hitt St) and second garage (AV1) from pickle dump
+        with(open("api/tests/xgboost_tests_resources/garages.dat", "rb")) as file:
+            garages = pickle.load(file)
+            garage = garages[0]
+            self.garage1 = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+            garage = garages[1]
+            self.garage2 = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+
+        self.user = User.objects.create(email="test@data.com", first_name="Test Data", last_name="User", phone="5735735733")
+
+        date = datetime.datetime(2020, 4, 6, 7, 0, 0)
+        # the first garage is visited twice, the second one is never visited
+        self.patrol_times = [
+            [(self.garage1.name, date + datetime.timedelta(hours=1), date + datetime.timedelta(hours=1, minutes=15))],
+            [(self.garage1.name, date + datetime.timedelta(hours=5), date + datetime.timedelta(hours=5, minutes=10))]
+        ]
+        self.patrols = PatrolIndex(self.patrol_times)
+        self.garages = [self.garage1.name, self.garage2.name]
+
+    def test_generate_day_tickets_during_visits(self):
+        # Monday
+        parks = generate_day(np.random.default_rng(1), datetime.date(2020, 4, 6), self.garages, self.patrols, park_ticket_percent_thresh=100)
+        starts, ends = self.patrols.windows(self.garage1.name)
+
+        ticketed = parks['ticket'] >= 0
+        assert ticketed.any()
+
+        # only the visited garage is ticketed, during the park and during or after the start of a visit
+        self.assertEqual(set(parks['garage'][ticketed].tolist()), {0})
+        assert (parks['ticket'][ticketed] >= parks['start'][ticketed]).all()
+        assert (parks['ticket'][ticketed] <= parks['end'][ticketed]).all()
+
+        for ticket in parks['ticket'][ticketed]:
+            assert any(start <= ticket for start in starts)
+
+        # every park is in the enforcement hours
+        assert (parks['start'] >= 7 * 3600).all()
+        assert (parks['end'] > parks['start']).all()
+
+    def test_generate_day_weekend_not_ticketed(self):
+        # Saturday
+        parks = generate_day(np.random.default_rng(1), datetime.date(2020, 4, 11), self.garages, self.patrols, park_ticket_percent_thresh=100)
+
+        assert len(parks['start']) > 0
+        assert (parks['ticket'] == -1).all()
+
+    def test_generate_day_seeded(self):
+        parks1 = generate_day(np.random.default_rng(5), datetime.date(2020, 4, 6), self.garages, self.patrols)
+        parks2 = generate_day(np.random.default_rng(5), datetime.date(2020, 4, 6), self.garages, self.patrols)
+
+        for name in parks1:
+            self.assertEqual(parks1[name].tolist(), parks2[name].tolist())
+
+    def test_insert_parks(self):
+        day = datetime.date(2020, 4, 6)
+        parks = generate_day(np.random.default_rng(1), day, self.garages, self.patrols, park_ticket_percent_thresh=100)
+
+        count = insert_parks(np.random.default_rng(1), parks, day, [self.garage1.pk, self.garage2.pk], [self.user.pk], chunk_size=50)
+
+        self.assertEqual(count, len(parks['start']))
+        self.assertEqual(Park.objects.count(), count)
+        self.assertEqual(Park.objects.filter(garage=self.garage1).count(), int((parks['garage'] == 0).sum()))
+
+        # the parks read back like parks created with the ORM
+        i = int(np.flatnonzero(parks['ticket'] >= 0)[0])
+        park = Park.objects.get(garage=self.garage1, start=datetime.datetime(2020, 4, 6) + datetime.timedelta(seconds=int(parks['start'][i])))
+        self.assertEqual(park.user, self.user)
+        self.assertEqual(park.end, datetime.datetime(2020, 4, 6) + datetime.timedelta(seconds=int(parks['end'][i])))
+        self.assertIsNotNone(park.ticket.date)
+
+        # parks created afterwards do not reuse the pks
+        pks = set(Park.objects.values_list('pk', flat=True))
+        park = Park.objects.create(start=datetime.datetime(2020, 4, 6), garage=self.garage1, user=self.user)
+        self.assertNotIn(park.pk, pks)
+
+    def test_generate_parks(self):
+        days = [datetime.date(2020, 4, 6), datetime.date(2020, 4, 7)]
+        garages = [(self.garage1.pk, self.garage1.name), (self.garage2.pk, self.garage2.name)]
+
+        count = generate_parks(days, garages, self.patrols, [self.user.pk], seed=3)
+
+        self.assertEqual(Park.objects.count(), count)
+        assert count > 0
+
+    def test_generate_parks_command(self):
+        out = StringIO()
+
+        call_command('generate_parks', days=3, users=2, seed=1, workers=1, end_date='2020-04-09', stdout=out)
+
+        self.assertIn('Generated ' + str(Park.objects.count()) + ' parks', out.getvalue())
+        self.assertEqual(User.objects.filter(first_name='Load Test').count(), 2)
+        self.assertEqual(set(Park.objects.values_list('user_id', flat=True)), set(User.objects.filter(first_name='Load Test').values_list('pk', flat=True)))
+
+        # the same seed generates the same parks, the users are reused
+        starts = sorted(Park.objects.values_list('start', flat=True))
+        Park.objects.all().delete()
+
+        call_command('generate_parks', days=3, users=2, seed=1, workers=1, end_date='2020-04-09', stdout=out)
+
+        self.assertEqual(sorted(Park.objects.values_list('start', flat=True)), starts)
+        self.assertEqual(User.objects.filter(first_name='Load Test').count(), 2)
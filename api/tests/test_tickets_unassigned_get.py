@@ -0,0 +1,107 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+import json
+import pickle
+import datetime
+
+from api.models import User, Park, Garage, Ticket
+
+class TicketsUnassignedGetTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        # import first garage (209 Hitt St) from pickle dump
+        with(open("api/tests/xgboost_tests_resources/garages.dat", "rb")) as file:
+            garages = pickle.load(file)
+            garage = garages[0]
+            self.garage = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+
+        existing_user_data = {
+            "email": "existing@user.com",
+            "first_name": "Existing",
+            "last_name": "User",
+            "phone": "5735735733"
+        }
+
+        self.user = User.objects.create(**existing_user_data)
+        self.user.set_password("defaultpassword")
+        self.user.save()
+
+        self.user_token = Token.objects.create(user=self.user)
+
+        other_user = User.objects.create(email="other@user.com", first_name="Other", last_name="User", phone="5735735734")
+
+        start = datetime.datetime(2020, 4, 6, 12, 0, 0)
+
+        # ongoing parks with a ticket, the only ones returned
+        self.parks = []
+        for i in range(5):
+            park_start = start + datetime.timedelta(days=i)
+            self.parks.append(Park.objects.create(start=park_start, ticket=Ticket(date=park_start + datetime.timedelta(minutes=30)), garage=self.garage, user=self.user))
+
+        # finished park with a ticket, ongoing park without a ticket and another user's ticket
+        Park.objects.create(start=start, end=start + datetime.timedelta(hours=1), ticket=Ticket(date=start), garage=self.garage, user=self.user)
+        Park.objects.create(start=start, garage=self.garage, user=self.user)
+        Park.objects.create(start=start, ticket=Ticket(date=start), garage=self.garage, user=other_user)
+
+    def get_unassigned(self, params=None):
+        response = self.client.get('/api/user/tickets/unassigned', params or {}, HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+
+        return (response, json.loads(response.content))
+
+    def test_tickets_unassigned_get_valid(self):
+        response, response_content = self.get_unassigned()
+
+        correct_response_content = {
+            "results": [
+                {
+                    "pk": park.pk,
+                    "start": park.start.isoformat(),
+                    "ticket": {
+                        "date": park.ticket.date.isoformat(),
+                        "day_of_week": park.ticket.date.strftime('%a')
+                    },
+                    "garage": {
+                        "pk": self.garage.pk,
+                        "name": "209 Hitt St"
+                    }
+                } for park in self.parks
+            ],
+            "next": None
+        }
+
+        # verify response is correct
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response_content, correct_response_content)
+
+    def test_tickets_unassigned_get_paginated(self):
+        pks = []
+        params = {"limit": 2}
+
+        while True:
+            response, response_content = self.get_unassigned(params)
+            self.assertEqual(response.status_code, 200)
+
+            pks += [ticket['pk'] for ticket in response_content['results']]
+
+            if response_content['next'] is None:
+                break
+
+            params = {"limit": 2, "cursor": response_content['next']}
+
+        # every ticket is returned once, in order
+        self.assertEqual(pks, [park.pk for park in self.parks])
+
+    def test_tickets_unassigned_get_invalid_params(self):
+        response, response_content = self.get_unassigned({"limit": 0})
+        self.assertEqual(response.status_code, 400)
+
+        response, response_content = self.get_unassigned({"cursor": "invalid"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response_content, {"cursor": ["Invalid cursor."]})
+
+    def test_tickets_unassigned_get_invalid_not_authenticated(self):
+        response = self.client.get('/api/user/tickets/unassigned')
+
+        self.assertEqual(response.status_code, 401)
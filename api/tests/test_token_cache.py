@@ -0,0 +1,162 @@
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+import unittest.mock as mock
+import json
+
+from api.models import User
+from api.authentication import TokenCache, token_cache
+from api.cache import garage_response_cache
+
+class TokenCacheTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        token_cache.clear()
+
+        existing_user_data = {
+            "email": "existing@user.com",
+            "first_name": "Existing",
+            "last_name": "User",
+            "phone": "5735735733"
+        }
+
+        self.user = User.objects.create(**existing_user_data)
+        self.user.set_password("defaultpassword")
+        self.user.save()
+
+        self.user_token = Token.objects.create(user=self.user)
+
+    def get_user(self):
+        return self.client.get('/api/user/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+
+    def test_cached_token_not_looked_up(self):
+        garage_response_cache.clear()
+        response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        self.assertEqual(response.status_code, 200)
+
+        # the second request is authenticated without any query, the garages are served from the response cache
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/garages/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 0)
+
+    def test_logout_invalidates_token(self):
+        self.assertEqual(self.get_user().status_code, 200)
+
+        response = self.client.post('/api/logout/', HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get_user()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content), {"detail": "Invalid token."})
+
+    def test_user_update_keeps_token(self):
+        self.assertEqual(self.get_user().status_code, 200)
+
+        response = self.client.patch('/api/user/', {"first_name": "Updated"}, HTTP_AUTHORIZATION='Token ' + self.user_token.key)
+        self.assertEqual(response.status_code, 200)
+
+        # the credentials did not change, the details are read again
+        self.assertIsNotNone(token_cache.entries.get(self.user_token.key))
+        self.assertEqual(json.loads(self.get_user().content)['first_name'], "Updated")
+
+    def test_password_change_invalidates_user(self):
+        self.assertEqual(self.get_user().status_code, 200)
+
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password("newpassword")
+        user.save()
+
+        self.assertEqual(token_cache.entries.get(self.user_token.key), None)
+
+    def test_deactivation_invalidates_other_processes(self):
+        # another process with the token cached, both share the invalidation stamps
+        other = TokenCache(max_entries=10, ttl=60, alias='default', stamp_interval=0)
+        other.set(self.user_token.key, self.user, self.user_token, other.ensure_stamp(self.user_token.key))
+        self.assertIsNotNone(other.get(self.user_token.key))
+
+        with mock.patch.object(token_cache, 'alias', 'default'):
+            user = User.objects.get(pk=self.user.pk)
+            user.is_active = False
+            user.save()
+
+        self.assertEqual(other.get(self.user_token.key), None)
+        self.assertEqual(self.get_user().status_code, 401)
+
+    def test_logout_invalidates_other_processes(self):
+        other = TokenCache(max_entries=10, ttl=60, alias='default', stamp_interval=0)
+        other.set(self.user_token.key, self.user, self.user_token, other.ensure_stamp(self.user_token.key))
+
+        with mock.patch.object(token_cache, 'alias', 'default'):
+            self.user_token.delete()
+
+        self.assertEqual(other.get(self.user_token.key), None)
+
+    def test_inactive_user_not_cached(self):
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.get_user()
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(token_cache.entries), 0)
+
+    @mock.patch('api.authentication.time')
+    def test_entries_expire(self, mock_time):
+        cache = TokenCache(max_entries=10, ttl=60, alias=None)
+
+        mock_time.monotonic.return_value = 100
+        cache.set(self.user_token.key, self.user, self.user_token)
+
+        mock_time.monotonic.return_value = 159
+        self.assertEqual(cache.get(self.user_token.key)[0].pk, self.user.pk)
+
+        mock_time.monotonic.return_value = 161
+        self.assertEqual(cache.get(self.user_token.key), None)
+
+    def test_entries_bounded(self):
+        cache = TokenCache(max_entries=2, ttl=60, alias=None)
+
+        for key in ['a', 'b', 'c']:
+            cache.set(key, self.user, self.user_token)
+
+        # least recently used entry is dropped
+        self.assertEqual(list(cache.entries), ['b', 'c'])
+
+    def test_without_shared_cache(self):
+        cache = TokenCache(max_entries=10, ttl=60, alias=None)
+        cache.set(self.user_token.key, self.user, self.user_token, cache.ensure_stamp(self.user_token.key))
+
+        self.assertEqual(cache.get(self.user_token.key)[0].pk, self.user.pk)
+
+        cache.invalidate(self.user_token.key)
+        self.assertEqual(cache.get(self.user_token.key), None)
+
+    @mock.patch('api.authentication.time')
+    def test_stamp_checked_every_interval(self, mock_time):
+        cache = TokenCache(max_entries=10, ttl=60, alias='default', stamp_interval=5)
+
+        mock_time.monotonic.return_value = 100
+        cache.set(self.user_token.key, self.user, self.user_token, cache.ensure_stamp(self.user_token.key))
+
+        # invalidated by another process
+        TokenCache(max_entries=10, ttl=60, alias='default').invalidate(self.user_token.key)
+
+        # the shared cache is not read again before the interval
+        mock_time.monotonic.return_value = 104
+        with mock.patch.object(cache, 'get_stamp') as get_stamp:
+            self.assertEqual(cache.get(self.user_token.key)[0].pk, self.user.pk)
+            get_stamp.assert_not_called()
+
+        mock_time.monotonic.return_value = 105
+        self.assertEqual(cache.get(self.user_token.key), None)
+
+    def test_users_not_shared(self):
+        cache = TokenCache(max_entries=10, ttl=60, alias='default')
+        cache.set(self.user_token.key, self.user, self.user_token, cache.ensure_stamp(self.user_token.key))
+
+        # another process only shares the stamps, it looks the token up
+        self.assertEqual(TokenCache(max_entries=10, ttl=60, alias='default').get(self.user_token.key), None)
@@ -0,0 +1,140 @@
+from django.test import TestCase
+import datetime
+import os
+import pickle
+import tempfile
+import numpy as np
+
+from api.models import Garage, Park, Ticket
+from api.training import *
+
+class TrainingTestCase(TestCase):
+    def setUp(self):
+        # import first (209 Hitt St) garage from pickle dump
+        with(open("api/tests/xgboost_tests_resources/garages.dat", "rb")) as file:
+            garages = pickle.load(file)
+            garage = garages[0]
+            self.garage = Garage.objects.create(name=garage.name, start_enforce_time=garage.start_enforce_time, end_enforce_time=garage.end_enforce_time, enforced_on_weekends=garage.enforced_on_weekends, probability=garage.probability, latitude=garage.latitude, longitude=garage.longitude)
+
+        self.dataset_path = os.path.join(tempfile.mkdtemp(), 'dataset')
+
+        # Wednesday 11:00 - 13:00, ticketed at 12:00
+        start_date = datetime.datetime(2020,1,1,11,0,0)
+        end_date = datetime.datetime(2020,1,1,13,0,0)
+        ticket_date = datetime.datetime(2020,1,1,12,0,0)
+
+        self.park = Park.objects.create(start=start_date, end=end_date, ticket=Ticket(date=ticket_date), garage=self.garage)
+
+    def test_expand_parks(self):
+        columns = expand_parks(fetch_parks())
+        rows = to_rows(columns)
+
+        # 11:00 - 13:00 covers time intervals 44 - 52
+        self.assertEqual(rows.tolist(), [[i, 3, self.garage.pk, 1 if i == 48 else 0] for i in range(44, 53)])
+        self.assertEqual(columns['park'].tolist(), [self.park.pk] * 9)
+
+    def test_expand_parks_skips_ongoing(self):
+        Park.objects.create(start=datetime.datetime(2020,1,1,11,0,0), garage=self.garage)
+
+        rows = to_rows(expand_parks(fetch_parks()))
+
+        self.assertEqual(len(rows), 9)
+
+    def test_dataset_save_load(self):
+        dataset = TrainingDataset(self.dataset_path)
+        dataset.update()
+        dataset.save()
+
+        loaded = TrainingDataset(self.dataset_path)
+        res = loaded.load()
+
+        assert res is True
+        self.assertEqual(loaded.last_run, dataset.last_run)
+        self.assertEqual(loaded.last_full_run, dataset.last_full_run)
+        self.assertEqual(loaded.rows().tolist(), dataset.rows().tolist())
+
+    def test_dataset_incremental_update(self):
+        dataset = TrainingDataset(self.dataset_path)
+        count = dataset.update()
+        self.assertEqual(count, 1)
+
+        # nothing changed since the last run, the rows are not duplicated
+        dataset.update()
+        self.assertEqual(len(dataset.rows()), 9)
+
+        # the park is shortened to 11:00 - 12:15 and a new park is created
+        self.park.end = datetime.datetime(2020,1,1,12,15,0)
+        self.park.save()
+        new_park = Park.objects.create(start=datetime.datetime(2020,1,2,8,0,0), end=datetime.datetime(2020,1,2,8,30,0), garage=self.garage)
+
+        count = dataset.update()
+        self.assertEqual(count, 2)
+
+        # the old rows of the modified park are replaced
+        self.assertEqual(sorted(dataset.columns['park'].tolist()), sorted([self.park.pk] * 6 + [new_park.pk] * 3))
+        self.assertEqual(int(dataset.columns['ticketed'].sum()), 1)
+
+    def test_dataset_update_drops_deleted_parks(self):
+        dataset = TrainingDataset(self.dataset_path)
+        new_park = Park.objects.create(start=datetime.datetime(2020,1,2,8,0,0), end=datetime.datetime(2020,1,2,8,30,0), garage=self.garage)
+        dataset.update()
+
+        new_park.delete()
+        count = dataset.update()
+
+        self.assertEqual(count, 0)
+        self.assertEqual(dataset.columns['park'].tolist(), [self.park.pk] * 9)
+
+    def test_dataset_periodic_full_rebuild(self):
+        dataset = TrainingDataset(self.dataset_path)
+        dataset.update()
+
+        # update() does not set the modified date, the incremental update misses the change
+        Park.objects.filter(pk=self.park.pk).update(end=datetime.datetime(2020,1,1,12,15,0))
+        dataset.update()
+        self.assertEqual(len(dataset.rows()), 9)
+
+        dataset.last_full_run -= TrainingDataset.FULL_REBUILD_INTERVAL
+        dataset.update()
+        self.assertEqual(len(dataset.rows()), 6)
+
+    def test_dataset_load_missing(self):
+        dataset = TrainingDataset(self.dataset_path)
+
+        res = dataset.load()
+
+        assert res is False
+        self.assertEqual(len(dataset.rows()), 0)
+
+    def test_load_training_set(self):
+        dataset = TrainingDataset(self.dataset_path)
+        dataset.update()
+        dataset.save()
+
+        X, Y = load_training_set(self.dataset_path)
+
+        self.assertIsInstance(X, np.memmap)
+        self.assertEqual(X.dtype, np.int16)
+        self.assertEqual(Y.dtype, np.int8)
+        self.assertEqual(X.tolist(), [[i, 3, self.garage.pk] for i in range(44, 53)])
+        self.assertEqual(Y.tolist(), [1 if i == 48 else 0 for i in range(44, 53)])
+
+    def test_load_training_set_missing(self):
+        res = load_training_set(self.dataset_path)
+
+        assert res is None
+
+    def test_prediction_grid(self):
+        X = prediction_grid([3, 7])
+
+        self.assertEqual(X.shape, (2 * 7 * 96, 3))
+        self.assertEqual(X.dtype, np.int16)
+        self.assertEqual(X[0].tolist(), [0, 0, 3])
+        self.assertEqual(X[95].tolist(), [95, 0, 3])
+        self.assertEqual(X[96].tolist(), [0, 1, 3])
+        self.assertEqual(X[7 * 96].tolist(), [0, 0, 7])
+
+    def test_prediction_grid_subset(self):
+        X = prediction_grid([self.garage.pk], days=[2], slots=[40, 41])
+
+        self.assertEqual(X.tolist(), [[40, 2, self.garage.pk], [41, 2, self.garage.pk]])
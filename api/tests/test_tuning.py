@@ -0,0 +1,79 @@
+from django.test import TestCase
+import os
+import tempfile
+import time
+import numpy as np
+
+from api.tuning import *
+
+class TuningTestCase(TestCase):
+    def setUp(self):
+        # ticketed in the middle of the day on weekdays
+        rng = np.random.default_rng(27)
+        self.X = np.column_stack((rng.integers(0, 96, 2000), rng.integers(0, 7, 2000), rng.integers(1, 5, 2000))).astype(np.int16)
+        self.Y = ((self.X[:, 0] > 40) & (self.X[:, 0] < 60) & (self.X[:, 1] > 0) & (self.X[:, 1] < 6)).astype(np.int8)
+
+        self.tuner = ParameterTuner(self.X, self.Y, cv_folds=3, n_jobs=1)
+
+    def test_folds_are_shared_and_stratified(self):
+        self.assertEqual(len(self.tuner.folds), 3)
+
+        for train_index, test_index in self.tuner.folds:
+            self.assertAlmostEqual(self.Y[test_index].mean(), self.Y.mean(), places=2)
+
+    def test_cross_validate_early_stopping(self):
+        score, rounds = self.tuner.cross_validate(DEFAULT_PARAMS, learning_rate=0.3, num_boost_round=500)
+
+        assert score > 0.9
+        assert rounds < 500
+
+    def test_search(self):
+        params, score, rounds = self.tuner.search(60, candidates=6, min_rounds=5, max_rounds=45)
+
+        self.assertEqual(set(params), set(SEARCH_SPACE))
+        assert score > 0.9
+
+    def test_search_no_time_budget(self):
+        params, score, rounds = self.tuner.search(-1, candidates=6)
+
+        assert params is None
+
+    def test_cross_validate_deadline(self):
+        # never stopped early, only by the deadline
+        tuner = ParameterTuner(self.X, self.Y, cv_folds=3, n_jobs=1, early_stopping_rounds=100000)
+        started = time.monotonic()
+
+        score, rounds = tuner.cross_validate(DEFAULT_PARAMS, learning_rate=0.1, num_boost_round=100000, deadline=started + 1)
+
+        assert time.monotonic() - started < 5
+        assert rounds < 100000
+
+    def test_tune(self):
+        started = time.monotonic()
+
+        params, score, n_estimators = self.tuner.tune(3, candidates=6)
+
+        self.assertEqual(set(params), set(SEARCH_SPACE))
+        assert n_estimators > 0
+        # the number of trees is searched within the time budget
+        assert time.monotonic() - started < 8
+
+    def test_search_warm_start(self):
+        warm_start = {'max_depth': 4, 'min_child_weight': 2, 'gamma': 0.0, 'subsample': 1.0, 'colsample_bytree': 1.0}
+
+        candidates = self.tuner.sample(6, np.random.default_rng(0), [warm_start, DEFAULT_PARAMS])
+
+        self.assertEqual(candidates[0], warm_start)
+        self.assertEqual(len(candidates), 6)
+
+    def test_best_params_save_load(self):
+        path = os.path.join(tempfile.mkdtemp(), 'best_params.json')
+
+        save_best_params(DEFAULT_PARAMS, 0.9, 100, path=path)
+
+        self.assertEqual(load_best_params(path), DEFAULT_PARAMS)
+
+    def test_best_params_load_missing(self):
+        res = load_best_params(os.path.join(tempfile.mkdtemp(), 'best_params.json'))
+
+        assert res is None
@@ -0,0 +1,107 @@
+from django.test import TestCase
+import os
+import tempfile
+import numpy as np
+
+from api.models import Garage
+from api.validation import *
+from api.probabilities import DAY_CODES
+from api.management.commands.validate_probs import Command, init_worker
+
+class ValidationTestCase(TestCase):
+    def test_count_cubes(self):
+        # time, day_of_week, garage
+        X = np.array([[48, 3, 5], [48, 3, 5], [49, 3, 5], [10, 0, 2], [10, 0, 9]], dtype=np.int16)
+        Y = np.array([1, 0, 1, 1, 1], dtype=np.int8)
+
+        tickets, observations = count_cubes(X, Y, [5, 2])
+
+        self.assertEqual(tickets.shape, (2, 7, 96))
+        self.assertEqual(tickets[0][3][48], 1)
+        self.assertEqual(observations[0][3][48], 2)
+        self.assertEqual(tickets[0][3][49], 1)
+        # Sunday is day 0
+        self.assertEqual(tickets[1][0][10], 1)
+        # garage 9 is not requested
+        self.assertEqual(int(tickets.sum()), 3)
+        self.assertEqual(int(observations.sum()), 4)
+
+    def test_count_cubes_empty(self):
+        X = np.zeros((0, 3), dtype=np.int16)
+        Y = np.zeros(0, dtype=np.int8)
+
+        tickets, observations = count_cubes(X, Y, [5, 2])
+
+        self.assertEqual(int(observations.sum()), 0)
+
+    def test_group_metrics(self):
+        # one group of two cells: 4 rows at p=0.25 with 1 ticket, 2 rows at p=0.75 with 2 tickets
+        tickets = np.array([1, 2])
+        observations = np.array([4, 2])
+        probabilities = np.array([0.25, 0.75])
+
+        res = group_metrics(tickets, observations, probabilities, np.array([0, 0]), 1)
+
+        self.assertEqual(res['observations'].tolist(), [6])
+        self.assertEqual(res['tickets'].tolist(), [3])
+        self.assertAlmostEqual(res['brier'][0], (0.75 ** 2 + 3 * 0.25 ** 2 + 2 * 0.25 ** 2) / 6)
+        self.assertAlmostEqual(res['log_loss'][0], -(np.log(0.25) + 3 * np.log(0.75) + 2 * np.log(0.75)) / 6)
+        # 2 of the 3 tickets are ranked above the 3 negatives, 1 ties with them
+        self.assertAlmostEqual(res['auc'][0], (2 * 3 + 0.5 * 3) / 9)
+
+    def test_group_metrics_single_class(self):
+        res = group_metrics(np.array([0, 0]), np.array([3, 3]), np.array([0.1, 0.2]), np.array([0, 0]), 1)
+
+        assert np.isnan(res['auc'][0])
+
+    def test_build_report(self):
+        tickets = np.zeros((2, 7, 96), dtype=np.int64)
+        observations = np.full((2, 7, 96), 10, dtype=np.int64)
+        tickets[0, 1, 48] = 5
+        probabilities = np.full((2, 7, 96), 0.01)
+
+        report = build_report([(5, 'First'), (2, 'Second')], tickets, observations, probabilities)
+
+        self.assertEqual(report['overall']['tickets'], 5)
+        self.assertEqual(len(report['overall']['reliability']['observations']), RELIABILITY_BINS)
+        self.assertEqual([garage['pk'] for garage in report['garages']], [5, 2])
+        self.assertEqual([day['day_of_week'] for day in report['days']], DAY_CODES)
+        self.assertEqual(len(report['garage_days']), 2 * 7)
+        self.assertEqual(report['garage_days'][1]['day_of_week'], 'Mon')
+        self.assertEqual(report['garage_days'][1]['tickets'], 5)
+        # no ticket, the auc is undefined
+        assert report['garage_days'][0]['auc'] is None
+
+    def test_build_report_no_garages(self):
+        tickets, observations = count_cubes(np.zeros((0, 3), dtype=np.int16), np.zeros(0, dtype=np.int8), [])
+
+        report = build_report([], tickets, observations, np.zeros((0, 7, 96)))
+
+        self.assertEqual(report['overall']['observations'], 0)
+        assert report['overall']['brier'] is None and report['overall']['auc'] is None
+        self.assertEqual(report['garages'], [])
+        self.assertEqual([day['observations'] for day in report['days']], [0] * 7)
+        self.assertEqual(report['garage_days'], [])
+
+    def test_render_formats(self):
+        output = tempfile.mkdtemp()
+        tickets = np.ones((2, 7, 96), dtype=np.int64)
+        probabilities = np.full((2, 7, 96), 0.5)
+        garages = [Garage(pk=1, name='First'), Garage(pk=2, name='Second')]
+
+        init_worker(0)
+        command = Command()
+
+        jobs, render = command.create_jobs(garages, tickets, probabilities, output, 'png')
+        self.assertEqual(len(jobs), 2 * 7)
+        render(jobs[0])
+        assert os.path.isfile(os.path.join(output, 'Sun', 'First.png'))
+
+        jobs, render = command.create_jobs(garages, tickets, probabilities, output, 'pdf')
+        self.assertEqual(len(jobs), 7)
+        render(jobs[1])
+        assert os.path.isfile(os.path.join(output, 'Mon.pdf'))
+
+        jobs, render = command.create_jobs(garages, tickets, probabilities, output, 'sprite')
+        render(jobs[2])
+        assert os.path.isfile(os.path.join(output, 'Tue.png'))
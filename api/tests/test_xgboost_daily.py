@@ -204,6 +204,32 @@ class XGBoostDailyTestCase(TestCase):
 
         assert res is False
 
+    def test_predict_probabilities_every_garage(self):
+        alg = pickle.load(open("api/tests/xgboost_tests_resources/mock_model/03-30-2020.dat", "rb"))
+
+        command = Command()
+        garages, res = command.predict_probabilities(alg)
+
+        self.assertEqual(garages, list(Garage.objects.values_list('pk', flat=True)))
+        self.assertEqual(res.shape, (77, 7, 96))
+
+    def test_predict_probabilities_subset(self):
+        alg = pickle.load(open("api/tests/xgboost_tests_resources/mock_model/03-30-2020.dat", "rb"))
+        garage = Garage.objects.first()
+
+        command = Command()
+        garages, res = command.predict_probabilities(alg, [garage.pk], days=[1], slots=[40, 41])
+
+        self.assertEqual(res.shape, (1, 1, 2))
+
+    def test_off_hours(self):
+        res = off_hours()
+
+        # weekends
+        assert res[0].all() and res[6].all()
+        # 7:00am - 6:00pm on weekdays
+        self.assertEqual(res[1].tolist(), [i < 28 or i > 72 for i in range(96)])
+
 # This test works, it just takes too long to run
     # def test_write_probabilities_to_database_good_params(self):
     #     alg = pickle.load(open("tests/mock_model/03-30-2020.dat", "rb"))
@@ -0,0 +1,252 @@
+import os
+import datetime
+import json
+import numpy as np
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# local models
+from api.models import Park
+from api.mongo import get_collection, to_db_value
+from api.probabilities import MINUTES_PER_SLOT, DAYS_PER_WEEK, SLOTS_PER_DAY
+
+# Builds the xgboost training set from the parks in the DB
+# Every finished park becomes one row per 15 minute time interval it covers:
+#     time: time interval (0-95), day_of_week: 0 = Sunday, ..., 6 = Saturday, garage: garage pk, ticketed: 1 if ticketed in that interval
+# The day of a ticketed park is the day of the ticket, otherwise the day of the start of the park.
+
+TRAINING_COLUMNS = ['time', 'day_of_week', 'garage', 'ticketed']
+
+# training set kept between runs by xgboost_daily, only parks modified since the last run are extracted (see TrainingDataset)
+DATASET_PATH = 'training_data/dataset/'
+
+# dtype of each column, park is the pk of the park that generated the row
+COLUMN_DTYPES = {
+    'time': np.int8,
+    'day_of_week': np.int8,
+    'garage': np.int16,
+    'ticketed': np.int8,
+    'park': np.int32,
+}
+
+# returns an array of the dates, with the millisecond precision of the DB. None becomes NaT
+def to_datetime64(dates):
+    return np.array(dates, dtype='datetime64[ms]')
+
+# time interval of each date of an array
+def get_slots(dates):
+    minutes = (dates - dates.astype('datetime64[D]')).astype('timedelta64[m]').astype(np.int64)
+
+    return minutes // MINUTES_PER_SLOT
+
+# int representation of the weekday of each date of an array. 0 = Sunday, ..., 6 = Saturday
+def get_day_codes(dates):
+    # 1970-01-01 was a Thursday
+    return (dates.astype('datetime64[D]').astype(np.int64) + 4) % 7
+
+# returns the parks as arrays: pk, finished, start interval, end interval, ticket interval (-1 if not ticketed), day code, garage pk
+# only the projected fields are read from the park documents, and the intervals/days are computed on whole arrays
+    # since: only parks modified at or after since, all parks if None
+def fetch_parks(since=None):
+    query = {}
+    if since is not None:
+        query['modified'] = {'$gte': to_db_value(Park, 'modified', since)}
+
+    documents = list(get_collection(Park).find(query, {'_id': 0, 'id': 1, 'start': 1, 'end': 1, 'ticket.date': 1, 'garage_id': 1}))
+
+    start = to_datetime64([document['start'] for document in documents])
+    end = to_datetime64([document.get('end') for document in documents])
+    ticket = to_datetime64([(document.get('ticket') or {}).get('date') for document in documents])
+
+    finished = ~np.isnat(end)
+    ticketed = ~np.isnat(ticket)
+
+    return {
+        'pk': np.fromiter((document['id'] for document in documents), dtype=np.int32, count=len(documents)),
+        'finished': finished,
+        'start': get_slots(start).astype(np.int16),
+        'end': np.where(finished, get_slots(end), 0).astype(np.int16),
+        'ticket': np.where(ticketed, get_slots(ticket), -1).astype(np.int16),
+        # the day of a ticketed park is the day of the ticket
+        'day_of_week': np.where(ticketed, get_day_codes(ticket), get_day_codes(start)).astype(np.int8),
+        'garage': np.fromiter((document['garage_id'] for document in documents), dtype=np.int16, count=len(documents)),
+    }
+
+# returns the pks of every park, as an array
+def fetch_park_pks():
+    return np.fromiter((document['id'] for document in get_collection(Park).find({}, {'_id': 0, 'id': 1})), dtype=np.int32)
+
+# expands finished parks into training rows, one per time interval covered by the park
+# returns a dict of column name -> array
+def expand_parks(parks):
+    finished = parks['finished']
+    start = parks['start'][finished].astype(np.int64)
+    end = parks['end'][finished].astype(np.int64)
+
+    # parks that end on an earlier interval than they start (ie. overnight) do not generate any rows
+    lengths = np.maximum(end - start + 1, 0)
+    total = int(lengths.sum())
+
+    # index of the park of each row, and the offset of each row from the start of its park
+    park_index = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    time = start[park_index] + offsets
+
+    return {
+        'time': time.astype(COLUMN_DTYPES['time']),
+        'day_of_week': parks['day_of_week'][finished][park_index].astype(COLUMN_DTYPES['day_of_week']),
+        'garage': parks['garage'][finished][park_index].astype(COLUMN_DTYPES['garage']),
+        'ticketed': (time == parks['ticket'][finished][park_index]).astype(COLUMN_DTYPES['ticketed']),
+        'park': parks['pk'][finished][park_index].astype(COLUMN_DTYPES['park']),
+    }
+
+# returns empty training set columns
+def empty_columns():
+    return {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+
+# returns the training set columns as an (n, 4) array, in TRAINING_COLUMNS order
+def to_rows(columns):
+    return np.column_stack([columns[name] for name in TRAINING_COLUMNS])
+
+# returns the features to predict on, one row per (garage, day of week, time interval) in that order,
+# so the predictions reshape to (garages, days, time intervals)
+    # garages: garage pks
+    # days: days of week (0 = Sunday), every day if None
+    # slots: time intervals, every interval if None
+def prediction_grid(garages, days=None, slots=None):
+    days = np.arange(DAYS_PER_WEEK) if days is None else days
+    slots = np.arange(SLOTS_PER_DAY) if slots is None else slots
+
+    garage_grid, day_grid, slot_grid = np.meshgrid(garages, days, slots, indexing='ij')
+
+    return np.column_stack((slot_grid.ravel(), day_grid.ravel(), garage_grid.ravel())).astype(np.int16)
+
+# Training set persisted between runs, so that only the parks created or modified since the last run are extracted
+# Rows of a modified park are replaced, and rows of parks deleted since the last run are dropped.
+# Parks changed without save() (ie. queryset.update(), which does not set Park.modified) are only picked up by a full
+# rebuild, which is forced once every FULL_REBUILD_INTERVAL.
+# Stored as a directory of .npy files that can be memory-mapped:
+#     features.npy: (n, 3) int16, columns time, day_of_week, garage. used as X by xgboost without any parsing
+#     ticketed.npy: (n,) int8, used as Y
+#     park.npy: (n,) int32
+#     manifest.json: row count, column names/dtypes and the dates of the last extraction and last full rebuild
+class TrainingDataset:
+    FEATURES = TRAINING_COLUMNS[:3]
+    FULL_REBUILD_INTERVAL = datetime.timedelta(days=7)
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = empty_columns()
+        self.last_run = None
+        self.last_full_run = None
+
+    # loads the persisted training set, if any. returns False if there is none
+        # mmap: memory-map the arrays instead of reading them (read-only)
+    def load(self, mmap=False):
+        manifest = load_manifest(self.path)
+
+        if manifest is None:
+            return False
+
+        mmap_mode = 'r' if mmap else None
+        features = np.load(os.path.join(self.path, 'features.npy'), mmap_mode=mmap_mode)
+
+        self.columns = {name: features[:, i] for i, name in enumerate(self.FEATURES)}
+        self.columns['ticketed'] = np.load(os.path.join(self.path, 'ticketed.npy'), mmap_mode=mmap_mode)
+        self.columns['park'] = np.load(os.path.join(self.path, 'park.npy'), mmap_mode=mmap_mode)
+        self.last_run = parse_datetime(manifest['last_run']) if manifest['last_run'] else None
+        # missing from the manifests written before full rebuilds were tracked, the next update is a full rebuild
+        last_full_run = manifest.get('last_full_run')
+        self.last_full_run = parse_datetime(last_full_run) if last_full_run else None
+
+        return True
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+
+        features = np.column_stack([self.columns[name].astype(np.int16) for name in self.FEATURES])
+
+        self.save_array('features.npy', features)
+        self.save_array('ticketed.npy', self.columns['ticketed'])
+        self.save_array('park.npy', self.columns['park'])
+
+        manifest = {
+            'version': 1,
+            'rows': len(features),
+            'features': self.FEATURES,
+            'label': 'ticketed',
+            'dtypes': {'features': str(features.dtype), 'ticketed': str(self.columns['ticketed'].dtype), 'park': str(self.columns['park'].dtype)},
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'last_full_run': self.last_full_run.isoformat() if self.last_full_run else None,
+        }
+
+        # the manifest is written last, a training set without one is never loaded
+        self.save_file('manifest.json', lambda file: file.write(json.dumps(manifest, indent=4).encode()))
+
+    def save_array(self, filename, array):
+        self.save_file(filename, lambda file: np.save(file, array))
+
+    # writes to a temporary file first so that readers never see a partially written file
+    def save_file(self, filename, write):
+        filepath = os.path.join(self.path, filename)
+
+        with open(filepath + '.tmp', 'wb') as file:
+            write(file)
+
+        os.replace(filepath + '.tmp', filepath)
+
+    # extracts the parks modified since the last run (or every park) and merges them into the training set
+    # every park is extracted again if full, or if the last full rebuild is older than FULL_REBUILD_INTERVAL
+    # returns the number of parks extracted
+    def update(self, full=False):
+        # taken before the query, so parks modified while extracting are picked up again on the next run
+        # truncated to the millisecond precision of the dates stored in the DB
+        run_start = timezone.now()
+        run_start = run_start.replace(microsecond=(run_start.microsecond // 1000) * 1000)
+
+        if self.last_run is None or self.last_full_run is None or run_start - self.last_full_run >= self.FULL_REBUILD_INTERVAL:
+            full = True
+
+        if full:
+            parks = fetch_parks()
+            columns = empty_columns()
+            self.last_full_run = run_start
+        else:
+            parks = fetch_parks(since=self.last_run)
+            # drop the old rows of every modified park, and the rows of every deleted park
+            keep = ~np.isin(self.columns['park'], parks['pk']) & np.isin(self.columns['park'], fetch_park_pks())
+            columns = {name: values[keep] for name, values in self.columns.items()}
+
+        new_columns = expand_parks(parks)
+        self.columns = {name: np.concatenate((columns[name], new_columns[name])) for name in COLUMN_DTYPES}
+        self.last_run = run_start
+
+        return len(parks['pk'])
+
+    def rows(self):
+        return to_rows(self.columns)
+
+# returns the manifest of the training set stored at path, None if there is none
+def load_manifest(path):
+    filepath = os.path.join(path, 'manifest.json')
+
+    if not os.path.isfile(filepath):
+        return None
+
+    with open(filepath) as file:
+        return json.load(file)
+
+# returns (X, Y) of the training set stored at path, memory-mapped (no copy is made)
+    # X: (n, 3) int16, columns time, day_of_week, garage
+    # Y: (n,) int8, 1 if ticketed
+# returns None if there is no training set at path
+def load_training_set(path):
+    if load_manifest(path) is None:
+        return None
+
+    X = np.load(os.path.join(path, 'features.npy'), mmap_mode='r')
+    Y = np.load(os.path.join(path, 'ticketed.npy'), mmap_mode='r')
+
+    return (X, Y)
@@ -0,0 +1,207 @@
+import json
+import os
+import time
+import numpy as np
+import xgboost as xgb
+
+from sklearn.model_selection import StratifiedKFold
+
+# Hyperparameter search for the xgboost model trained by xgboost_daily
+# Every candidate is scored with xgb.cv on the same prebuilt DMatrix and the same stratified fold split,
+# with early stopping choosing the number of trees instead of a fixed n_estimators.
+# Candidates are sampled at random and pruned with successive halving: every round the best third
+# is kept and given three times as many boosting rounds, until the time budget runs out.
+# The time budget also covers the search for the number of trees of the final model (see tune), and every xgb.cv
+# is stopped by DeadlineCallback once it runs out, so a single candidate can't overrun it.
+
+# params shared by every candidate
+BASE_PARAMS = {
+    'objective': 'binary:logistic',
+    'eval_metric': 'auc',
+    'scale_pos_weight': 3,
+    'seed': 27,
+}
+
+# values sampled for each tuned param
+SEARCH_SPACE = {
+    'max_depth': list(range(3, 11)),
+    'min_child_weight': list(range(0, 7)),
+    'gamma': [i/10.0 for i in range(0, 5)],
+    'subsample': [i/10.0 for i in range(6, 11)],
+    'colsample_bytree': [i/10.0 for i in range(6, 11)],
+}
+
+# used as the first candidate when there are no cached params (model params before auto-tuning)
+DEFAULT_PARAMS = {
+    'max_depth': 5,
+    'min_child_weight': 1,
+    'gamma': 0.3,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+}
+
+# best params of the previous run, used to warm-start the next search
+BEST_PARAMS_PATH = 'xgboost_models/best_params.json'
+
+# share of the time budget kept for best_num_rounds
+ROUNDS_BUDGET_SHARE = 0.25
+
+# stops xgb.cv/xgb.train once the deadline (time.monotonic()) is passed
+# works with the callback API of xgboost 0.90 (requirements.txt, a function of env) and of xgboost >= 1.3 (TrainingCallback)
+class DeadlineCallback(getattr(xgb.callback, 'TrainingCallback', object)):
+    def __init__(self, deadline):
+        super(DeadlineCallback, self).__init__()
+        self.deadline = deadline
+
+    def after_iteration(self, model, epoch, evals_log):
+        return time.monotonic() > self.deadline
+
+    def __call__(self, env):
+        if time.monotonic() > self.deadline:
+            raise xgb.core.EarlyStopException(env.iteration)
+
+class ParameterTuner:
+    # X, Y: training set
+    # cv_folds: number of stratified folds, split once and reused for every candidate
+    # n_jobs: threads used by xgboost
+    def __init__(self, X, Y, cv_folds=5, n_jobs=4, seed=27, early_stopping_rounds=50):
+        self.n_jobs = n_jobs
+        self.seed = seed
+        self.early_stopping_rounds = early_stopping_rounds
+
+        Y = np.asarray(Y)
+        self.dtrain = xgb.DMatrix(X, label=Y, nthread=n_jobs)
+        self.folds = list(StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=seed).split(np.zeros((len(Y), 1)), Y))
+
+    # returns the xgboost params of a candidate
+    def get_params(self, candidate, learning_rate):
+        params = dict(BASE_PARAMS)
+        params.update(candidate)
+        params['eta'] = learning_rate
+        params['nthread'] = self.n_jobs
+        params['seed'] = self.seed
+
+        return params
+
+    # cross validates a candidate, returns (mean test auc, number of boosting rounds kept by early stopping)
+        # deadline: time.monotonic() at which the boosting is stopped, None for no limit
+    def cross_validate(self, candidate, learning_rate=0.1, num_boost_round=1000, deadline=None):
+        callbacks = [DeadlineCallback(deadline)] if deadline is not None else None
+
+        cvresult = xgb.cv(self.get_params(candidate, learning_rate), self.dtrain, num_boost_round=num_boost_round, folds=self.folds,
+            early_stopping_rounds=self.early_stopping_rounds, verbose_eval=False, callbacks=callbacks)
+
+        return (float(cvresult['test-auc-mean'].iloc[-1]), len(cvresult))
+
+    # returns count random candidates, starting with the given ones
+    def sample(self, count, rng, initial=None):
+        candidates = [dict(candidate) for candidate in (initial or [])]
+
+        while len(candidates) < count:
+            candidates.append({name: values[rng.integers(len(values))] for name, values in SEARCH_SPACE.items()})
+
+        return candidates[:count]
+
+    # successive halving over random candidates
+        # time_budget: seconds, the best candidate so far is returned once it runs out
+        # candidates: number of random candidates in the first round
+        # min_rounds, max_rounds: boosting rounds given to each candidate in the first and last round
+        # warm_start: params of a previous run, evaluated first
+    # returns (best params, auc, boosting rounds). the params are None if no candidate could be evaluated in time
+    def search(self, time_budget, candidates=27, learning_rate=0.1, min_rounds=50, max_rounds=1000, warm_start=None, log=None):
+        deadline = time.monotonic() + time_budget
+        rng = np.random.default_rng(self.seed)
+
+        initial = [warm_start] if warm_start else []
+        if DEFAULT_PARAMS not in initial:
+            initial.append(DEFAULT_PARAMS)
+
+        remaining = self.sample(candidates, rng, initial)
+        num_boost_round = min_rounds
+        best = (None, -1.0, 0)
+
+        while remaining:
+            results = []
+
+            for candidate in remaining:
+                if time.monotonic() > deadline:
+                    break
+
+                score, rounds = self.cross_validate(candidate, learning_rate, num_boost_round, deadline)
+
+                # stopped by the deadline, its score is not comparable to the others
+                if time.monotonic() > deadline:
+                    break
+
+                results.append((score, rounds, candidate))
+
+                if log:
+                    log('auc=%.5f rounds=%d %s' % (score, rounds, candidate))
+
+            if not results:
+                break
+
+            results.sort(key=lambda result: result[0], reverse=True)
+
+            # scores of later rounds had more trees, they replace the best of earlier rounds
+            best = (results[0][2], results[0][0], results[0][1])
+
+            if len(results) < len(remaining) or len(results) == 1 or num_boost_round >= max_rounds:
+                break
+
+            remaining = [candidate for score, rounds, candidate in results[:max(1, len(results) // 3)]]
+            num_boost_round = min(num_boost_round * 3, max_rounds)
+
+        return best
+
+    # number of trees for the final model at learning_rate, chosen with early stopping
+        # deadline: time.monotonic() at which the search is stopped, None for no limit
+        # fallback: number of trees used if the deadline stops the search first, when it is greater than the rounds reached
+    def best_num_rounds(self, candidate, learning_rate=0.01, max_rounds=3000, deadline=None, fallback=None):
+        if deadline is not None and time.monotonic() > deadline:
+            return fallback
+
+        score, rounds = self.cross_validate(candidate, learning_rate, max_rounds, deadline)
+
+        if deadline is not None and time.monotonic() > deadline and fallback is not None:
+            return max(rounds, fallback)
+
+        return rounds
+
+    # searches the params (see search) and the number of trees at final_learning_rate (see best_num_rounds)
+    # in time_budget seconds, ROUNDS_BUDGET_SHARE of it is kept for the number of trees
+    # returns (best params, auc, number of trees). the params are None if no candidate could be evaluated in time
+    def tune(self, time_budget, candidates=27, learning_rate=0.1, final_learning_rate=0.01, warm_start=None, log=None):
+        deadline = time.monotonic() + time_budget
+
+        params, score, rounds = self.search(time_budget * (1 - ROUNDS_BUDGET_SHARE), candidates=candidates,
+            learning_rate=learning_rate, warm_start=warm_start, log=log)
+
+        if params is None:
+            return (None, score, 0)
+
+        # the trees needed grow about as the learning rate shrinks, used if the deadline comes first
+        fallback = int(np.ceil(rounds * learning_rate / final_learning_rate))
+        n_estimators = self.best_num_rounds(params, final_learning_rate, max(3000, fallback), deadline, fallback)
+
+        return (params, score, n_estimators)
+
+# returns the params cached by the previous run, or None
+def load_best_params(path=BEST_PARAMS_PATH):
+    try:
+        with open(path) as file:
+            params = json.load(file)['params']
+    except:
+        return None
+
+    # ignore params that are not tuned anymore
+    if set(params) != set(SEARCH_SPACE):
+        return None
+
+    return params
+
+def save_best_params(params, score, n_estimators, path=BEST_PARAMS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w') as file:
+        json.dump({'params': params, 'auc': score, 'n_estimators': n_estimators}, file, indent=4)
@@ -29,6 +29,14 @@ garage_list = viewsets.GarageViewSet.as_view({
     'get': 'list'
 })
 
+garage_current_window = viewsets.GarageViewSet.as_view({
+    'get': 'current_window'
+})
+
+garage_predict = viewsets.GarageViewSet.as_view({
+    'get': 'predict'
+})
+
 garage_detail = viewsets.GarageViewSet.as_view({
     'get': 'retrieve'
 })
@@ -62,6 +70,10 @@ park_detail = viewsets.ParkViewSet.as_view({
     'patch': 'update_user_park'
 })
 
+park_batch = viewsets.ParkViewSet.as_view({
+    'post': 'batch'
+})
+
 password_reset_create = viewsets.PasswordResetViewSet.as_view({
     'post': 'generate_password_reset_token'
 })
@@ -84,8 +96,11 @@ urlpatterns = [
     path('user/ticket/', ticket_detail, name='ticket'),
     path('user/tickets/unassigned', user_unassigned_tickets, name='user_unassigned_tickets'),
     path('user/park/', park_detail, name='park'),
+    path('user/park/batch/', park_batch, name='park_batch'),
     path('user/verify/', user_verify, name='user_verify'),
     path('garages/', garage_list, name='garage_list'),
+    path('garages/now/', garage_current_window, name='garage_current_window'),
+    path('garages/predict/<str:day_of_week>/<str:time>/', garage_predict, name='garage_predict'),
     path('garages/<str:day_of_week>/', garage_list, name='garage_list_day_of_week'),
     path('garages/<str:day_of_week>/<str:time>/', garage_list, name='garage_list_day_of_week'),
     path('garage/<int:pk>/', garage_detail, name='garage_detail'),
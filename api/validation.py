@@ -0,0 +1,170 @@
+import numpy as np
+
+# local models
+from api.probabilities import DAY_CODES, DAYS_PER_WEEK, SLOTS_PER_DAY
+
+# Compares the stored garage probabilities with the tickets in the training set (see api/training.py)
+# Everything is aggregated into (garage, day of week, time interval) cubes, the first axis in the order of the garage pks given.
+
+# returns (tickets, observations) cubes: the number of ticketed rows and the number of rows of each garage, day and time interval
+    # X: (n, 3) features, columns time, day_of_week, garage
+    # Y: (n,) 1 if ticketed
+    # garages: garage pks. rows of any other garage are ignored
+def count_cubes(X, Y, garages):
+    garages = np.asarray(garages, dtype=np.int64)
+    shape = (len(garages), DAYS_PER_WEEK, SLOTS_PER_DAY)
+
+    if len(garages) == 0 or len(X) == 0:
+        return (np.zeros(shape, dtype=np.int64), np.zeros(shape, dtype=np.int64))
+
+    # position of each row's garage in garages
+    order = np.argsort(garages)
+    garage_column = np.asarray(X[:, 2], dtype=np.int64)
+    positions = np.minimum(np.searchsorted(garages[order], garage_column), len(garages) - 1)
+    known = garages[order][positions] == garage_column
+
+    garage_index = order[positions[known]]
+    cells = (garage_index * DAYS_PER_WEEK + X[known, 1]) * SLOTS_PER_DAY + X[known, 0]
+
+    size = len(garages) * DAYS_PER_WEEK * SLOTS_PER_DAY
+    observations = np.bincount(cells, minlength=size)
+    tickets = np.bincount(cells, weights=Y[known], minlength=size).astype(np.int64)
+
+    return (tickets.reshape(shape), observations.reshape(shape))
+
+# probabilities are clipped to [EPSILON, 1 - EPSILON] for the log-loss
+EPSILON = 1e-15
+# number of equal width probability bins of the reliability curves
+RELIABILITY_BINS = 10
+
+# Metrics of the stored probabilities against the observed tickets, for groups of cells of the cubes
+# Every row of the training set is a prediction of probability p (the stored probability of its cell), 1 if ticketed.
+    # tickets, observations, probabilities: cubes of the same shape
+    # groups: group index of every cell (same shape), count: number of groups
+# returns a dict of arrays indexed by group: observations, tickets, brier, log_loss, auc (nan for groups without both classes)
+def group_metrics(tickets, observations, probabilities, groups, count):
+    k = np.asarray(tickets, dtype=np.float64).ravel()
+    n = np.asarray(observations, dtype=np.float64).ravel()
+    p = np.asarray(probabilities, dtype=np.float64).ravel()
+    groups = np.asarray(groups).ravel()
+    negatives = n - k
+
+    group_observations = np.bincount(groups, weights=n, minlength=count)
+    group_tickets = np.bincount(groups, weights=k, minlength=count)
+
+    # sum of the squared errors and of the log-losses of the rows of each cell
+    squared_errors = k * (1 - p) ** 2 + negatives * p ** 2
+    clipped = np.clip(p, EPSILON, 1 - EPSILON)
+    log_losses = -(k * np.log(clipped) + negatives * np.log(1 - clipped))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        brier = np.bincount(groups, weights=squared_errors, minlength=count) / group_observations
+        log_loss = np.bincount(groups, weights=log_losses, minlength=count) / group_observations
+
+    return {
+        'observations': group_observations.astype(np.int64),
+        'tickets': group_tickets.astype(np.int64),
+        'brier': brier,
+        'log_loss': log_loss,
+        'auc': group_auc(k, negatives, p, groups, count),
+    }
+
+# AUC of each group: the probability that a ticketed row has a greater probability than a row that was not, ties count half
+# computed on the cells (rows of a cell share the same probability) instead of on the rows
+def group_auc(positives, negatives, probabilities, groups, count):
+    # no cells (no garages): every group is without both classes
+    if len(probabilities) == 0:
+        return np.full(count, np.nan)
+
+    # sorting by group, then probability. cells of the same group and probability are tied
+    keys, inverse = np.unique(np.column_stack((groups, probabilities)), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    key_groups = keys[:, 0].astype(np.int64)
+
+    key_positives = np.bincount(inverse, weights=positives, minlength=len(keys))
+    key_negatives = np.bincount(inverse, weights=negatives, minlength=len(keys))
+
+    # negatives of the same group with a lower probability than each key
+    cumulative = np.cumsum(key_negatives) - key_negatives
+    group_start = np.zeros(count)
+    first = np.r_[True, key_groups[1:] != key_groups[:-1]]
+    group_start[key_groups[first]] = cumulative[first]
+    lower_negatives = cumulative - group_start[key_groups]
+
+    wins = np.bincount(key_groups, weights=key_positives * (lower_negatives + 0.5 * key_negatives), minlength=count)
+    group_positives = np.bincount(key_groups, weights=key_positives, minlength=count)
+    group_negatives = np.bincount(key_groups, weights=key_negatives, minlength=count)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return wins / (group_positives * group_negatives)
+
+# reliability curve bins of each group, for RELIABILITY_BINS equal width probability bins
+# returns a dict of (groups, bins) arrays: observations, tickets, mean_probability, frequency (nan for empty bins)
+def group_reliability(tickets, observations, probabilities, groups, count, bins=RELIABILITY_BINS):
+    k = np.asarray(tickets, dtype=np.float64).ravel()
+    n = np.asarray(observations, dtype=np.float64).ravel()
+    p = np.asarray(probabilities, dtype=np.float64).ravel()
+
+    bin_index = np.minimum((p * bins).astype(np.int64), bins - 1)
+    cells = np.asarray(groups).ravel() * bins + bin_index
+
+    bin_observations = np.bincount(cells, weights=n, minlength=count * bins).reshape((count, bins))
+    bin_tickets = np.bincount(cells, weights=k, minlength=count * bins).reshape((count, bins))
+    bin_probabilities = np.bincount(cells, weights=n * p, minlength=count * bins).reshape((count, bins))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            'observations': bin_observations.astype(np.int64),
+            'tickets': bin_tickets.astype(np.int64),
+            'mean_probability': bin_probabilities / bin_observations,
+            'frequency': bin_tickets / bin_observations,
+        }
+
+METRICS = ['observations', 'tickets', 'brier', 'log_loss', 'auc']
+
+# float for json/csv, None for nan
+def to_value(value):
+    value = value.item() if hasattr(value, 'item') else value
+
+    if isinstance(value, float) and np.isnan(value):
+        return None
+
+    return value
+
+def metric_rows(metrics, reliability=None):
+    rows = []
+
+    for i in range(len(metrics['observations'])):
+        row = {name: to_value(metrics[name][i]) for name in METRICS}
+
+        if reliability is not None:
+            row['reliability'] = {name: [to_value(value) for value in values[i]] for name, values in reliability.items()}
+
+        rows.append(row)
+
+    return rows
+
+# builds the calibration/accuracy report of the stored probabilities: overall, per garage, per day and per garage and day
+    # garages: list of (pk, name), the order of the first axis of the cubes
+# returns a dict that can be written as json. garage_days is flat, for csv
+def build_report(garages, tickets, observations, probabilities):
+    garage_count = len(garages)
+    garage_groups, day_groups, slot_groups = np.indices((garage_count, DAYS_PER_WEEK, SLOTS_PER_DAY))
+    garage_day_groups = garage_groups * DAYS_PER_WEEK + day_groups
+    overall_groups = np.zeros(garage_groups.shape, dtype=np.int64)
+
+    args = (tickets, observations, probabilities)
+    report = {}
+
+    report['overall'] = metric_rows(group_metrics(*args, overall_groups, 1), group_reliability(*args, overall_groups, 1))[0]
+
+    rows = metric_rows(group_metrics(*args, garage_groups, garage_count), group_reliability(*args, garage_groups, garage_count))
+    report['garages'] = [dict(row, pk=pk, name=name) for (pk, name), row in zip(garages, rows)]
+
+    rows = metric_rows(group_metrics(*args, day_groups, DAYS_PER_WEEK), group_reliability(*args, day_groups, DAYS_PER_WEEK))
+    report['days'] = [dict(row, day_of_week=day_code) for day_code, row in zip(DAY_CODES, rows)]
+
+    rows = metric_rows(group_metrics(*args, garage_day_groups, garage_count * DAYS_PER_WEEK))
+    report['garage_days'] = [dict(row, pk=garages[i // DAYS_PER_WEEK][0], name=garages[i // DAYS_PER_WEEK][1], day_of_week=DAY_CODES[i % DAYS_PER_WEEK]) for i, row in enumerate(rows)]
+
+    return report
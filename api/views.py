@@ -13,15 +13,19 @@ import pickle
 
 # local models
 from api.models import Garage, Probability, DayProbability, Ticket, Park, User
+from api import synthetic
+from api.patrols import PatrolIndex
+from api.garage_registry import garage_registry
 
 ## GENERATE TEST DATA ##
 
 # creates a new park object in the database.
     # date: dateTime object
-    # garage: instance of Garage object
+    # garage: instance of Garage object, or its pk
     # user: instance of User object. Defaults to None/NULL
 def create_park(start, end, ticket, garage, user):
-    Park.objects.create(start=start, end=end, ticket=ticket, garage=garage, user=user)
+    garage_id = garage.pk if isinstance(garage, Garage) else garage
+    Park.objects.create(start=start, end=end, ticket=ticket, garage_id=garage_id, user=user)
 
 # create n tickets for each Garage at a random date between start_date and end_date
 def create_random_parks(n):
@@ -67,10 +71,12 @@ def create_parks_v2():
     create_parks_updated(park_percent_thresh=35, park_ticket_percent_thresh=98, park_max_time=240, park_min_time=10, parks_per_iteration=1)
 
 # second attempt at creating meaningful park data that contains trends
-def create_parks_updated(park_percent_thresh, park_ticket_percent_thresh, park_max_time, park_min_time, parks_per_iteration):
+# the parks are sampled and written in batches by api/synthetic.py
+    # seed: seed of the random numbers, the same seed generates the same parks
+def create_parks_updated(park_percent_thresh, park_ticket_percent_thresh, park_max_time, park_min_time, parks_per_iteration, seed=None):
     # all parks will be added under the test user
     user = User.objects.get(first_name='Test Data')
-    garages = Garage.objects.all()
+    garages = [(garage.pk, garage.name) for garage in garage_registry.garages()]
 
     # for now, enforcement will be done in three routes / clusters
     num_routes = 3
@@ -91,60 +97,11 @@ def create_parks_updated(park_percent_thresh, park_ticket_percent_thresh, park_m
     # add previous 15 days to the queue for ticket generation
     dates = []
     for i in range(1,15):
-        dates.append(date - datetime.timedelta(days=i))
+        dates.append((date - datetime.timedelta(days=i)).date())
 
-    # iterate over the past 15 days
-    for date in dates:
-        # random start time within 0-45 minutes of 7:00 am
-        date_begin = date + datetime.timedelta(minutes=randrange(0, 45, 1))
-        # iterate over each 5 minute time interval in the enforcement hours (7:00am - 6:00pm)
-        for current_time_offset in range(0, 660, 5):
-            # how many parks pre time interval will be attempted in each garage
-            for i in range(parks_per_iteration):
-                # set the start time of the park
-                park_start_time = date_begin + datetime.timedelta(minutes=current_time_offset)
-                # set the length of the park
-                park_length = randrange(park_min_time, park_max_time, 1)
-                # set when the park will end
-                park_end_time = park_start_time + datetime.timedelta(minutes=park_length)
-
-                # iterate over all garages
-                for garage in garages:
-                    # decide wether or not to generate a park
-                    park_prob = random() * 100
-                    if(park_prob > park_percent_thresh):
-                        park_made = False                        
-                        # only give out tickets on weekdays
-                        if date.weekday() < 5:
-                            # for each route's patrol times
-                            for patrol_time in patrol_times:
-                                # for each lot's patrol time
-                                for lot_visited in patrol_time:
-                                    # if the lot matches the garage name
-                                    if lot_visited[0] == garage.name and park_made == False:
-                                        # if the park range overlaps the ticketing range, give a ticket
-                                        
-                                        lot_visited_time1 = lot_visited[1].replace(year=park_start_time.year, month=park_start_time.month, day=park_start_time.day)
-                                        lot_visited_time2 = lot_visited[2].replace(year=park_start_time.year, month=park_start_time.month, day=park_start_time.day)
-
-                                        if park_start_time < lot_visited_time1 and park_end_time > lot_visited_time1:
-                                            # make sure that the ticket_prob is under the ticketing threshold
-                                            ticket_prob = random() * 100
-                                            if(ticket_prob < park_ticket_percent_thresh):
-                                                create_park(start=park_start_time, end=park_end_time, ticket=Ticket(date=random_date(lot_visited_time1 ,park_end_time)), garage=garage, user=user)
-                                                park_made = True
-                                        elif lot_visited_time1 < park_start_time and lot_visited_time2 > park_start_time:
-                                            ticket_prob = random() * 100
-                                            if(ticket_prob < park_ticket_percent_thresh):
-                                                create_park(start=park_start_time, end=park_end_time, ticket=Ticket(date=random_date(park_start_time, lot_visited_time2)), garage=garage, user=user)
-                                                park_made = True
-                                    
-                            if park_made == False:
-                                # test it again for the threshold, too many parks being created
-                                park_prob = random() * 100
-                                if(park_prob > park_percent_thresh):
-                                    create_park(start=park_start_time, end=park_end_time, ticket=None, garage=garage, user=user)
-                            park_made = False
+    return synthetic.generate_parks(dates, garages, PatrolIndex(patrol_times), [user.pk], seed=seed,
+        park_percent_thresh=park_percent_thresh, park_ticket_percent_thresh=park_ticket_percent_thresh,
+        park_max_time=park_max_time, park_min_time=park_min_time, parks_per_iteration=parks_per_iteration)
 
 def get_patrol_times_list(patrol_time_start, patrol_time_end ,patrol_lot_time_min, patrol_lot_time_max, patrol_route):
     # current 'time' in the simulation for route patrols (minutes)
@@ -183,7 +140,10 @@ def get_patrol_times_list(patrol_time_start, patrol_time_end ,patrol_lot_time_mi
 
 # first attempt at creating test data with meaning/trends behind it
 def create_structured_parks():
-    
+    # load in the routes from the output route files of route_finder.py command, once for every day
+    routes = []
+    for i in range(3):
+        routes.append(load_routes("route_visualization/CondensedRoutes/condensed_route_g"+str((i+1))+".json"))
 
     date = datetime.datetime.now()
     date = date.replace(hour=7, minute=0, second=0, microsecond=0)
@@ -195,25 +155,27 @@ def create_structured_parks():
     
     # for now, only create parks on the weekdays
     for date in dates:
-        create_structured_parks_for_day(date)
+        # the routes are shuffled in place for each day
+        create_structured_parks_for_day(date, [list(route) for route in routes])
         # sprinkle random parks with tickets in there
         #add_random_parks_for_day(date)
 
 # creates the park data for one day
-def create_structured_parks_for_day(day_start):
+    # routes: the routes to patrol, loaded from the route files if None. They are shuffled in place
+def create_structured_parks_for_day(day_start, routes=None):
     user = User.objects.get(first_name='Test Data')
-    garages = Garage.objects.all()
     
     # uses the route finder data to try and "intelligently" use possible routes the parking
     # attendents could take
 
     # for now, three routes / clusters
     num_routes = 3
-    routes = []
 
     # load in the routes from the output route files of route_finder.py command
-    for i in range(num_routes):
-        routes.append(load_routes("route_visualization/CondensedRoutes/condensed_route_g"+str((i+1))+".json"))
+    if routes is None:
+        routes = []
+        for i in range(num_routes):
+            routes.append(load_routes("route_visualization/CondensedRoutes/condensed_route_g"+str((i+1))+".json"))
 
     # shuffle routes every weekday
     for route in routes:
@@ -244,26 +206,23 @@ def create_structured_parks_for_day(day_start):
         for place in route:
             # update the time they visit the lot, add on the time it takes to get between lots
             current_patrol_dt = current_patrol_dt + datetime.timedelta(seconds=(math.floor(place[1])))
+
+            # find the garage that relates to the current place being enforced in the route
+            garageParked = garage_registry.by_name(place[0])
             
             # give out tickets at each lot
             for i in range(num_tickets):
                 # get the park dates/times based on the current time
                 dates = generate_start_end_ticket_dates(current_patrol_dt)
-                
-                # find the garage object that relates to the current place being enforced in the route
-                garageParked = None
-                for garage in garages:
-                    if(place[0] == garage.name):
-                        garageParked = garage          
 
                 # only give tickets out on the weekdays
                 weekno = datetime.datetime.today().weekday()
                 if weekno<5:
                     # create the park in the DB, with ticket
-                    create_park(start=dates[0], end=dates[1], ticket=Ticket(date=dates[2]), garage=garageParked, user=user)
+                    create_park(start=dates[0], end=dates[1], ticket=Ticket(date=dates[2]), garage=garageParked.pk, user=user)
                 else:
                     # create the park in the DB, no ticket
-                    create_park(start=dates[0], end=dates[1], ticket=None, garage=garageParked, user=user)
+                    create_park(start=dates[0], end=dates[1], ticket=None, garage=garageParked.pk, user=user)
             
             # update the current time with the time it takes to ticket a lot
             current_patrol_dt = current_patrol_dt + datetime.timedelta(minutes=time_to_ticket_lot)
@@ -290,17 +249,15 @@ def create_structured_parks_for_day(day_start):
             if current_patrol_dt.hour >= 18:
                 return
 
+            garageParked = garage_registry.by_name(place[0])
+
             for i in range(num_tickets):
                 dates = generate_start_end_ticket_dates(current_patrol_dt)
-                garageParked = None
-                for garage in garages:
-                    if(place[0] == garage.name):
-                        garageParked = garage
                 weekno = datetime.datetime.today().weekday()
                 if weekno<5:
-                    create_park(start=dates[0], end=dates[1], ticket=Ticket(date=dates[2]), garage=garageParked, user=user)
+                    create_park(start=dates[0], end=dates[1], ticket=Ticket(date=dates[2]), garage=garageParked.pk, user=user)
                 else:
-                    create_park(start=dates[0], end=dates[1], ticket=None, garage=garageParked, user=user)
+                    create_park(start=dates[0], end=dates[1], ticket=None, garage=garageParked.pk, user=user)
             current_patrol_dt = current_patrol_dt + datetime.timedelta(minutes=time_to_ticket_lot)
             time_to_ticket_lot = (math.floor(random()*100) % 7) + 15
             num_tickets = (math.floor(random()*100) % 15) + 2
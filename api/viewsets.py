@@ -1,5 +1,5 @@
 from .models import Garage, User, Park, Ticket, PasswordResetToken
-from .serializers import  GarageSerializer, UserSerializer, UserRegisterSerializer, PasswordSerializer, TicketSerializer, ParkSerializer, GeneratePasswordResetTokenSerializer, PasswordResetSerializer, ValidateResetTokenSerializer
+from .serializers import  GarageSerializer, GarageReadSerializer, UserSerializer, UserRegisterSerializer, PasswordSerializer, TicketSerializer, ParkSerializer, GeneratePasswordResetTokenSerializer, PasswordResetSerializer, ValidateResetTokenSerializer
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
@@ -10,17 +10,62 @@ from django.utils.html import strip_tags
 from django.forms.models import model_to_dict
 from django.template.loader import render_to_string
 from django.core.mail import send_mail
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from rest_framework.settings import api_settings
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
 from datetime import datetime, timedelta
 import re
 import random
 import string
 
 from .permissions import IsAuthenticatedOrCreate
+from .renderers import CompactJSONRenderer
+from .pagination import paginate, parse_limit, encode_cursor, decode_cursor, MAX_PAGE_SIZE
+from .indexes import UNASSIGNED_TICKET_FILTER
+from .mongo import get_collection, to_document, reserve_ids
+from .cache import garage_response_cache, probability_window_index
+from .model_registry import predictor
+from .probabilities import DAY_INDEXES
+
+# format of the renderer selected by content negotiation. ie) 'json' or 'api'
+def request_format(request):
+    return request.accepted_renderer.format
+
+# True if the client's copy of the response is still current, from If-None-Match or else If-Modified-Since
+def not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+
+    if if_none_match:
+        # the ETags of compressed responses are weakened, compare them without the W/ prefix
+        etags = [value.strip() for value in if_none_match.split(',')]
+        return '*' in etags or etag in [value[2:] if value.startswith('W/') else value for value in etags]
+
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+
+    return if_modified_since is not None and last_modified is not None and int(last_modified) <= if_modified_since
+
+def accepts_gzip(request):
+    return re.search(r'\bgzip\b', request.META.get('HTTP_ACCEPT_ENCODING', '')) is not None
+
+# sets the ETag/Last-Modified of a response. clients revalidate on every request
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
 
 class GarageViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Garage.objects.all()
-    serializer_class = GarageSerializer
+    # the nested probability documents are only loaded for garages without a packed probability matrix
+    queryset = Garage.objects.defer('probability')
+    serializer_class = GarageReadSerializer
     permission_classes = [IsAuthenticated]
+    # ?format=compact returns the probabilities as percentages
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [CompactJSONRenderer]
 
     def get_serializer_context(self):
         context = super(GarageViewSet, self).get_serializer_context()
@@ -33,8 +78,94 @@ class GarageViewSet(viewsets.ReadOnlyModelViewSet):
         if 'time' in self.kwargs:
             context['time'] = self.kwargs['time']
 
+        # the staged probabilities of the committed version are read, see write_probabilities
+        context['probability_version'] = garage_response_cache.get_version()
+
         return context
 
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(None)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(self.kwargs['pk'])
+
+    # serves the rendered JSON from the garage response cache
+    def get_cached_response(self, pk):
+        format = request_format(self.request)
+
+        # the cache only holds JSON, let the browsable api render normally
+        if format not in ('json', 'compact'):
+            if pk is None:
+                return super(GarageViewSet, self).list(self.request)
+            return super(GarageViewSet, self).retrieve(self.request)
+
+        context = self.get_serializer_context()
+        key = (pk, context.get('day_of_week', None), context.get('time', None))
+        if format == 'compact':
+            key += ('compact',)
+
+        # the client already has the response of the current probabilities
+        etag = garage_response_cache.etag(key)
+        last_modified = garage_response_cache.last_modified()
+
+        if not_modified(self.request, etag, last_modified):
+            response = HttpResponseNotModified()
+            set_validators(response, etag, last_modified)
+            return response
+
+        content = garage_response_cache.get_or_render(key)
+        response = HttpResponse(content, content_type='application/json')
+        set_validators(response, garage_response_cache.etag(key), garage_response_cache.last_modified())
+
+        # compressed once per cached response instead of on every request
+        if accepts_gzip(self.request) and len(content) >= 200:
+            response.content = garage_response_cache.get_gzipped(key, content)
+            response['Content-Encoding'] = 'gzip'
+            # weakened like gzip_page does, the compressed bytes are not the identity response
+            response['ETag'] = 'W/' + response['ETag']
+            patch_vary_headers(response, ('Accept-Encoding',))
+
+        return response
+
+    # every garage's probability for the current 15 minute time interval, for the map view
+    # only the probability responses are compressed: they carry no secrets, unlike the user responses (BREACH)
+    @method_decorator(gzip_page)
+    @action(detail=False, methods=['get'])
+    def current_window(self, request):
+        content = probability_window_index.get_for_date(datetime.now())
+
+        return HttpResponse(content, content_type='application/json')
+
+    # every garage's probability predicted by the current model for any day of week and minute, in its 15 minute interval
+    @method_decorator(gzip_page)
+    @action(detail=False, methods=['get'])
+    def predict(self, request, day_of_week, time):
+        if day_of_week not in DAY_INDEXES:
+            return Response({'day_of_week': ['Invalid day of week.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            time_object = datetime.strptime(time, "%H:%M")
+        except:
+            return Response({'time': ['Invalid time, expected HH:MM.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        garages = list(Garage.objects.values_list('pk', 'name'))
+        probabilities = predictor.predict([garage[0] for garage in garages], DAY_INDEXES[day_of_week], time_object.hour * 60 + time_object.minute)
+
+        if probabilities is None:
+            return Response('No model has been trained yet.', status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        return Response({
+            'day_of_week': day_of_week,
+            'time': time_object.strftime("%H:%M"),
+            'garages': [{'pk': pk, 'name': name, 'p': p} for (pk, name), p in zip(garages, probabilities.tolist())]
+        })
+
+# maximum number of items of a park batch request
+MAX_BATCH_SIZE = 500
+
+# fields of a park that can be requested with ?fields=
+PARK_FIELDS = ('pk', 'start', 'end', 'ticket', 'garage', 'user')
+
 class ParkViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = ParkSerializer
@@ -63,9 +194,53 @@ class ParkViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, headers=headers)
 
         user_parks = request.user.parks()
-        serializer = self.get_serializer(user_parks, many=True)
 
-        headers = self.get_success_headers(serializer.data)
+        # only the parks started in [since, until)
+        for param, lookup in (('since', 'start__gte'), ('until', 'start__lt')):
+            if request.query_params.get(param):
+                date = parse_datetime(request.query_params[param])
+
+                if date is None:
+                    return Response({param: ['Invalid date, expected an ISO date string.']},
+                                    status=status.HTTP_400_BAD_REQUEST)
+
+                user_parks = user_parks.filter(**{lookup: date})
+
+        # only serialize the requested fields
+        fields = None
+        if request.query_params.get('fields'):
+            fields = request.query_params['fields'].split(',')
+            invalid_fields = [field for field in fields if field not in PARK_FIELDS]
+
+            if invalid_fields:
+                return Response({'fields': ['Invalid field(s): ' + ', '.join(invalid_fields) + '.']},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        # garage names are read once instead of fetching the garage of every park
+        context = self.get_serializer_context()
+        context['garage_names'] = dict(Garage.objects.values_list('pk', 'name'))
+
+        # paginated when a limit or cursor is given, every park otherwise
+        if 'limit' in request.query_params or 'cursor' in request.query_params:
+            limit = parse_limit(request.query_params.get('limit'))
+            if limit is None:
+                return Response({'limit': ['Must be a number between 1 and ' + str(MAX_PAGE_SIZE) + '.']},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            cursor = None
+            if request.query_params.get('cursor'):
+                cursor = decode_cursor(request.query_params['cursor'])
+
+                if cursor is None:
+                    return Response({'cursor': ['Invalid cursor.']}, status=status.HTTP_400_BAD_REQUEST)
+
+            parks, next_cursor = paginate(user_parks, 'start', cursor, limit)
+            serializer = ParkSerializer(parks, many=True, context=context, fields=fields)
+
+            return Response({'results': serializer.data, 'next': next_cursor})
+
+        serializer = ParkSerializer(user_parks, many=True, context=context, fields=fields)
+
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'])
@@ -123,6 +298,164 @@ class ParkViewSet(viewsets.ModelViewSet):
 
         return park
 
+    # Creates/updates many parks and attaches tickets in one request, for clients syncing a backlog
+    # Input: {"items": [{"op": "create" | "update" | "ticket", "data": {...}}, ...]}
+    #     create: same data as create_user_park, update: same data as update_user_park, ticket: same data as create_user_ticket
+    # Every item is validated first, invalid items are not written. The valid creates, updates and tickets are then
+    # written with one unordered bulk write. It is not all or nothing (that needs a transaction, so a replica set):
+    # a write that fails does not stop the others, and its item gets a 500 result. Returns a result per item, in order,
+    # whose status says whether it was written.
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        items = request.data.get('items') if isinstance(request.data, dict) else None
+
+        if not isinstance(items, list):
+            return Response({'items': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(items) > MAX_BATCH_SIZE:
+            return Response({'items': ['At most ' + str(MAX_BATCH_SIZE) + ' items can be sent at once.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # garages and referenced parks are read once for the whole batch
+        garages = {garage.pk: garage for garage in Garage.objects.defer('probability', 'probability_matrix')}
+        context = self.get_serializer_context()
+        context['garages'] = garages
+        context['garage_names'] = {pk: garage.name for pk, garage in garages.items()}
+
+        parks = {park.pk: park for park in Park.objects.filter(pk__in=self.get_batch_park_pks(items))}
+
+        results = []
+        created = []
+        updated = {}
+
+        for item in items:
+            park, errors, op = self.validate_batch_item(request, item, parks, context)
+
+            if errors is not None:
+                results.append({'status': status.HTTP_400_BAD_REQUEST, 'errors': errors})
+            elif op == 'create':
+                created.append(park)
+                results.append({'status': status.HTTP_201_CREATED, 'park': park})
+            else:
+                updated[park.pk] = park
+                results.append({'status': status.HTTP_200_OK, 'park': park})
+
+        for park, pk in zip(created, reserve_ids(Park, len(created)) if created else []):
+            park.pk = pk
+
+        self.write_batch(created, updated, results)
+
+        for result in results:
+            if 'park' in result:
+                result['data'] = ParkSerializer(result.pop('park'), context=context).data
+
+        return Response(results)
+
+    # writes the created and updated parks with a single bulk write
+    # the results of the parks whose write failed are replaced by a 500 result
+    def write_batch(self, created, updated, results):
+        fields = ['start', 'end', 'ticket', 'garage', 'user', 'modified']
+        requests = [InsertOne(dict(to_document(park, fields), id=park.pk)) for park in created]
+        requests += [UpdateOne({'id': pk}, {'$set': to_document(park, fields)}) for pk, park in updated.items()]
+        parks = created + list(updated.values())
+
+        if not requests:
+            return
+
+        try:
+            get_collection(Park).bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            failed = set(id(parks[error['index']]) for error in e.details.get('writeErrors', []))
+
+            # several items can update the same park, they all share its write
+            for i, result in enumerate(results):
+                if id(result.get('park')) in failed:
+                    results[i] = {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'errors': {'non_field_errors': ['The park could not be saved.']}}
+
+    # pks of the parks referenced by the update and ticket items
+    def get_batch_park_pks(self, items):
+        pks = set()
+
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get('data'), dict):
+                continue
+
+            pk = item['data'].get('pk') if item.get('op') == 'update' else item['data'].get('park_id')
+
+            try:
+                pks.add(int(pk))
+            except (TypeError, ValueError):
+                pass
+
+        return list(pks)
+
+    # validates a batch item with the same rules as the single park/ticket endpoints and applies it to its park
+    # returns (park, errors, op). errors is None if the item is valid
+    def validate_batch_item(self, request, item, parks, context):
+        if not isinstance(item, dict) or not isinstance(item.get('data'), dict):
+            return (None, {'non_field_errors': ['Expected an object with op and data.']}, None)
+
+        op = item.get('op')
+        data = item['data']
+
+        if op == 'create':
+            serializer = ParkSerializer(data=data, context=context)
+
+            if not serializer.is_valid():
+                return (None, serializer.errors, op)
+
+            validated_data = dict(serializer.validated_data, user=request.user)
+            if validated_data.get('ticket') is not None:
+                validated_data['ticket'] = Ticket(**validated_data['ticket'])
+
+            return (Park(**validated_data), None, op)
+
+        if op not in ('update', 'ticket'):
+            return (None, {'op': ['Must be one of create, update, ticket.']}, op)
+
+        pk_field = 'pk' if op == 'update' else 'park_id'
+
+        if not data.get(pk_field):
+            return (None, {pk_field: ['This field is required.']}, op)
+
+        try:
+            park = parks[int(data[pk_field])]
+        except (KeyError, TypeError, ValueError):
+            return (None, {pk_field: ['Park with pk ' + str(data[pk_field]) + ' does not exist.']}, op)
+
+        if park.user_id != request.user.pk:
+            return (None, {'non_field_errors': ['The user does not own this park.']}, op)
+
+        if op == 'update':
+            serializer = ParkSerializer(park, data=data, partial=True, context=context)
+
+            if not serializer.is_valid():
+                return (None, serializer.errors, op)
+
+            end = serializer.validated_data.get('end')
+            if park.ticket and end and end < park.ticket.date:
+                return (None, {'end': ['The end date of the park must be after the reported ticket date.']}, op)
+
+            for attr, value in serializer.validated_data.items():
+                if attr == 'ticket' and value is not None:
+                    value = Ticket(**value)
+                setattr(park, attr, value)
+
+            return (park, None, op)
+
+        serializer = TicketSerializer(data=data)
+
+        if not serializer.is_valid():
+            return (None, serializer.errors, op)
+
+        date = serializer.validated_data.get('date')
+        if date < park.start or park.end != None and date > park.end:
+            return (None, {'date': ['The date of the ticket must be during park time.']}, op)
+
+        park.ticket = Ticket(**serializer.validated_data)
+
+        return (park, None, op)
+
 class TicketViewSet(viewsets.ModelViewSet):
     queryset = Ticket.objects.all()
     permission_classes = [IsAuthenticated]
@@ -161,6 +494,48 @@ class TicketViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.validated_data, status=status.HTTP_201_CREATED, headers=headers)
 
+    # Returns the current user's tickets that are not assigned to a finished park yet, ie) the ticket was reported
+    # while the park is ongoing. Ordered by the start of the park and paginated like get_user_parks.
+    # Only the needed fields of the parks are read, from the park_unassigned_ticket partial index (api/indexes.py)
+    @action(detail=False, methods=['get'])
+    def get_user_unassigned_tickets(self, request):
+        limit = parse_limit(request.query_params.get('limit'))
+        if limit is None:
+            return Response({'limit': ['Must be a number between 1 and ' + str(MAX_PAGE_SIZE) + '.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        query = dict(UNASSIGNED_TICKET_FILTER, user_id=request.user.pk)
+
+        if request.query_params.get('cursor'):
+            cursor = decode_cursor(request.query_params['cursor'])
+
+            if cursor is None:
+                return Response({'cursor': ['Invalid cursor.']}, status=status.HTTP_400_BAD_REQUEST)
+
+            date, pk = cursor
+            query['$or'] = [{'start': {'$gt': date}}, {'start': date, 'id': {'$gt': pk}}]
+
+        projection = {'_id': False, 'id': True, 'start': True, 'ticket.date': True, 'garage_id': True}
+
+        # one more than the limit, to know whether there is a next page
+        documents = list(get_collection(Park).find(query, projection).sort([('start', 1), ('id', 1)]).limit(limit + 1))
+
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = encode_cursor(documents[-1]['start'], documents[-1]['id'])
+
+        parks = [
+            Park(pk=document['id'], start=document['start'], ticket=Ticket(date=document['ticket']['date']), garage_id=document['garage_id'])
+            for document in documents
+        ]
+
+        context = self.get_serializer_context()
+        context['garage_names'] = dict(Garage.objects.values_list('pk', 'name'))
+        serializer = ParkSerializer(parks, many=True, context=context, fields=('pk', 'start', 'ticket', 'garage'))
+
+        return Response({'results': serializer.data, 'next': next_cursor})
+
 class UserViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrCreate]
     serializer_class = UserSerializer
@@ -173,10 +548,8 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def verify_token(self, request):
         try:
-            user = request.user
-            token = Token.objects.get(user=user)
-
-            if token:
+            # the token authenticated the request, it does not have to be looked up again
+            if request.auth:
                 return Response(True)
             
             return Response(False, status=status.HTTP_401_UNAUTHORIZED)
@@ -186,8 +559,8 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def logout(self, request):
         try:
-            user = request.user
-            token = Token.objects.get(user=user)
+            # the token that authenticated the request. deleting it also drops it from the token cache
+            token = request.auth
 
             if token:
                 token.delete()
@@ -200,19 +573,21 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def get_user(self, request):
         if request.user.is_authenticated:
-            return Response(UserSerializer(request.user).data)
+            # request.user can be a cached copy (api/authentication.py), the details are read again
+            return Response(UserSerializer(User.objects.get(pk=request.user.pk)).data)
         else:
             return Response({'non_field_errors': ['You must be logged in to perform this action.']},
                             status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['patch'])
     def update_user(self, request):
-        instance = request.user
-
         if not request.user.is_authenticated:
             return Response({'non_field_errors': ['You must be logged in to perform this action.']},
                             status=status.HTTP_400_BAD_REQUEST)
 
+        # request.user can be a cached copy (api/authentication.py), saving it could undo other changes
+        instance = User.objects.get(pk=request.user.pk)
+
         if request.data.get('password'):
             password_data = {'password': request.data.get('password')}
             if request.data.get('password2'):
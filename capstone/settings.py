@@ -95,6 +95,39 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# file based so that entries written by management commands (ie. xgboost_daily) are shared with the web workers
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache/'),
+    }
+}
+
+# Garage response cache (api/cache.py)
+# django cache used to share rendered garage responses between processes
+GARAGE_CACHE_ALIAS = 'default'
+# seconds between checks of the probability generation in the DB
+GARAGE_CACHE_CHECK_INTERVAL = 30
+# maximum number of rendered responses kept in each process
+GARAGE_CACHE_MAX_ENTRIES = 1024
+
+# Token authentication cache (api/authentication.py)
+TOKEN_CACHE = {
+    # maximum number of tokens kept in each process
+    'MAX_ENTRIES': 10000,
+    # seconds a token is trusted without a DB lookup
+    'TTL': 60,
+    # django cache carrying the invalidations to the other processes, None to only rely on the TTL
+    # only worth it with a memory-backed cache (memcached, redis), the file based default cache is slower than the lookup
+    'ALIAS': None,
+    # seconds between two checks of the invalidation stamp of a cached token
+    'STAMP_INTERVAL': 5,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -116,7 +149,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # Rest Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachingTokenAuthentication',
     ],
 }
 
@@ -0,0 +1,25 @@
+import json
+import os
+
+# The route coordinates file: the name, coordinates and patrol group of every patrolled garage
+# Kept free of Django, so get_routes.py can plan routes (ie. --offline) without the project settings or a DB.
+# api/garage_registry.py merges it with the garages of the DB.
+
+COORDINATES_FILE = 'route_visualization/garage_coordinates_3_groups.json'
+
+# returns the garages of the route coordinates file, a list of {"name", "latitude", "longitude", "group"}
+# in the order of the file. None if the file is missing or invalid
+def load_coordinates(filename=COORDINATES_FILE):
+    if not os.path.isfile(filename):
+        return None
+
+    try:
+        with open(filename) as file:
+            return [{
+                'name': garage['name'],
+                'latitude': garage['latitude'],
+                'longitude': garage['longitude'],
+                'group': garage['group'],
+            } for garage in json.load(file)]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
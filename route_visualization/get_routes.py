@@ -9,6 +9,9 @@ from ortools.constraint_solver import pywrapcp
 from ortools.constraint_solver import routing_enums_pb2
 from openrouteservice import directions
 
+from route_visualization.coordinates import load_coordinates
+from route_visualization import route_planner
+
 # The purpose of this file is to generate a route for three different groups
 # Using openrouteservice API and ortools, get the best route to visit
 # each parking location in every group, and plot onto a map
@@ -29,24 +32,20 @@ def read_coords_from_3_group_json(filename='route_visualization/garage_coordinat
     group2 = ()
     group3 = ()
 
-    if(os.path.isfile(filename) is not True):
+    data = load_coordinates(filename)
+    if(data is None):
         return None
 
-    with open(filename) as json_file:
-        try:
-            data = json.load(json_file)
-            for garage in data:
-                nextGarage = (garage['longitude'], garage['latitude'], )
-
-                # seperate each parking location by group
-                if(garage['group'] == 1):
-                    group1 = (nextGarage,) + group1
-                elif(garage['group'] == 2):
-                    group2 = (nextGarage,) + group2
-                elif(garage['group'] == 3):
-                    group3 = (nextGarage,) + group3
-        except:
-            return None
+    for garage in data:
+        nextGarage = (garage['longitude'], garage['latitude'], )
+
+        # seperate each parking location by group
+        if(garage['group'] == 1):
+            group1 = (nextGarage,) + group1
+        elif(garage['group'] == 2):
+            group2 = (nextGarage,) + group2
+        elif(garage['group'] == 3):
+            group3 = (nextGarage,) + group3
 
     # add each group to overall coords object
     coords.append(group1)
@@ -57,17 +56,16 @@ def read_coords_from_3_group_json(filename='route_visualization/garage_coordinat
 
 # Put parking location markers onto the map
 def load_markers(m, filename='route_visualization/garage_coordinates_3_groups.json'):
-    if(os.path.isfile(filename) is not True):
+    data = load_coordinates(filename)
+    if(data is None):
         return m
 
-    with open(filename) as json_file:
-        data = json.load(json_file)
-        for garage in data:
-            folium.Marker(
-                location=[garage['latitude'], garage['longitude']],
-                popup= garage['name'],
-                icon=folium.Icon(icon='car', prefix='fa')
-            ).add_to(m)
+    for garage in data:
+        folium.Marker(
+            location=[garage['latitude'], garage['longitude']],
+            popup= garage['name'],
+            icon=folium.Icon(icon='car', prefix='fa')
+        ).add_to(m)
     return m
 
 # Get the matrices for each group's route
@@ -208,9 +206,9 @@ def get_path_mapped(optimal_coords, m, clnt, groupNum):
            'format_out': 'geojson',
           }
 
-    optimal_route = clnt.directions(**request)
-
     try:
+        optimal_route = clnt.directions(**request)
+
         # dump full optimal route result from the api into json
         with open('route_visualization/FullRoutes/full_route_g' + str(groupNum) + '.json', 'w') as outfile:
             json.dump(optimal_route, outfile)
@@ -246,29 +244,24 @@ def save_routes(groupNum, optimal_coords, filepath='route_visualization/Condense
         return False
 
     try:
+        # name of the garage at each (longitude, latitude)
+        garage_names = {(garage['longitude'], garage['latitude']): garage['name'] for garage in load_coordinates()}
+
+        with open('route_visualization/FullRoutes/full_route_g'+str(groupNum)+'.json') as full_route:
+            full_enforce_route = json.load(full_route)
+            route = []
+
+            for inx, coordPair in enumerate(optimal_coords):
+                name = garage_names.get((coordPair[0], coordPair[1]))
+                if(name is None):
+                    continue
+
+                # the first garage is the start of the route, the others are reached after the previous segment
+                if(inx == 0):
+                    route.append((name, 0))
+                else:
+                    route.append((name, full_enforce_route['features'][0]['properties']['segments'][inx - 1]['duration']))
 
-        with open('route_visualization/garage_coordinates_3_groups.json') as all_coords:
-            with open('route_visualization/FullRoutes/full_route_g'+str(groupNum)+'.json') as full_route:
-                garages = json.load(all_coords)
-                full_enforce_route = json.load(full_route)
-                time = 0
-                garageTimePair = ()
-                route = []
-                inx = -1
-
-                for coordPair in optimal_coords:
-                    for garage in garages:
-                        
-                        if(inx != -1):
-                            segment = full_enforce_route['features'][0]['properties']['segments'][inx]
-                        if(garage['latitude'] == coordPair[1] and garage['longitude'] == coordPair[0]):
-                            if(inx == -1):
-                                garageTimePair = (garage['name'], 0)
-                            else:
-                                garageTimePair = (garage['name'], segment['duration'])
-                            route.append(garageTimePair)
-                    inx = inx + 1
-                    
         with open(filepath+str(groupNum)+'.json', "w") as outfile:
             json.dump(route, outfile)
 
@@ -277,12 +270,50 @@ def save_routes(groupNum, optimal_coords, filepath='route_visualization/Condense
 
     return True
 
-def start():
-    api_key = ''
-    with open('route_visualization/api_key.txt', "r") as api_key_file:
-        api_key = api_key_file.read()
-        
-    clnt = openrouteservice.Client(key=api_key)
+# save the route using the durations of the distance matrix, for routes planned without the directions API
+def save_routes_from_matrix(groupNum, optimal_coords, garage_matrix, coords, filepath='route_visualization/CondensedRoutes/condensed_route_g'):
+    if(groupNum < 0 or groupNum is None):
+        return False
+    if(optimal_coords is None or garage_matrix is None or coords is None):
+        return False
+
+    try:
+        garage_names = {(garage['longitude'], garage['latitude']): garage['name'] for garage in load_coordinates()}
+        # row of each coordinate in the matrix
+        rows = {coordPair: inx for inx, coordPair in enumerate(coords)}
+        route = []
+
+        for inx, coordPair in enumerate(optimal_coords):
+            if(inx == 0):
+                route.append((garage_names[coordPair], 0))
+            else:
+                route.append((garage_names[coordPair], garage_matrix['durations'][rows[optimal_coords[inx - 1]]][rows[coordPair]]))
+
+        with open(filepath+str(groupNum)+'.json', "w") as outfile:
+            json.dump(route, outfile)
+
+    except:
+        return False
+
+    return True
+
+# returns the openrouteservice client, None if there is no api key
+def get_client(filename='route_visualization/api_key.txt'):
+    try:
+        with open(filename, "r") as api_key_file:
+            api_key = api_key_file.read().strip()
+    except:
+        return None
+
+    if not api_key:
+        return None
+
+    return openrouteservice.Client(key=api_key)
+
+# offline: plan the routes without calling openrouteservice, with the cached or locally computed matrices (see route_planner.py)
+# the route traces are only drawn on the map when the directions API is used
+def start(offline=False):
+    clnt = None if offline else get_client()
 
     coords = read_coords_from_3_group_json()
 
@@ -291,23 +322,23 @@ def start():
     m = folium.Map(location=(mapCenter[0], mapCenter[1]), zoom_start=14)
     m = load_markers(m)
 
+    # the matrices are read from the disk cache, requested from the API, or computed locally
     global garage_matrix_g1
-    garage_matrix_g1 = get_matrices(0, clnt, coords)
+    garage_matrix_g1 = route_planner.get_matrix(coords[0], clnt)
     global garage_matrix_g2
-    garage_matrix_g2 = get_matrices(1, clnt, coords)
+    garage_matrix_g2 = route_planner.get_matrix(coords[1], clnt)
     global garage_matrix_g3
-    garage_matrix_g3 = get_matrices(2, clnt, coords)
+    garage_matrix_g3 = route_planner.get_matrix(coords[2], clnt)
 
-    optCoordsG1 = get_path(garage_matrix_g1, coords[0], 1)
-    optCoordsG2 = get_path(garage_matrix_g2, coords[1], 2)
-    optCoordsG3 = get_path(garage_matrix_g3, coords[2], 3)
+    matrices = [garage_matrix_g1, garage_matrix_g2, garage_matrix_g3]
 
-    get_path_mapped(optCoordsG1, m, clnt, 1)
-    get_path_mapped(optCoordsG2, m, clnt, 2)
-    get_path_mapped(optCoordsG3, m, clnt, 3)
+    for groupNum in range(1, 4):
+        optimal_coords = get_path(matrices[groupNum - 1], coords[groupNum - 1], groupNum)
 
-    save_routes(1, optCoordsG1)
-    save_routes(2, optCoordsG2)
-    save_routes(3, optCoordsG3)
+        # the full route gives the actual driving durations, the matrix ones are used if it can't be requested
+        if(clnt is not None and get_path_mapped(optimal_coords, m, clnt, groupNum)):
+            save_routes(groupNum, optimal_coords)
+        else:
+            save_routes_from_matrix(groupNum, optimal_coords, matrices[groupNum - 1], coords[groupNum - 1])
 
     m.save('route_visualization/three_route_enforcement.html')
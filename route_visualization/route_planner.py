@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+
+# Distance matrices for the route solver (see get_routes.py)
+# The openrouteservice matrices are cached on disk, keyed by a hash of the coordinates of the group, so re-planning
+# the same groups does not call the API again. When there is no client or the API can't be reached, the matrix is
+# computed locally from the coordinates instead: the haversine (straight line) or Manhattan (street grid) distance
+# between every pair of garages, at an average driving speed.
+# Every matrix has the shape of the openrouteservice response, {'durations': [[seconds]]}, so get_path works with either.
+
+MATRIX_CACHE_DIR = 'route_visualization/MatrixCache'
+PROFILE = 'driving-car'
+
+# mean radius of the earth, in meters
+EARTH_RADIUS = 6371008.8
+# average driving speed between the garages, in meters/second (30 km/h)
+DRIVING_SPEED = 30 / 3.6
+
+# returns the cache key of a matrix: hash of the coordinates (in order, they are the rows of the matrix) and the profile
+    # coords: list of (longitude, latitude)
+def matrix_key(coords, profile=PROFILE):
+    locations = [[round(float(lon), 6), round(float(lat), 6)] for lon, lat in coords]
+
+    return hashlib.sha1(json.dumps([profile, locations]).encode()).hexdigest()
+
+def matrix_path(key, cache_dir=MATRIX_CACHE_DIR):
+    return os.path.join(cache_dir, key + '.json')
+
+# returns the cached matrix, None if it is not cached or the file is invalid
+def load_cached_matrix(key, cache_dir=MATRIX_CACHE_DIR):
+    try:
+        with open(matrix_path(key, cache_dir)) as file:
+            matrix = json.load(file)
+    except:
+        return None
+
+    if not isinstance(matrix, dict) or 'durations' not in matrix:
+        return None
+
+    return matrix
+
+# writes the matrix to the cache. returns False if it could not be written
+def save_cached_matrix(key, matrix, cache_dir=MATRIX_CACHE_DIR):
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # written to a temporary file first, so a reader never sees half a matrix
+        file, filename = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(file, 'w') as outfile:
+            json.dump(matrix, outfile)
+
+        os.replace(filename, matrix_path(key, cache_dir))
+    except:
+        return False
+
+    return True
+
+# returns (latitudes, longitudes) of the coordinates in radians
+def to_radians(coords):
+    coords = np.radians(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+
+    return (coords[:, 1], coords[:, 0])
+
+# returns the straight line distance between every pair of coordinates, in meters
+    # coords: list of (longitude, latitude)
+def haversine_matrix(coords):
+    lat, lon = to_radians(coords)
+    dlat = lat[None, :] - lat[:, None]
+    dlon = lon[None, :] - lon[:, None]
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+# returns the distance between every pair of coordinates along north-south and east-west streets, in meters
+    # coords: list of (longitude, latitude)
+def manhattan_matrix(coords):
+    lat, lon = to_radians(coords)
+    mean_lat = (lat[None, :] + lat[:, None]) / 2
+
+    north_south = np.abs(lat[None, :] - lat[:, None])
+    east_west = np.abs(lon[None, :] - lon[:, None]) * np.cos(mean_lat)
+
+    return EARTH_RADIUS * (north_south + east_west)
+
+FALLBACK_METHODS = {
+    'haversine': haversine_matrix,
+    'manhattan': manhattan_matrix,
+}
+
+# computes the matrix locally, without the API
+    # method: 'haversine' or 'manhattan'
+    # speed: driving speed in meters/second, the durations are the distances at this speed
+def fallback_matrix(coords, method='manhattan', speed=DRIVING_SPEED):
+    distances = FALLBACK_METHODS[method](coords)
+
+    return {
+        'durations': np.round(distances / speed, 2).tolist(),
+        'distances': np.round(distances, 2).tolist(),
+        'source': method,
+    }
+
+# requests the matrix from openrouteservice. None if the API can't be reached or the response is invalid
+def request_matrix(clnt, coords, profile=PROFILE):
+    request = {'locations': [list(coord) for coord in coords],
+           'profile': profile,
+           'metrics': ['duration']}
+
+    try:
+        res = clnt.distance_matrix(**request)
+    except:
+        return None
+
+    if not isinstance(res, dict) or 'durations' not in res:
+        return None
+
+    return res
+
+# returns the duration matrix of a group of coordinates, {'durations': [[seconds]]}
+    # coords: list of (longitude, latitude)
+    # clnt: openrouteservice client, None to never call the API
+    # fallback: method of fallback_matrix when the matrix is not cached and the API can't be used, None to return None instead
+    # refresh: request the matrix again even if it is cached
+def get_matrix(coords, clnt=None, cache_dir=MATRIX_CACHE_DIR, fallback='manhattan', refresh=False, profile=PROFILE):
+    if coords is None:
+        return None
+
+    key = matrix_key(coords, profile)
+
+    if not refresh:
+        matrix = load_cached_matrix(key, cache_dir)
+        if matrix is not None:
+            return matrix
+
+    if clnt is not None:
+        matrix = request_matrix(clnt, coords, profile)
+
+        if matrix is not None:
+            save_cached_matrix(key, matrix, cache_dir)
+            return matrix
+
+    # a refresh that failed keeps the cached matrix
+    if refresh:
+        matrix = load_cached_matrix(key, cache_dir)
+        if matrix is not None:
+            return matrix
+
+    # the fallback takes milliseconds, it is not cached so that a later API matrix is not shadowed by it
+    if fallback is None:
+        return None
+
+    return fallback_matrix(coords, fallback)